@@ -150,17 +150,58 @@ function showAuth() {
     document.getElementById('appSection').classList.add('d-none');
 }
 
+// ==================== BATCH ====================
+// Largest batch the server accepts (BATCH_MAX_REQUESTS)
+const BATCH_LIMIT = 100;
+
+// Runs several API calls in one round trip; resolves to [{status, headers, body}]
+async function apiBatch(requests) {
+    let results = [];
+    for (let start = 0; start < requests.length; start += BATCH_LIMIT) {
+        const response = await fetch(`${API_BASE_URL}/batch`, {
+            method: 'POST',
+            headers: {
+                'Authorization': `Bearer ${accessToken}`,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ requests: requests.slice(start, start + BATCH_LIMIT) })
+        });
+
+        if (!response.ok) throw new Error('Batch request failed');
+
+        results = results.concat((await response.json()).responses);
+    }
+    return results;
+}
+
 // ==================== DATA LOADING ====================
 async function loadAllData() {
     try {
-        await loadCategories();
-        await loadExpenses();
+        // Categories and the first page of expenses in one request
+        const [categoryResult, expenseResult] = await apiBatch([
+            { method: 'GET', path: '/category' },
+            { method: 'GET', path: '/expense' }
+        ]);
+
+        setCategories(categoryResult.status === 200 ? categoryResult.body : []);
+        if (expenseResult.status === 200) {
+            await loadExpenses(expenseResult.body, expenseResult.headers['X-Next-Cursor']);
+        } else {
+            expenses = [];
+            renderExpenses();
+        }
         await loadAllTags();
     } catch (error) {
         console.error('Error loading data:', error);
     }
 }
 
+function setCategories(list) {
+    categories = list;
+    renderCategories();
+    updateCategorySelects();
+}
+
 async function loadCategories() {
     try {
         const response = await fetch(`${API_BASE_URL}/category`, {
@@ -169,9 +210,7 @@ async function loadCategories() {
         
         if (!response.ok) throw new Error('Failed to load categories');
         
-        categories = await response.json();
-        renderCategories();
-        updateCategorySelects();
+        setCategories(await response.json());
         
     } catch (error) {
         console.error('Error loading categories:', error);
@@ -180,15 +219,26 @@ async function loadCategories() {
     }
 }
 
-async function loadExpenses() {
+async function loadExpenses(firstPage = null, nextCursor = null) {
     try {
-        const response = await fetch(`${API_BASE_URL}/expense`, {
-            headers: { 'Authorization': `Bearer ${accessToken}` }
-        });
-        
-        if (!response.ok) throw new Error('Failed to load expenses');
-        
-        expenses = await response.json();
+        // Follow the keyset cursor until the server stops returning one
+        let loaded = firstPage || [];
+        let cursor = firstPage ? nextCursor : null;
+        let fetchMore = !firstPage || Boolean(cursor);
+        while (fetchMore) {
+            const query = cursor ? `?cursor=${cursor}` : '';
+            const response = await fetch(`${API_BASE_URL}/expense${query}`, {
+                headers: { 'Authorization': `Bearer ${accessToken}` }
+            });
+
+            if (!response.ok) throw new Error('Failed to load expenses');
+
+            loaded = loaded.concat(await response.json());
+            cursor = response.headers.get('X-Next-Cursor');
+            fetchMore = Boolean(cursor);
+        }
+
+        expenses = loaded;
         renderExpenses();
         
     } catch (error) {
@@ -201,21 +251,20 @@ async function loadExpenses() {
 async function loadAllTags() {
     tagsByCategory = {};
     
-    for (const category of categories) {
-        try {
-            const response = await fetch(`${API_BASE_URL}/category/${category.id}/tag`, {
-                headers: { 'Authorization': `Bearer ${accessToken}` }
-            });
-            
-            if (response.ok) {
-                tagsByCategory[category.id] = await response.json();
-            } else {
-                tagsByCategory[category.id] = [];
-            }
-        } catch (error) {
-            console.error(`Error loading tags for category ${category.id}:`, error);
+    try {
+        // One batch for every category's tags instead of a request each
+        const results = await apiBatch(categories.map(category => ({
+            method: 'GET',
+            path: `/category/${category.id}/tag`
+        })));
+        categories.forEach((category, index) => {
+            tagsByCategory[category.id] = results[index].status === 200 ? results[index].body : [];
+        });
+    } catch (error) {
+        console.error('Error loading tags:', error);
+        categories.forEach(category => {
             tagsByCategory[category.id] = [];
-        }
+        });
     }
     
     renderTags();
@@ -499,37 +548,27 @@ async function handleAddExpense() {
     ).map(cb => cb.value);
 
     try {
-        // Create expense
-        const response = await fetch(`${API_BASE_URL}/expense`, {
+        // Create expense and link its tags in a single request
+        const response = await fetch(`${API_BASE_URL}/expense/bulk`, {
             method: 'POST',
             headers: {
                 'Authorization': `Bearer ${accessToken}`,
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify({
+            body: JSON.stringify([{
                 name,
                 price,
-                category_id: parseInt(categoryId)
-            })
+                category_id: parseInt(categoryId),
+                tag_ids: selectedTagIds.map(id => parseInt(id))
+            }])
         });
 
+        const data = await response.json();
         if (!response.ok) {
-            const data = await response.json();
             throw new Error(data.message || 'Failed to create expense');
         }
-
-        const newExpense = await response.json();
-
-        // Link tags to expense
-        for (const tagId of selectedTagIds) {
-            try {
-                await fetch(`${API_BASE_URL}/expense/${newExpense.id}/tag/${tagId}`, {
-                    method: 'POST',
-                    headers: { 'Authorization': `Bearer ${accessToken}` }
-                });
-            } catch (error) {
-                console.error('Error linking tag:', error);
-            }
+        if (data.created === 0) {
+            throw new Error('Failed to create expense');
         }
 
         // Close modal and refresh
@@ -711,36 +750,19 @@ async function handleUpdateExpense() {
             throw new Error(data.message || 'Failed to update expense');
         }
 
-        // Manage tags
-        const expense = expenses.find(e => e.id == id);
-        const currentTagIds = (expense.tag || []).map(t => String(t.id));
-
-        // Remove tags that were unchecked
-        for (const tagId of currentTagIds) {
-            if (!selectedTagIds.includes(tagId)) {
-                try {
-                    await fetch(`${API_BASE_URL}/expense/${id}/tag/${tagId}`, {
-                        method: 'DELETE',
-                        headers: { 'Authorization': `Bearer ${accessToken}` }
-                    });
-                } catch (error) {
-                    console.error('Error removing tag:', error);
-                }
-            }
-        }
+        // Replace the expense's tags in one call
+        const tagsResponse = await fetch(`${API_BASE_URL}/expense/${id}/tags`, {
+            method: 'PUT',
+            headers: {
+                'Authorization': `Bearer ${accessToken}`,
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({ tag_ids: selectedTagIds.map(tagId => parseInt(tagId)) })
+        });
 
-        // Add new tags
-        for (const tagId of selectedTagIds) {
-            if (!currentTagIds.includes(tagId)) {
-                try {
-                    await fetch(`${API_BASE_URL}/expense/${id}/tag/${tagId}`, {
-                        method: 'POST',
-                        headers: { 'Authorization': `Bearer ${accessToken}` }
-                    });
-                } catch (error) {
-                    console.error('Error adding tag:', error);
-                }
-            }
+        if (!tagsResponse.ok) {
+            const data = await tagsResponse.json();
+            throw new Error(data.message || 'Failed to update tags');
         }
 
         // Close modal and refresh
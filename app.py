@@ -1,35 +1,44 @@
 from flask import Flask
-from flask_smorest import Api
 import os 
 import secrets
-from db import db
+from db import db, engine_options, configure_sqlite
+from replicas import REPLICAS, replica_binds
+from shards import SHARDS, shard_binds
 import models
 from dotenv import load_dotenv
 from blocklist import BLOCKLIST
+from cache import RESPONSE_CACHE
+from passwords import PASSWORDS, LOGIN_THROTTLE
+from schema_check import warn_missing_indexes
+from instrumentation import INSTRUMENTATION
 from flask_jwt_extended import JWTManager
 from flask import jsonify
-from flask_migrate import Migrate
 from resources.expense import blp as ExpenseBlueprint
 from resources.category import blp as CategoryBlueprint
 from resources.tag import blp as TagBlueprint
 from resources.user import blp as UserBlueprint
+from resources.stats import blp as StatsBlueprint
+from resources.batch import blp as BatchBlueprint
+from resources.budget import blp as BudgetBlueprint
+from resources.recurring import blp as RecurringBlueprint
+from summaries import rebuild_budgets_command, rebuild_stats_command
+from deletes import BACKGROUND_DELETES
+from recurring import RECURRING
+from search import include_object
+from openapi import Api
+from assets import STATIC_ASSETS
 from flask_cors import CORS
 def create_app(db_url=None):
-    app = Flask(__name__)
     load_dotenv()
-    app = Flask(__name__, static_folder="FRONTEND", static_url_path="")
-
-    # Serve frontend
-    @app.route("/")
-    def serve_frontend():
-        return app.send_static_file("index.html")
-
-    @app.route("/<path:path>")
-    def serve_static(path):
-        return app.send_static_file(path)
+    # FRONTEND/ is served by STATIC_ASSETS rather than Flask's static route.
+    app = Flask(__name__, static_folder=None)
+    # Set by gunicorn.conf.py. A serving worker skips what only the CLI and
+    # the API docs need; see openapi.py.
+    app.config["SERVING"] = os.getenv("SERVING", "false").lower() == "true"
 
     # --- Your existing configs ---
-    CORS(app)  # Optional, but now frontend is served by same domain
+    CORS(app, expose_headers=["X-Next-Cursor", "X-Next-Offset"])  # Optional, but now frontend is served by same domain
+    STATIC_ASSETS.init_app(app)
 
     # --- Config ---
     app.config["PROPAGATE_EXCEPTIONS"] = True
@@ -39,16 +48,51 @@ def create_app(db_url=None):
     app.config["OPENAPI_URL_PREFIX"] = "/"
     app.config["OPENAPI_SWAGGER_UI_PATH"] = "/swagger-ui"
     app.config["OPENAPI_SWAGGER_UI_URL"] = "https://cdn.jsdelivr.net/npm/swagger-ui-dist/"
+    app.config["OPENAPI_LAZY"] = os.getenv("OPENAPI_LAZY", str(app.config["SERVING"])).lower() == "true"
+    app.config["OPENAPI_SPEC_CACHE"] = os.getenv("OPENAPI_SPEC_CACHE") or None
     app.config["SQLALCHEMY_DATABASE_URI"] = db_url or os.getenv("DATABASE_URL", "sqlite:///data.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["SQLALCHEMY_BINDS"] = {
+        **replica_binds(os.getenv("DATABASE_REPLICA_URLS"), engine_options),
+        **shard_binds(os.getenv("SHARD_URLS"), engine_options),
+    }
+    app.config["REPLICA_STICKY_SECONDS"] = int(os.getenv("REPLICA_STICKY_SECONDS", 5))
+    app.config["REPLICA_MAX_LAG"] = float(os.getenv("REPLICA_MAX_LAG", 10))
+    app.config["REPLICA_CHECK_INTERVAL"] = float(os.getenv("REPLICA_CHECK_INTERVAL", 2))
+    app.config["FAST_SERIALIZATION"] = os.getenv("FAST_SERIALIZATION", "true").lower() == "true"
+    app.config["BATCH_MAX_REQUESTS"] = int(os.getenv("BATCH_MAX_REQUESTS", 100))
 
     # --- Initialize extensions ---
     db.init_app(app)
-    migrate=Migrate(app, db)
+    with app.app_context():
+        for engine in db.engines.values():
+            configure_sqlite(engine)
+    REPLICAS.init_app(app)
+    SHARDS.init_app(app)
+    if not app.config["SERVING"]:
+        # Alembic is only needed by "flask db", and is slow to import.
+        from flask_migrate import Migrate
+        migrate=Migrate(app, db, include_object=include_object)
     api = Api(app)
+    RESPONSE_CACHE.init_app(app)
 
     app.config["JWT_SECRET_KEY"]= "pranav"
+    app.config["REVOCATION_STORE"] = os.getenv("REVOCATION_STORE") or "database"
+    app.config["REVOCATION_SYNC_OVERLAP"] = float(os.getenv("REVOCATION_SYNC_OVERLAP", 60))
     jwt = JWTManager(app)
+    BLOCKLIST.init_app(app)
+
+    app.config["PASSWORD_HASH_ROUNDS"] = int(os.getenv("PASSWORD_HASH_ROUNDS", 29000))
+    app.config["PASSWORD_POOL_WORKERS"] = int(os.getenv("PASSWORD_POOL_WORKERS", 2))
+    PASSWORDS.init_app(app)
+    LOGIN_THROTTLE.init_app(app)
+    app.config["CATEGORY_DELETE_CHUNK_SIZE"] = int(os.getenv("CATEGORY_DELETE_CHUNK_SIZE", 5000))
+    BACKGROUND_DELETES.init_app(app)
+    app.config["RECURRING_SCHEDULER"] = os.getenv("RECURRING_SCHEDULER", "false").lower() == "true"
+    app.config["RECURRING_INTERVAL"] = float(os.getenv("RECURRING_INTERVAL", 60))
+    app.config["RECURRING_LEASE_SECONDS"] = float(os.getenv("RECURRING_LEASE_SECONDS", 300))
+    RECURRING.init_app(app)
 
     @jwt.token_in_blocklist_loader
     def check_if_token_in_blocklist(jwt_header, jwt_payload):
@@ -57,7 +101,8 @@ def create_app(db_url=None):
     @jwt.additional_claims_loader
     def add_claims_to_jwt(identity):
     #     # TODO: Read from a config file instead of hard-coding
-        if identity == 1:
+        # Identities are issued as strings (see resources/user.py).
+        if str(identity) == "1":
             return {"is_admin": True}
         return {"is_admin": False}
 
@@ -107,6 +152,22 @@ def create_app(db_url=None):
     api.register_blueprint(CategoryBlueprint)
     api.register_blueprint(TagBlueprint)
     api.register_blueprint(UserBlueprint)
+    api.register_blueprint(StatsBlueprint)
+    api.register_blueprint(BatchBlueprint)
+    api.register_blueprint(BudgetBlueprint)
+    api.register_blueprint(RecurringBlueprint)
+
+    app.cli.add_command(rebuild_stats_command)
+    app.cli.add_command(rebuild_budgets_command)
+
+    app.config["INSTRUMENTATION_ENABLED"] = os.getenv("INSTRUMENTATION", "false").lower() == "true"
+    app.config["PROFILE_SAMPLE_RATE"] = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+    app.config["PROFILE_SLOW_MS"] = int(os.getenv("PROFILE_SLOW_MS", 500))
+    app.config["PROFILE_DIR"] = os.getenv("PROFILE_DIR") or None
+    INSTRUMENTATION.init_app(app)
+
+    if app.config.setdefault("SCHEMA_CHECK_ON_STARTUP", True):
+        warn_missing_indexes(app)
 
 
     return app
@@ -0,0 +1,130 @@
+"""
+assets.py
+
+Serves the bundled frontend from memory.
+
+At startup every file in FRONTEND/ up to STATIC_MEMORY_MAX_BYTES is read once,
+fingerprinted with a hash of its content and compressed with gzip (and Brotli
+when the brotli package is installed). The fingerprinted copies are served
+under /assets/ with "Cache-Control: immutable", so browsers keep them until
+the content changes. index.html is rewritten to point at those names and is
+itself served with "no-cache" and an ETag, so a deploy is picked up on the
+next page load with a 304 otherwise. Original names still work, uncached.
+
+Repeat requests cost no disk I/O: the response body is the stored bytes of
+whichever encoding the client accepts.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+
+from flask import Response, abort, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional, gzip only without it
+    brotli = None
+
+INDEX = "index.html"
+# src="app.js" / href="styles.css"; only names of files in FRONTEND/ are rewritten.
+REFERENCE = re.compile(r'(\b(?:src|href)=")([^"/:?#]+)(")')
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class Asset:
+    def __init__(self, body, mimetype):
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:16]
+        self.bodies = {"identity": body}
+        compressed = gzip.compress(body, compresslevel=9, mtime=0)
+        if len(compressed) < len(body):
+            self.bodies["gzip"] = compressed
+        if brotli is not None:
+            compressed = brotli.compress(body, quality=11)
+            if len(compressed) < len(body):
+                self.bodies["br"] = compressed
+
+    def fingerprinted(self, name):
+        stem, extension = os.path.splitext(name)
+        return "{}.{}{}".format(stem, self.etag[:12], extension)
+
+    def response(self, cache_control):
+        # Prefer the smallest encoding the client accepts.
+        encodings = sorted(self.bodies, key=lambda encoding: len(self.bodies[encoding]))
+        encoding = next(
+            (encoding for encoding in encodings if encoding == "identity" or request.accept_encodings[encoding]),
+            "identity",
+        )
+        response = Response(self.bodies[encoding], mimetype=self.mimetype)
+        if encoding != "identity":
+            response.headers["Content-Encoding"] = encoding
+        response.headers["Cache-Control"] = cache_control
+        response.vary.add("Accept-Encoding")
+        # A different tag per encoding, since the bytes differ.
+        response.set_etag(self.etag if encoding == "identity" else "{}-{}".format(self.etag, encoding))
+        return response.make_conditional(request)
+
+
+class StaticAssets:
+    def __init__(self):
+        self.folder = None
+        self.assets = {}
+        self.by_fingerprint = {}
+
+    def init_app(self, app):
+        self.folder = app.config.setdefault("FRONTEND_DIR", os.path.join(app.root_path, "FRONTEND"))
+        max_bytes = app.config.setdefault("STATIC_MEMORY_MAX_BYTES", 1024 * 1024)
+        self.load(max_bytes)
+
+        app.add_url_rule("/", "frontend_index", self.index)
+        app.add_url_rule("/assets/<name>", "frontend_asset", self.fingerprinted_asset)
+        # Exact rules for the original names, so there is no catch-all route
+        # for API paths to be tested against.
+        for name in os.listdir(self.folder):
+            if name != INDEX and os.path.isfile(os.path.join(self.folder, name)):
+                app.add_url_rule("/" + name, "frontend_" + name.replace(".", "_"), self.asset, defaults={"name": name})
+
+    def load(self, max_bytes):
+        self.assets, self.by_fingerprint = {}, {}
+        names = sorted(os.listdir(self.folder))
+        for name in names:
+            path = os.path.join(self.folder, name)
+            if name == INDEX or not os.path.isfile(path) or os.path.getsize(path) > max_bytes:
+                continue
+            with open(path, "rb") as f:
+                asset = Asset(f.read(), mimetypes.guess_type(name)[0] or "application/octet-stream")
+            self.assets[name] = asset
+            self.by_fingerprint[asset.fingerprinted(name)] = asset
+
+        with open(os.path.join(self.folder, INDEX), encoding="utf-8") as f:
+            html = f.read()
+        html = REFERENCE.sub(self.rewrite_reference, html)
+        self.assets[INDEX] = Asset(html.encode("utf-8"), "text/html")
+
+    def rewrite_reference(self, match):
+        name = match.group(2)
+        asset = self.assets.get(name)
+        if asset is None:
+            return match.group(0)
+        return "{}/assets/{}{}".format(match.group(1), asset.fingerprinted(name), match.group(3))
+
+    def index(self):
+        return self.assets[INDEX].response("no-cache")
+
+    def fingerprinted_asset(self, name):
+        asset = self.by_fingerprint.get(name)
+        if asset is None:
+            abort(404)
+        return asset.response(IMMUTABLE)
+
+    def asset(self, name):
+        asset = self.assets.get(name)
+        if asset is None:
+            # Too large to keep in memory.
+            return send_from_directory(self.folder, name)
+        return asset.response("no-cache")
+
+
+STATIC_ASSETS = StaticAssets()
@@ -0,0 +1,314 @@
+"""
+benchmarks/api.py
+
+Load test for the REST API. Seeds a throwaway SQLite database, then drives
+each endpoint through the Flask test client (in-process, with SQL statement
+counts) and through a multi-worker gunicorn server (over HTTP, with
+concurrency). Prints JSON with p50/p95/p99 latency, throughput, SQL per
+request and peak RSS per scenario.
+
+    python -m benchmarks.api --expenses 50000 --output results.json
+    python -m benchmarks.api --compare results.json --tolerance 0.2
+
+The run exits non-zero when any request of any scenario fails. With --compare
+it also does when a scenario fails more requests than in the baseline, its
+p95 latency grows by more than the tolerance, or it issues more SQL
+statements than the baseline.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from benchmarks.seed import BENCH_PASSWORD, BENCH_USERNAME, seed
+from db import db
+from loaders import count_queries
+from models import CategoryModel, ExpenseModel, TagModel
+from passwords import LOGIN_THROTTLE
+
+# Cheap hashes keep the login scenario about the endpoint, not pbkdf2.
+BENCH_HASH_ROUNDS = "1000"
+
+
+def make_app(db_url):
+    os.environ.setdefault("PASSWORD_HASH_ROUNDS", BENCH_HASH_ROUNDS)
+    app = create_app(db_url)
+    app.config["LOGIN_THROTTLE_PER_USER"] = (10 ** 9, 1)
+    app.config["LOGIN_THROTTLE_PER_ADDRESS"] = (10 ** 9, 1)
+    app.config["LOGIN_THROTTLE_REGISTER_PER_ADDRESS"] = (10 ** 9, 1)
+    LOGIN_THROTTLE.init_app(app)
+    return app
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, wall, sql_counts=None):
+    latencies = sorted(latencies)
+    result = {
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+        "p50_ms": 1000 * percentile(latencies, 0.50),
+        "p95_ms": 1000 * percentile(latencies, 0.95),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "throughput_rps": len(latencies) / wall if wall else 0.0,
+    }
+    if sql_counts:
+        result["sql_per_request"] = sum(sql_counts) / len(sql_counts)
+    return result
+
+
+class Scenarios:
+    """Request factories for every endpoint, built from the seeded ids."""
+
+    def __init__(self, app, rng):
+        self.rng = rng
+        with app.app_context():
+            self.expense_ids = [row.id for row in db.session.query(ExpenseModel.id)]
+            self.category_ids = [row.id for row in db.session.query(CategoryModel.id)]
+            self.tag_ids = [row.id for row in db.session.query(TagModel.id)]
+            self.tags_by_category = {}
+            for tag_id, category_id in db.session.query(TagModel.id, TagModel.category_id):
+                self.tags_by_category.setdefault(category_id, []).append(tag_id)
+            self.expense_categories = dict(db.session.query(ExpenseModel.id, ExpenseModel.category_id))
+            token = create_access_token(identity="1", fresh=True)
+        self.auth = {"Authorization": "Bearer " + token}
+
+    def all(self):
+        rng = self.rng
+        return {
+            "list_expenses": lambda: ("GET", "/expense?limit=100", None, self.auth),
+            "filter_expenses": lambda: (
+                "GET", "/expense?limit=100&category_id={}".format(rng.choice(self.category_ids)), None, self.auth,
+            ),
+            "get_expense": lambda: ("GET", "/expense/{}".format(rng.choice(self.expense_ids)), None, self.auth),
+            "list_categories": lambda: ("GET", "/category", None, self.auth),
+            "get_category": lambda: ("GET", "/category/{}".format(rng.choice(self.category_ids)), None, self.auth),
+            "category_tags": lambda: ("GET", "/category/{}/tag".format(rng.choice(self.category_ids)), None, self.auth),
+            "get_tag": lambda: ("GET", "/tag/{}".format(rng.choice(self.tag_ids)), None, self.auth),
+            "category_stats": lambda: ("GET", "/stats/category", None, self.auth),
+            "create_expense": lambda: (
+                "POST",
+                "/expense",
+                {"name": "bench", "price": round(rng.uniform(1, 500), 2), "category_id": rng.choice(self.category_ids)},
+                self.auth,
+            ),
+            "link_tag": lambda: (
+                "POST",
+                "/expense/{}/tag/{}".format(rng.choice(self.expense_ids), rng.choice(self.tag_ids)),
+                None,
+                self.auth,
+            ),
+            "replace_tags": lambda: self.replace_tags(),
+            "login": lambda: ("POST", "/login", {"username": BENCH_USERNAME, "password": BENCH_PASSWORD}, {}),
+        }
+
+
+    def replace_tags(self):
+        expense_id = self.rng.choice(self.expense_ids)
+        tags = self.tags_by_category.get(self.expense_categories[expense_id], [])
+        tag_ids = self.rng.sample(tags, self.rng.randint(0, len(tags)))
+        return "PUT", "/expense/{}/tags".format(expense_id), {"tag_ids": tag_ids}, self.auth
+
+
+def run_client(app, scenarios, requests):
+    client = app.test_client()
+    results = {}
+    with app.app_context():
+        for name, make_request in scenarios.items():
+            latencies, sql_counts, errors = [], [], 0
+            started = time.perf_counter()
+            for _ in range(requests):
+                method, path, body, headers = make_request()
+                with count_queries() as counter:
+                    start = time.perf_counter()
+                    response = client.open(path, method=method, json=body, headers=headers)
+                    response.get_data()
+                    latencies.append(time.perf_counter() - start)
+                sql_counts.append(counter.count)
+                if response.status_code >= 400:
+                    errors += 1
+            results[name] = summarize(latencies, errors, time.perf_counter() - started, sql_counts)
+    return {
+        "scenarios": results,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(base_url + "/swagger-ui", timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Benchmark server did not come up at " + base_url)
+
+
+def http_request(base_url, method, path, body, headers):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method, headers=dict(headers))
+    if data is not None:
+        request.add_header("Content-Type", "application/json")
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            response.read()
+            ok = True
+    except urllib.error.HTTPError as e:
+        e.read()
+        ok = e.code < 400
+    return time.perf_counter() - start, ok
+
+
+def run_server(db_url, scenarios, requests, workers, concurrency, server_args=()):
+    port = free_port()
+    base_url = "http://127.0.0.1:{}".format(port)
+    env = dict(os.environ, BENCH_DATABASE_URL=db_url)
+    env.setdefault("PASSWORD_HASH_ROUNDS", BENCH_HASH_ROUNDS)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--bind", "127.0.0.1:{}".format(port),
+         "--workers", str(workers), "--log-level", "warning", *server_args, "benchmarks.wsgi:app"],
+        env=env,
+    )
+    try:
+        wait_until_up(base_url)
+        results = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name, make_request in scenarios.items():
+                planned = [make_request() for _ in range(requests)]
+                started = time.perf_counter()
+                outcomes = list(pool.map(lambda args: http_request(base_url, *args), planned))
+                wall = time.perf_counter() - started
+                results[name] = summarize(
+                    [latency for latency, _ in outcomes],
+                    sum(1 for _, ok in outcomes if not ok),
+                    wall,
+                )
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return {
+        "scenarios": results,
+        "workers": workers,
+        "concurrency": concurrency,
+        # Largest resident set of any finished child, i.e. a gunicorn worker.
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    }
+
+
+def find_regressions(results, baseline, tolerance):
+    regressions = []
+    for mode, run in results["modes"].items():
+        base_run = baseline.get("modes", {}).get(mode)
+        if base_run is None:
+            continue
+        for name, current in run["scenarios"].items():
+            base = base_run["scenarios"].get(name)
+            if base is None:
+                continue
+            # A scenario that starts failing gets faster; count that first.
+            if current["errors"] > base.get("errors", 0):
+                regressions.append("{} {}: {} failed requests > baseline {}".format(
+                    mode, name, current["errors"], base.get("errors", 0)))
+            if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+                regressions.append("{} {}: p95 {:.2f}ms > baseline {:.2f}ms".format(
+                    mode, name, current["p95_ms"], base["p95_ms"]))
+            if current.get("sql_per_request", 0) > base.get("sql_per_request", float("inf")):
+                regressions.append("{} {}: {:.1f} SQL statements per request > baseline {:.1f}".format(
+                    mode, name, current["sql_per_request"], base["sql_per_request"]))
+    return regressions
+
+
+def find_errors(results):
+    return [
+        "{} {}: {} of {} requests failed".format(mode, name, current["errors"], current["requests"])
+        for mode, run in results["modes"].items()
+        for name, current in run["scenarios"].items()
+        if current["errors"]
+    ]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--categories", type=int, default=20)
+    parser.add_argument("--tags-per-category", type=int, default=5)
+    parser.add_argument("--expenses", type=int, default=10_000)
+    parser.add_argument("--links-per-expense", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--mode", choices=["client", "server", "both"], default="both")
+    parser.add_argument("--workers", type=int, default=4, help="gunicorn workers in server mode")
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads in server mode")
+    parser.add_argument("--scenario", action="append", help="only run these scenarios")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    parser.add_argument("--compare", help="baseline results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth, 0.2 = 20%%")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = "sqlite:///" + os.path.join(workdir, "bench.db")
+        app = make_app(db_url)
+        with app.app_context():
+            seeded = seed(args.categories, args.tags_per_category, args.expenses, args.links_per_expense, args.seed)
+
+        scenarios = Scenarios(app, random.Random(args.seed)).all()
+        if args.scenario:
+            scenarios = {name: scenarios[name] for name in args.scenario}
+
+        results = {"config": vars(args), "seeded": seeded, "modes": {}}
+        if args.mode in ("client", "both"):
+            results["modes"]["client"] = run_client(app, scenarios, args.requests)
+        if args.mode in ("server", "both"):
+            results["modes"]["server"] = run_server(db_url, scenarios, args.requests, args.workers, args.concurrency)
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    failed = False
+    for error in find_errors(results):
+        print("ERROR " + error, file=sys.stderr)
+        failed = True
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = find_regressions(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression, file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+benchmarks/seed.py
+
+Fills a throwaway database with synthetic categories, tags, expenses and tag
+links for the benchmarks. Rows go in with multi-row INSERTs, so seeding a few
+hundred thousand expenses takes seconds rather than minutes.
+"""
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from db import db
+from models import CategoryModel, ExpenseModel, ExpenseTags, TagModel, UserModel
+from passwords import PASSWORDS
+from summaries import rebuild_summaries
+
+CHUNK_SIZE = 5000
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+def insert_chunked(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def seed(categories=20, tags_per_category=5, expenses=10_000, links_per_expense=2, seed=0):
+    """Create all tables and seed them; must run inside an app context."""
+    rng = random.Random(seed)
+    db.create_all()
+
+    insert_chunked(UserModel, [{"username": BENCH_USERNAME, "password": PASSWORDS.hash(BENCH_PASSWORD)}])
+    # Everything belongs to the bench user.
+    user_id = db.session.query(UserModel.id).filter(UserModel.username == BENCH_USERNAME).scalar()
+    insert_chunked(CategoryModel, [{"user_id": user_id, "name": "category-{}".format(i)} for i in range(categories)])
+    category_ids = [row.id for row in db.session.query(CategoryModel.id)]
+
+    insert_chunked(TagModel, [
+        {"user_id": user_id, "name": "tag-{}".format(i), "category_id": category_id}
+        for category_id in category_ids
+        for i in range(tags_per_category)
+    ])
+    tags_by_category = {}
+    for tag_id, category_id in db.session.query(TagModel.id, TagModel.category_id):
+        tags_by_category.setdefault(category_id, []).append(tag_id)
+
+    now = datetime.utcnow()
+    expense_rows = []
+    for i in range(expenses):
+        expense_rows.append({
+            "user_id": user_id,
+            "name": "expense-{}".format(i),
+            "price": round(rng.uniform(1, 500), 2),
+            "category_id": rng.choice(category_ids),
+            "created_at": now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+        })
+    insert_chunked(ExpenseModel, expense_rows)
+
+    links = []
+    expense_ids = db.session.query(ExpenseModel.id, ExpenseModel.category_id)
+    for expense_id, category_id in expense_ids:
+        tags = tags_by_category.get(category_id, [])
+        for tag_id in rng.sample(tags, min(links_per_expense, len(tags))):
+            links.append({"expense_id": expense_id, "tag_id": tag_id})
+    insert_chunked(ExpenseTags, links)
+    db.session.commit()
+
+    rebuild_summaries()
+    return {
+        "categories": len(category_ids),
+        "tags": sum(len(tags) for tags in tags_by_category.values()),
+        "expenses": expenses,
+        "links": len(links),
+    }
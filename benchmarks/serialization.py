@@ -0,0 +1,119 @@
+"""
+benchmarks/serialization.py
+
+Timing for the expense list fast path. Seeds a throwaway database (plus rows
+with non-ASCII names, zero, negative and huge prices and no tags), then times
+GET /expense with a range of filters through ExpenseSchema and through
+serializers.py. tests/test_serializers.py checks that both give the same
+bytes for the same paths and rows.
+
+    python -m benchmarks.serialization --expenses 20000 --limit 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import insert
+
+from benchmarks.api import make_app
+from benchmarks.seed import seed
+from db import db
+from models import CategoryModel, ExpenseModel, ExpenseTags, TagModel
+
+EDGE_NAMES = ["café", "naïve ☕", "tab\there", "quote \" and \\ slash /", "del\x7f", "emoji 🧾", ""]
+EDGE_PRICES = ["0", "-0.00", "0.01", "0.29", "2.67", "1234567890123.45", "10000000000000000", "-12.50", "7"]
+
+
+def seed_edge_cases(user_id=1):
+    category = db.session.execute(
+        insert(CategoryModel).values(user_id=user_id, name="édge").returning(CategoryModel.id)
+    ).scalar()
+    tag_ids = [
+        db.session.execute(
+            insert(TagModel).values(user_id=user_id, name=name, category_id=category).returning(TagModel.id)
+        ).scalar()
+        for name in ("zeta", "alpha", "ünïcode")
+    ]
+    expense_ids = []
+    for i, price in enumerate(EDGE_PRICES):
+        expense_ids.append(db.session.execute(
+            insert(ExpenseModel)
+            .values(user_id=user_id, name=EDGE_NAMES[i % len(EDGE_NAMES)], price=price, category_id=category)
+            .returning(ExpenseModel.id)
+        ).scalar())
+    # Links inserted out of tag order; both paths must still list tags by id.
+    links = [
+        {"expense_id": expense_id, "tag_id": tag_id}
+        for index, expense_id in enumerate(expense_ids)
+        for tag_id in reversed(tag_ids[: index % 4])
+    ]
+    db.session.execute(insert(ExpenseTags), links)
+    db.session.commit()
+    return category
+
+
+def queries(category_ids, limit):
+    paths = [
+        "/expense?limit={}".format(limit),
+        "/expense?limit=7",
+        "/expense?limit=50&cursor=25",
+        "/expense?limit={}&min_price=100&max_price=200".format(limit),
+        "/expense?limit={}&name=expense-1".format(limit),
+        "/expense?limit=100&tag_id=1",
+        "/expense?stream=true&max_price=50",
+    ]
+    paths += ["/expense?limit={}&category_id={}".format(limit, category_id) for category_id in category_ids]
+    return paths
+
+
+def fetch(app, client, path, headers, fast):
+    """Time one request; return the time with the status, X-Next-Cursor and body."""
+    app.config["FAST_SERIALIZATION"] = fast
+    start = time.perf_counter()
+    response = client.get(path, headers=headers)
+    body = response.get_data()
+    # Ends a streamed response's request context, and its connection.
+    response.close()
+    return time.perf_counter() - start, response.status_code, response.headers.get("X-Next-Cursor"), body
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5, help="timed requests per path and serializer")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    timings = {"schema": 0.0, "fast": 0.0}
+    with tempfile.TemporaryDirectory() as workdir:
+        app = make_app("sqlite:///" + os.path.join(workdir, "serialization.db"))
+        client = app.test_client()
+        with app.app_context():
+            seed(categories=5, tags_per_category=4, expenses=args.expenses, seed=args.seed)
+            seed_edge_cases()
+            category_ids = [row.id for row in db.session.query(CategoryModel.id)]
+            headers = {"Authorization": "Bearer " + create_access_token(identity="1")}
+
+            for path in queries(category_ids, args.limit):
+                for _ in range(args.repeat):
+                    timings["schema"] += fetch(app, client, path, headers, fast=False)[0]
+                    timings["fast"] += fetch(app, client, path, headers, fast=True)[0]
+
+    print(json.dumps({
+        "schema_seconds": timings["schema"],
+        "fast_seconds": timings["fast"],
+        "speedup": timings["schema"] / timings["fast"] if timings["fast"] else 0.0,
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+benchmarks/serving.py
+
+Compares gunicorn serving modes (see serving.py) at the same number of
+concurrent requests: by default 16 sync worker processes against 2 gthread
+workers of 8 threads. Each statement waits BENCH_DB_LATENCY_MS (default 2ms)
+to stand in for a database server, so the endpoints are I/O-bound as they
+are in production. Prints JSON with throughput and latency per scenario, and
+the peak resident memory of the whole server, in total and per concurrent
+request.
+
+    python -m benchmarks.serving --concurrency 16 --threads 8
+"""
+import argparse
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.api import Scenarios, free_port, http_request, make_app, summarize, wait_until_up
+from benchmarks.seed import seed
+
+# Read-only, so SQLite's single writer doesn't skew the comparison.
+DEFAULT_SCENARIOS = ["get_expense", "list_expenses", "get_category", "category_stats"]
+
+
+def process_tree(pid):
+    pids = [pid]
+    for parent in pids:
+        try:
+            with open("/proc/{0}/task/{0}/children".format(parent)) as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def rss_kb(pid):
+    try:
+        with open("/proc/{}/status".format(pid)) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+class MemorySampler(threading.Thread):
+    """Tracks the largest combined RSS of a process and its descendants (Linux only)."""
+
+    def __init__(self, pid, interval=0.1):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.peak_kb = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak_kb = max(self.peak_kb, sum(rss_kb(pid) for pid in process_tree(self.pid)))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def run_mode(db_url, scenarios, requests, concurrency, worker_class, workers, threads, latency_ms):
+    port = free_port()
+    base_url = "http://127.0.0.1:{}".format(port)
+    env = dict(
+        os.environ,
+        BENCH_DATABASE_URL=db_url,
+        BENCH_DB_LATENCY_MS=str(latency_ms),
+        WEB_BIND="127.0.0.1:{}".format(port),
+        WEB_WORKER_CLASS=worker_class,
+        WEB_WORKERS=str(workers),
+        WEB_THREADS=str(threads),
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "--log-level", "warning", "benchmarks.wsgi:app"],
+        env=env,
+    )
+    sampler = MemorySampler(server.pid)
+    try:
+        wait_until_up(base_url)
+        sampler.start()
+        results = {}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name, make_request in scenarios.items():
+                planned = [make_request() for _ in range(requests)]
+                started = time.perf_counter()
+                outcomes = list(pool.map(lambda args: http_request(base_url, *args), planned))
+                wall = time.perf_counter() - started
+                results[name] = summarize(
+                    [latency for latency, _ in outcomes],
+                    sum(1 for _, ok in outcomes if not ok),
+                    wall,
+                )
+    finally:
+        sampler.stop()
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=30)
+    return {
+        "worker_class": worker_class,
+        "workers": workers,
+        "threads": threads,
+        "scenarios": results,
+        "peak_rss_kb": sampler.peak_kb,
+        "rss_kb_per_concurrent_request": sampler.peak_kb / (workers * threads),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="client threads, and requests the server runs at once")
+    parser.add_argument("--threads", type=int, default=8, help="threads per gthread worker")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="simulated database round trip")
+    parser.add_argument("--scenario", action="append", help="only run these scenarios")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.concurrency % args.threads:
+        sys.exit("--concurrency must be a multiple of --threads")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = "sqlite:///" + os.path.join(workdir, "bench.db")
+        app = make_app(db_url)
+        with app.app_context():
+            seeded = seed(expenses=args.expenses, seed=args.seed)
+        scenarios = Scenarios(app, random.Random(args.seed)).all()
+        scenarios = {name: scenarios[name] for name in args.scenario or DEFAULT_SCENARIOS}
+
+        modes = {
+            "sync": run_mode(db_url, scenarios, args.requests, args.concurrency,
+                             "sync", args.concurrency, 1, args.latency_ms),
+            "gthread": run_mode(db_url, scenarios, args.requests, args.concurrency,
+                                "gthread", args.concurrency // args.threads, args.threads, args.latency_ms),
+        }
+
+    output = json.dumps({"config": vars(args), "seeded": seeded, "modes": modes}, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""
+benchmarks/startup.py
+
+Worker startup time. Starts fresh interpreters that import app and call
+create_app(), both as a serving worker (SERVING=true, as gunicorn.conf.py sets
+it) and as the CLI, and reports the median import and create_app times. One
+extra run under "python -X importtime" lists the slowest modules imported
+by app in serving mode.
+
+    python -m benchmarks.startup --runs 5 --budget-ms 1500
+
+With --budget-ms the run exits non-zero when the median serving startup
+(import plus create_app) is over budget, so the number is tracked like a
+test.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({"import_ms": 1000 * (imported - start), "create_ms": 1000 * (created - imported)}))
+"""
+
+
+def probe(db_url, serving):
+    env = dict(os.environ, SERVING="true" if serving else "false")
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE, db_url], env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_imports(top):
+    """Return the ``top`` modules app pulls in directly, by cumulative import time."""
+    env = dict(os.environ, SERVING="true")
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], env=env, check=True, capture_output=True, text=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Two spaces of indent: imported by app itself.
+        if name.startswith("   ") and not name.startswith("    ") and cumulative.strip().isdigit():
+            modules.append({"module": name.strip(), "cumulative_ms": int(cumulative) / 1000})
+    modules.sort(key=lambda module: module["cumulative_ms"], reverse=True)
+    return modules[:top]
+
+
+def measure(db_url, serving, runs):
+    samples = [probe(db_url, serving) for _ in range(runs)]
+    imports = [sample["import_ms"] for sample in samples]
+    creates = [sample["create_ms"] for sample in samples]
+    return {
+        "import_ms": statistics.median(imports),
+        "create_app_ms": statistics.median(creates),
+        "total_ms": statistics.median(i + c for i, c in zip(imports, creates)),
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per mode")
+    parser.add_argument("--top", type=int, default=10, help="slowest imports to list")
+    parser.add_argument("--budget-ms", type=float, help="fail if median serving startup exceeds this")
+    parser.add_argument("--output", help="write results JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_url = "sqlite:///" + os.path.join(workdir, "startup.db")
+        # The first interpreter pays for writing bytecode caches.
+        probe(db_url, True)
+        results = {
+            "config": vars(args),
+            "modes": {
+                "serving": measure(db_url, True, args.runs),
+                "cli": measure(db_url, False, args.runs),
+            },
+            "slowest_imports": slowest_imports(args.top),
+        }
+
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+    serving_ms = results["modes"]["serving"]["total_ms"]
+    if args.budget_ms is not None and serving_ms > args.budget_ms:
+        print("OVER BUDGET serving startup {:.0f}ms > {:.0f}ms".format(serving_ms, args.budget_ms), file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,26 @@
+"""
+benchmarks/wsgi.py
+
+Entry point for the multi-worker benchmark server:
+
+    BENCH_DATABASE_URL=sqlite:////tmp/bench.db gunicorn "benchmarks.wsgi:app"
+
+BENCH_DB_LATENCY_MS adds a sleep before every SQL statement, standing in for
+the network round trip to a database server.
+"""
+import os
+import time
+
+from sqlalchemy import event
+
+from benchmarks.api import make_app
+from db import db
+
+app = make_app(os.environ["BENCH_DATABASE_URL"])
+
+latency = float(os.getenv("BENCH_DB_LATENCY_MS", 0)) / 1000
+if latency:
+    with app.app_context():
+        @event.listens_for(db.engine, "before_cursor_execute")
+        def simulate_round_trip(conn, cursor, statement, parameters, context, executemany):
+            time.sleep(latency)
@@ -1,9 +1,225 @@
 """
 blocklist.py
 
-This file just contains the blocklist of the JWT tokens. It will be imported by
-app and the logout resource so that tokens can be added to the blocklist when the
+This file contains the blocklist of revoked JWT tokens. It is imported by app
+and the logout resource so that tokens can be added to the blocklist when the
 user logs out.
+
+Revoked JTIs live in a shared store so that a logout handled by one gunicorn
+worker is seen by all of them, and every entry expires with the token's "exp"
+claim. Three stores are available, picked with the REVOCATION_STORE setting:
+
+- "memory": a per-process LRU/TTL dict, only suitable for a single worker.
+- "database" (default): the revoked_token table.
+- "redis://...": any server speaking the Redis protocol (needs ``redis``).
+
+Each worker keeps a Bloom filter of the JTIs it knows are revoked and pulls
+new revocations from the store at most every REVOCATION_SYNC_INTERVAL
+seconds, so checking a token that was never revoked costs no round trip.
+
+A pull asks for what was revoked since the newest revocation seen, less
+REVOCATION_SYNC_OVERLAP seconds. Revocations are stamped before they commit
+and on more than one host's clock, so one can become visible after a later
+one was pulled; the overlap reads it again rather than miss it. It must
+exceed the longest revocation transaction plus the clock skew between hosts.
 """
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from sqlalchemy import delete, select
+
+from db import db
+from models import RevokedTokenModel
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+
+class BloomFilter:
+    def __init__(self, capacity=100_000, hashes=7):
+        # ~10 bits per entry keeps the false positive rate around 1%.
+        self.size = capacity * 10
+        self.hashes = hashes
+        self.bits = bytearray(self.size // 8 + 1)
+        self.count = 0
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class MemoryRevocationStore:
+    def __init__(self, max_size=100_000):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, jti, expires_at):
+        with self.lock:
+            self.entries[jti] = expires_at
+            self.entries.move_to_end(jti)
+            if len(self.entries) > self.max_size:
+                self.evict_expired()
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def contains(self, jti):
+        with self.lock:
+            expires_at = self.entries.get(jti)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self.entries[jti]
+                return False
+            return True
+
+    def evict_expired(self):
+        now = time.time()
+        for jti in [jti for jti, expires_at in self.entries.items() if expires_at <= now]:
+            del self.entries[jti]
+
+    def revoked_since(self, since):
+        # Everything lives in this process already, there is nothing to pull.
+        with self.lock:
+            return (list(self.entries) if since is None else []), 0
+
+
+class DatabaseRevocationStore:
+    # Expired rows are purged on roughly one revocation in this many.
+    purge_every = 100
+
+    def __init__(self):
+        self.writes = 0
+
+    def add(self, jti, expires_at):
+        db.session.add(RevokedTokenModel(jti=jti, expires_at=expires_at, revoked_at=time.time()))
+        self.writes += 1
+        if self.writes % self.purge_every == 0:
+            db.session.execute(delete(RevokedTokenModel).where(RevokedTokenModel.expires_at <= time.time()))
+        db.session.commit()
+
+    def contains(self, jti):
+        return db.session.execute(
+            select(RevokedTokenModel.id).where(
+                RevokedTokenModel.jti == jti,
+                RevokedTokenModel.expires_at > time.time(),
+            )
+        ).first() is not None
+
+    def revoked_since(self, since):
+        """Return the JTIs revoked at or after ``since`` (None: ever) and the newest revocation time."""
+        query = select(RevokedTokenModel.revoked_at, RevokedTokenModel.jti).where(
+            RevokedTokenModel.expires_at > time.time()
+        )
+        if since is not None:
+            query = query.where(RevokedTokenModel.revoked_at >= since)
+        rows = db.session.execute(query.order_by(RevokedTokenModel.revoked_at)).all()
+        return [jti for _, jti in rows], rows[-1].revoked_at if rows else None
+
+
+class RedisRevocationStore:
+    prefix = "revoked:"
+    log_key = "revoked:log"
+
+    def __init__(self, url, max_lifetime):
+        if redis is None:
+            raise RuntimeError("The redis package is required for a redis:// REVOCATION_STORE.")
+        self.client = redis.Redis.from_url(url)
+        self.max_lifetime = max_lifetime
+
+    def add(self, jti, expires_at):
+        now = time.time()
+        pipe = self.client.pipeline()
+        pipe.set(self.prefix + jti, 1, exat=int(expires_at))
+        # The log is scored by revocation time so workers can pull what is new;
+        # nothing in it can outlive the longest-lived token.
+        pipe.zadd(self.log_key, {jti: now})
+        pipe.zremrangebyscore(self.log_key, "-inf", now - self.max_lifetime)
+        pipe.execute()
+
+    def contains(self, jti):
+        return bool(self.client.exists(self.prefix + jti))
+
+    def revoked_since(self, since):
+        low = "-inf" if since is None else since
+        entries = self.client.zrangebyscore(self.log_key, low, "+inf", withscores=True)
+        return [jti.decode() for jti, _ in entries], entries[-1][1] if entries else None
+
+
+class RevocationList:
+    """Front for a revocation store with a per-worker negative-lookup cache."""
+
+    def __init__(self):
+        self.store = MemoryRevocationStore()
+        self.sync_interval = 1.0
+        self.sync_overlap = 60.0
+        self.capacity = 100_000
+        self.lock = threading.Lock()
+        self.reset()
+
+    def init_app(self, app):
+        setting = app.config.setdefault("REVOCATION_STORE", "database")
+        self.sync_interval = app.config.setdefault("REVOCATION_SYNC_INTERVAL", 1.0)
+        self.sync_overlap = app.config.setdefault("REVOCATION_SYNC_OVERLAP", 60.0)
+        self.capacity = app.config.setdefault("REVOCATION_BLOOM_CAPACITY", 100_000)
+        if setting == "memory":
+            self.store = MemoryRevocationStore(self.capacity)
+        elif setting == "database":
+            self.store = DatabaseRevocationStore()
+        elif setting.startswith(("redis://", "rediss://", "unix://")):
+            max_lifetime = app.config.get("JWT_REFRESH_TOKEN_EXPIRES", timedelta(days=30))
+            self.store = RedisRevocationStore(setting, max_lifetime.total_seconds())
+        else:
+            raise ValueError("Unknown REVOCATION_STORE {!r}".format(setting))
+        self.reset()
+
+    def reset(self):
+        self.bloom = BloomFilter(self.capacity)
+        self.marker = None
+        self.synced_at = 0.0
+
+    def add(self, jti, expires_at):
+        self.store.add(jti, expires_at)
+        with self.lock:
+            self.bloom.add(jti)
+
+    def sync(self):
+        with self.lock:
+            if time.monotonic() - self.synced_at < self.sync_interval:
+                return
+            # A Bloom filter cannot forget, so start over once it is full.
+            if self.bloom.count >= self.capacity:
+                self.reset()
+            since = None if self.marker is None else self.marker - self.sync_overlap
+            jtis, newest = self.store.revoked_since(since)
+            if newest is not None:
+                self.marker = newest if self.marker is None else max(self.marker, newest)
+            for jti in jtis:
+                # The overlap returns some JTIs again; don't count them twice.
+                if jti not in self.bloom:
+                    self.bloom.add(jti)
+            self.synced_at = time.monotonic()
+
+    def __contains__(self, jti):
+        self.sync()
+        if jti not in self.bloom:
+            return False
+        return self.store.contains(jti)
+
 
-BLOCKLIST = set()
\ No newline at end of file
+BLOCKLIST = RevocationList()
@@ -0,0 +1,128 @@
+"""
+budgets.py
+
+Spending limits per category or tag and period, with an alert when spending
+crosses alert_at percent of the limit.
+
+A budget's running total is the expense_summary bucket for the same
+(dimension, period, key_id, currency), which summaries.apply_changes keeps up
+to date inside each write's transaction. apply_changes passes every bucket
+whose total went up to ``record_alerts``, together with its totals before
+and after the write. Finding the budgets of those buckets takes one indexed
+query, so the cost of a write doesn't depend on how much was spent before
+it. A crossing is recorded in budget_alert, at most once per budget and
+period. Only expenses in the budget's own currency count toward it.
+
+"flask rebuild-budgets" recomputes the summaries from the expense table,
+reports any buckets that had drifted, and records alerts that were missed.
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, insert, select, tuple_
+
+from models import BudgetAlertModel, BudgetModel, ExpenseSummaryModel
+
+# Budget keys looked up per SELECT; four bound parameters each.
+KEY_CHUNK_SIZE = 500
+
+
+def over_threshold(total, limit, alert_at):
+    return total * 100 >= limit * alert_at
+
+
+def budget_key(summary_key):
+    """The (dimension, period, key_id, currency) of the budget for a summary bucket."""
+    dimension, period, key_id, _, currency = summary_key
+    return dimension, period, key_id, currency
+
+
+def record_alerts(connection, totals):
+    """Record alerts for budgets whose bucket total crossed the threshold.
+
+    ``totals`` holds ``((dimension, period, key_id, bucket, currency), old_total,
+    new_total)`` for the summary buckets a write increased.
+    """
+    if not totals:
+        return
+    budget = BudgetModel.__table__
+    keys = list({budget_key(key) for key, _, _ in totals})
+    budgets = {}
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        key_columns = tuple_(budget.c.dimension, budget.c.period, budget.c.key_id, budget.c.currency)
+        rows = connection.execute(
+            select(
+                budget.c.id, budget.c.dimension, budget.c.period, budget.c.key_id, budget.c.currency,
+                budget.c.limit, budget.c.alert_at,
+            )
+            .where(key_columns.in_(keys[start:start + KEY_CHUNK_SIZE]))
+        )
+        budgets.update(((row.dimension, row.period, row.key_id, row.currency), row) for row in rows)
+    if not budgets:
+        return
+
+    crossed = {}
+    for key, old_total, new_total in totals:
+        row = budgets.get(budget_key(key))
+        if row is None:
+            continue
+        if not over_threshold(old_total, row.limit, row.alert_at) and over_threshold(new_total, row.limit, row.alert_at):
+            crossed[(row.id, key[3])] = new_total
+    if not crossed:
+        return
+
+    # Spending can drop below the threshold and cross it again.
+    alert = BudgetAlertModel.__table__
+    existing = set(connection.execute(
+        select(alert.c.budget_id, alert.c.bucket).where(tuple_(alert.c.budget_id, alert.c.bucket).in_(list(crossed)))
+    ).all())
+    insert_alerts(connection, {key: total for key, total in crossed.items() if key not in existing})
+
+
+def insert_alerts(connection, crossed):
+    """Insert an alert for each ``(budget_id, bucket): total`` in ``crossed``."""
+    if not crossed:
+        return
+    created_at = datetime.utcnow()
+    connection.execute(insert(BudgetAlertModel.__table__), [
+        {"budget_id": budget_id, "bucket": bucket, "total": total, "created_at": created_at}
+        for (budget_id, bucket), total in crossed.items()
+    ])
+
+
+def alerts_due(connection, budget_ids=None):
+    """``{(budget_id, bucket): total}`` for every bucket over its budget's threshold."""
+    budget = BudgetModel.__table__
+    summary = ExpenseSummaryModel.__table__
+    query = select(budget.c.id, budget.c.limit, budget.c.alert_at, summary.c.bucket, summary.c.total).join(
+        summary,
+        and_(
+            summary.c.dimension == budget.c.dimension,
+            summary.c.period == budget.c.period,
+            summary.c.key_id == budget.c.key_id,
+            summary.c.currency == budget.c.currency,
+        ),
+    )
+    if budget_ids is not None:
+        query = query.where(budget.c.id.in_(budget_ids))
+    rows = connection.execute(query)
+    return {
+        (row.id, row.bucket): row.total
+        for row in rows
+        if over_threshold(row.total, row.limit, row.alert_at)
+    }
+
+
+def evaluate_budgets(connection, budget_ids=None):
+    """Record the alerts missing for the current summaries; return how many there were.
+
+    Checks every budget, or only ``budget_ids``.
+    """
+    alert = BudgetAlertModel.__table__
+    crossed = alerts_due(connection, budget_ids)
+    query = select(alert.c.budget_id, alert.c.bucket)
+    if budget_ids is not None:
+        query = query.where(alert.c.budget_id.in_(budget_ids))
+    existing = set(connection.execute(query).all())
+    missing = {key: total for key, total in crossed.items() if key not in existing}
+    insert_alerts(connection, missing)
+    return len(missing)
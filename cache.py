@@ -0,0 +1,238 @@
+"""
+cache.py
+
+Response cache for the category and tag read endpoints.
+
+Every committed write to a watched table bumps the owner's row for that
+table in cache_version inside the same transaction. Versions are per user:
+one user's writes neither invalidate another's responses nor wait on another
+writer's row lock. A cached endpoint's ETag is derived from the user, the
+request path and the user's versions of the tables it reads, so it changes
+exactly when the data behind the response can have changed. Workers re-read a
+user's versions at most every RESPONSE_CACHE_SYNC_INTERVAL seconds (and right
+after their own commits), which lets If-None-Match be answered with a 304 and
+repeat requests be served from memory without touching the database.
+
+Writes made in a request bump the versions of the signed-in user. Code that
+writes outside a request calls ``bump_versions`` with the owners itself.
+
+Versions are kept per bind: a request read from a lagging replica gets the
+replica's versions, so its response is never cached under the primary's.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, has_request_context, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from db import db
+from models import CacheVersionModel
+from ownership import current_user_id
+
+WATCHED_TABLES = ("category", "tag", "expense", "expense_tag")
+# Dialects whose INSERT can bump an existing version row instead.
+UPSERTS = {"postgresql": postgresql_insert, "sqlite": sqlite_insert}
+
+
+def request_user_id():
+    """The signed-in user of the current request, or None."""
+    if not has_request_context():
+        return None
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        return None
+    return None if identity is None else int(identity)
+
+
+class ResponseCache:
+    def __init__(self):
+        self.enabled = True
+        self.max_entries = 512
+        self.sync_interval = 1.0
+        self.entries = OrderedDict()
+        # Per (engine, user): {table: version} and when it was read.
+        self.versions = OrderedDict()
+        self.synced_at = {}
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0, "evictions": 0}
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault("RESPONSE_CACHE_ENABLED", True)
+        self.max_entries = app.config.setdefault("RESPONSE_CACHE_SIZE", 512)
+        self.sync_interval = app.config.setdefault("RESPONSE_CACHE_SYNC_INTERVAL", 1.0)
+        with self.lock:
+            self.entries.clear()
+            self.versions = OrderedDict()
+            self.synced_at = {}
+
+    def sync(self, session, user_id):
+        """Return ``user_id``'s table versions on the bind ``session`` reads from."""
+        key = (session.get_bind(CacheVersionModel.__mapper__), user_id)
+        with self.lock:
+            if time.monotonic() - self.synced_at.get(key, 0.0) < self.sync_interval:
+                self.versions.move_to_end(key)
+                return self.versions[key]
+        versions = dict(session.execute(
+            select(CacheVersionModel.name, CacheVersionModel.version).where(CacheVersionModel.user_id == user_id)
+        ).all())
+        with self.lock:
+            previous = self.versions.get(key)
+            if previous:
+                self.stats["invalidations"] += sum(previous.get(name) != version for name, version in versions.items())
+            self.versions[key] = versions
+            self.versions.move_to_end(key)
+            self.synced_at[key] = time.monotonic()
+            while len(self.versions) > self.max_entries:
+                oldest, _ = self.versions.popitem(last=False)
+                self.synced_at.pop(oldest, None)
+        return versions
+
+    def expire(self, user_ids):
+        """Force a re-read of these users' versions on their next cached request."""
+        with self.lock:
+            for key in [key for key in self.synced_at if key[1] in user_ids]:
+                del self.synced_at[key]
+
+    def count(self, event):
+        with self.lock:
+            self.stats[event] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def cached(self, *tables):
+        """Cache a GET view whose response only depends on ``tables`` and the caller.
+
+        The view must require a token; entries are kept per user.
+        """
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+
+                user_id = current_user_id()
+                current = self.sync(db.session, user_id)
+                versions = tuple((table, current.get(table, 0)) for table in tables)
+                key = (user_id, request.full_path)
+                etag = hashlib.sha1(repr((key, versions)).encode()).hexdigest()
+
+                if etag in request.if_none_match:
+                    self.count("not_modified")
+                    response = Response(status=304)
+                    response.set_etag(etag)
+                    return response
+
+                entry = self.get(key)
+                if entry is not None and entry[0] == etag:
+                    self.count("hits")
+                    response = Response(entry[1], mimetype=entry[2])
+                    response.set_etag(etag)
+                    return response
+
+                self.count("misses")
+                response = make_response(func(*args, **kwargs))
+                if response.status_code == 200 and not response.is_streamed:
+                    self.put(key, (etag, response.get_data(), response.mimetype))
+                    response.set_etag(etag)
+                return response
+            return wrapper
+        return decorator
+
+
+def bump_versions(session, user_ids, tables):
+    """Bump each of ``user_ids``' versions of ``tables``."""
+    # Only bump each row once per transaction.
+    bumped = session.info.setdefault("cache_bumped", set())
+    # In a fixed order, so concurrent writers lock the rows in the same order.
+    keys = sorted({(user_id, table) for user_id in user_ids for table in tables} - bumped)
+    if not keys:
+        return
+    connection = session.connection()
+    version = CacheVersionModel.__table__
+    dialect_insert = UPSERTS.get(connection.dialect.name)
+    if dialect_insert is not None:
+        # One statement, and two first writes of a row can't both insert it.
+        connection.execute(
+            dialect_insert(version)
+            .values([{"user_id": user_id, "name": table, "version": 1} for user_id, table in keys])
+            .on_conflict_do_update(
+                index_elements=[version.c.user_id, version.c.name],
+                set_={"version": version.c.version + 1},
+            )
+        )
+    else:
+        for user_id, table in keys:
+            result = connection.execute(
+                update(version)
+                .where(version.c.user_id == user_id, version.c.name == table)
+                .values(version=version.c.version + 1)
+            )
+            if result.rowcount == 0:
+                connection.execute(insert(version).values(user_id=user_id, name=table, version=1))
+    bumped.update(keys)
+
+
+@event.listens_for(Session, "after_flush")
+def track_flushed_tables(session, flush_context):
+    changed = {}
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is None or table.name not in WATCHED_TABLES:
+            continue
+        user_id = getattr(obj, "user_id", None) or request_user_id()
+        if user_id is None:
+            continue
+        changed.setdefault(user_id, set()).add(table.name)
+        # Links changed through the relationship don't show up as objects.
+        if table.name == "expense" and get_history(obj, "tag").has_changes():
+            changed[user_id].add("expense_tag")
+    for user_id, tables in changed.items():
+        bump_versions(session, [user_id], tables)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def track_bulk_statements(orm_execute_state):
+    # Bulk INSERT/UPDATE/DELETE statements bypass the flush.
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    table = getattr(orm_execute_state.statement, "table", None)
+    user_id = request_user_id()
+    if table is not None and table.name in WATCHED_TABLES and user_id is not None:
+        bump_versions(orm_execute_state.session, [user_id], [table.name])
+
+
+@event.listens_for(Session, "after_commit")
+def expire_after_commit(session):
+    bumped = session.info.pop("cache_bumped", None)
+    if bumped:
+        RESPONSE_CACHE.expire({user_id for user_id, _ in bumped})
+
+
+@event.listens_for(Session, "after_rollback")
+def forget_rolled_back(session):
+    session.info.pop("cache_bumped", None)
+
+
+RESPONSE_CACHE = ResponseCache()
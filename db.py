@@ -1,4 +1,121 @@
 # db.py
+import os
+import threading
+import time
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from routing import RoutingSession
+from serving import pool_size, serving_settings
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+class PoolMetrics:
+    """How long requests wait to get a connection out of the pool."""
+
+    def __init__(self, slow_threshold=0.1):
+        self.slow_threshold = slow_threshold
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.checkouts = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.slow_checkouts = 0
+            self.timeouts = 0
+
+    def record(self, wait, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+            if wait >= self.slow_threshold:
+                self.slow_checkouts += 1
+
+    @property
+    def stats(self):
+        with self.lock:
+            return {
+                "checkouts": self.checkouts,
+                "wait_total": self.wait_total,
+                "wait_max": self.wait_max,
+                "wait_avg": self.wait_total / self.checkouts if self.checkouts else 0.0,
+                "slow_checkouts": self.slow_checkouts,
+                "timeouts": self.timeouts,
+            }
+
+
+POOL_METRICS = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except Exception:
+            POOL_METRICS.record(time.perf_counter() - start, timed_out=True)
+            raise
+        POOL_METRICS.record(time.perf_counter() - start)
+        return connection
+
+
+def engine_options(database_url):
+    """Engine options for ``database_url``, tunable through DB_* environment variables."""
+    url = make_url(database_url)
+    options = {"pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"}
+
+    # In-memory SQLite is pinned to one connection by Flask-SQLAlchemy.
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    # Each request and background thread holds at most one connection, so by
+    # default a worker's pool matches its threads (see serving.pool_size) and
+    # all workers together stay within DB_MAX_CONNECTIONS (PostgreSQL's
+    # default max_connections is 100).
+    default_size = pool_size(serving_settings(), int(os.getenv("DB_MAX_CONNECTIONS", 100)))
+    # Outside gunicorn the WEB_* settings don't apply, and the "flask run"
+    # dev server starts a thread per request.
+    default_overflow = 0 if os.getenv("SERVING", "false").lower() == "true" else 10
+    options.update(
+        poolclass=TimedQueuePool,
+        pool_size=int(os.getenv("DB_POOL_SIZE", default_size)),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", default_overflow)),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    )
+    statement_timeout = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 0))
+    if statement_timeout and url.get_backend_name() == "postgresql":
+        options["connect_args"] = {"options": "-c statement_timeout={}".format(statement_timeout)}
+    return options
+
+
+def configure_sqlite(engine):
+    """Switch SQLite connections to WAL so readers don't block on a writer.
+
+    Foreign keys are enforced too; SQLite ignores them (and their ON DELETE
+    CASCADE) unless asked per connection.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    busy_timeout = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", 5000))
+    mmap_size = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
 
-db = SQLAlchemy()
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout={}".format(busy_timeout))
+        cursor.execute("PRAGMA mmap_size={}".format(mmap_size))
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
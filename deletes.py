@@ -0,0 +1,166 @@
+"""
+deletes.py
+
+Set-based deletes of categories and the rows under them.
+
+The foreign keys cascade (ON DELETE CASCADE), so one DELETE of a category
+removes its expenses, its tags and every expense_tag link to either, without
+the ORM loading them. Cascaded rows skip the session's flush hooks, so
+expense_summary and cache_version are updated here instead: the summary rows
+of the category and its tags are dropped with them, and only tags in other
+categories that lose links get their buckets adjusted.
+
+For very large categories, ``delete_category_in_chunks`` first deletes the
+expenses CATEGORY_DELETE_CHUNK_SIZE at a time, one short transaction per
+chunk, so writers are never locked out for the length of the whole delete.
+
+``delete_user_data`` removes everything a user owns the same way, one
+cascading DELETE of their categories.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import and_, delete, or_, select
+
+from cache import bump_versions
+from db import db
+from shards import SHARDS
+from models import BudgetModel, CategoryModel, ExpenseModel, ExpenseSummaryModel, ExpenseTags, TagModel
+from summaries import apply_changes
+
+
+def tag_ids_by_expense(session, expense_ids):
+    tags = {}
+    rows = session.execute(
+        select(ExpenseTags.expense_id, ExpenseTags.tag_id).where(ExpenseTags.expense_id.in_(expense_ids))
+    )
+    for expense_id, tag_id in rows:
+        tags.setdefault(expense_id, []).append(tag_id)
+    return tags
+
+
+def delete_expenses(session, criteria, limit):
+    """Delete up to ``limit`` expenses matching ``criteria``; return how many went.
+
+    Their tag links cascade. The removals are folded into expense_summary
+    like any other delete.
+    """
+    rows = session.execute(
+        select(
+            ExpenseModel.id, ExpenseModel.user_id, ExpenseModel.category_id, ExpenseModel.created_at,
+            ExpenseModel.price, ExpenseModel.currency,
+        )
+        .where(*criteria)
+        .order_by(ExpenseModel.id)
+        .limit(limit)
+    ).all()
+    if not rows:
+        return 0
+
+    ids = [row.id for row in rows]
+    tags = tag_ids_by_expense(session, ids)
+    session.execute(delete(ExpenseModel).where(ExpenseModel.id.in_(ids)))
+    # After the DELETE, as after a flush: buckets that lose their minimum or
+    # maximum re-read their bounds from what is left.
+    apply_changes(session.connection(), [
+        (-1, row.category_id, row.created_at, row.price, row.currency, tags.get(row.id, ()))
+        for row in rows
+    ])
+    bump_versions(session, {row.user_id for row in rows}, ["expense", "expense_tag"])
+    return len(rows)
+
+
+def delete_category(session, category_id):
+    """Delete a category, its expenses and its tags with one cascading DELETE."""
+    tag_ids = select(TagModel.id).where(TagModel.category_id == category_id).scalar_subquery()
+    owner = session.execute(select(CategoryModel.user_id).where(CategoryModel.id == category_id)).scalar()
+
+    # Expenses here may be linked to tags of other categories, which survive.
+    cross_links = session.execute(
+        select(ExpenseModel.created_at, ExpenseModel.price, ExpenseModel.currency, ExpenseTags.tag_id)
+        .join(ExpenseTags, ExpenseTags.expense_id == ExpenseModel.id)
+        .where(ExpenseModel.category_id == category_id, ExpenseTags.tag_id.not_in(tag_ids))
+    ).all()
+
+    # Summary rows and budgets are keyed the same way; budget alerts cascade.
+    for keyed in (ExpenseSummaryModel, BudgetModel):
+        session.execute(
+            delete(keyed).where(or_(
+                and_(keyed.dimension == "category", keyed.key_id == category_id),
+                and_(keyed.dimension == "tag", keyed.key_id.in_(tag_ids)),
+            ))
+        )
+    deleted = session.execute(delete(CategoryModel).where(CategoryModel.id == category_id)).rowcount
+    # Once the expenses are gone, so that the bounds are re-read without them.
+    apply_changes(session.connection(), [
+        (-1, None, created_at, price, currency, [tag_id])
+        for created_at, price, currency, tag_id in cross_links
+    ])
+    if owner is not None:
+        bump_versions(session, [owner], ["category", "tag", "expense", "expense_tag"])
+    return deleted
+
+
+def delete_user_data(session, user_id):
+    """Delete a user's categories, tags, expenses and budgets, and their summary rows."""
+    category_ids = select(CategoryModel.id).where(CategoryModel.user_id == user_id).scalar_subquery()
+    tag_ids = select(TagModel.id).where(TagModel.user_id == user_id).scalar_subquery()
+
+    # Tags and expenses only link within one user, so nothing else changes.
+    summary = ExpenseSummaryModel
+    session.execute(
+        delete(summary).where(or_(
+            and_(summary.dimension == "category", summary.key_id.in_(category_ids)),
+            and_(summary.dimension == "tag", summary.key_id.in_(tag_ids)),
+        ))
+    )
+    session.execute(delete(BudgetModel).where(BudgetModel.user_id == user_id))
+    deleted = session.execute(delete(CategoryModel).where(CategoryModel.user_id == user_id)).rowcount
+    bump_versions(session, [user_id], ["category", "tag", "expense", "expense_tag"])
+    return deleted
+
+
+def delete_category_in_chunks(session, category_id, chunk_size):
+    while delete_expenses(session, [ExpenseModel.category_id == category_id], chunk_size):
+        session.commit()
+    delete_category(session, category_id)
+    session.commit()
+
+
+class BackgroundDeletes:
+    """Runs chunked deletes one at a time on a thread of the current worker."""
+
+    def __init__(self):
+        self.chunk_size = 5000
+        self.executor = None
+        self.executor_pid = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.chunk_size = app.config.setdefault("CATEGORY_DELETE_CHUNK_SIZE", 5000)
+
+    def get_executor(self):
+        # Like the password pool, a thread inherited through a fork is gone.
+        with self.lock:
+            if self.executor is None or self.executor_pid != os.getpid():
+                self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="deletes")
+                self.executor_pid = os.getpid()
+            return self.executor
+
+    def delete_category(self, app, user_id, category_id):
+        return self.get_executor().submit(self.run, app, user_id, category_id)
+
+    def run(self, app, user_id, category_id):
+        with app.app_context():
+            try:
+                # No request here to pick the owner's shard from.
+                with SHARDS.pinned(db.session, SHARDS.key_for(user_id)):
+                    delete_category_in_chunks(db.session, category_id, self.chunk_size)
+            except Exception:
+                db.session.rollback()
+                app.logger.exception("Chunked delete of category %s failed", category_id)
+                raise
+
+
+BACKGROUND_DELETES = BackgroundDeletes()
@@ -2,4 +2,5 @@
 
 flask db upgrade
 
-exec gunicorn --bind 0.0.0.0:80 "app:create_app()"
+# Worker class, workers and threads come from WEB_* variables; see serving.py.
+exec gunicorn "app:create_app()"
@@ -0,0 +1,205 @@
+"""
+export.py
+
+Streaming writers for GET /expense/export.
+
+Rows come from ``export_rows`` as (id, created_at, name, price in cents,
+currency, category_id, category_name, tags) tuples, with the tag names of each expense aggregated in
+SQL. The writers turn each chunk of rows into bytes as soon as it arrives, so
+memory stays constant whatever the size of the export.
+
+"csv" is a plain CSV file with a header row; tags are ";"-separated, the way
+POST /expense/bulk accepts them.
+
+"columnar" is a compact binary layout, one row group per chunk:
+
+    b"EXPCOL1\\n"
+    uint32 header length, JSON header: [{"name": ..., "type": ...}, ...]
+    row groups: uint32 row count, then every column in header order
+        int64 / timestamp (int64 microseconds since the epoch, UTC, with
+        NULL_TIMESTAMP for none) / decimal (int64 cents): row count
+        little-endian 8-byte values
+        string: row count + 1 uint32 offsets, then the UTF-8 data
+    uint32 0 to mark the end
+
+``read_columnar`` decodes it again.
+"""
+import csv
+import io
+import json
+import struct
+import sys
+import zlib
+from array import array
+from datetime import datetime, timedelta
+
+from sqlalchemy import BigInteger, func, select, type_coerce
+
+from models import CategoryModel, ExpenseModel, ExpenseTags, TagModel
+from models.money import from_minor_units
+
+COLUMNS = (
+    ("id", "int64"),
+    ("created_at", "timestamp"),
+    ("name", "string"),
+    ("price", "decimal"),
+    ("currency", "string"),
+    ("category_id", "int64"),
+    ("category_name", "string"),
+    ("tags", "string"),
+)
+COLUMNAR_MAGIC = b"EXPCOL1\n"
+EPOCH = datetime(1970, 1, 1)
+# The smallest int64, far outside the range of datetime.
+NULL_TIMESTAMP = -2 ** 63
+TAG_SEPARATOR = ";"
+
+
+def export_rows(criteria):
+    """Select the export columns for the expenses matching ``criteria``, in id order."""
+    tags = (
+        select(func.aggregate_strings(TagModel.name, TAG_SEPARATOR))
+        .join(ExpenseTags, ExpenseTags.tag_id == TagModel.id)
+        .where(ExpenseTags.expense_id == ExpenseModel.id)
+        .scalar_subquery()
+    )
+    return (
+        select(
+            ExpenseModel.id,
+            ExpenseModel.created_at,
+            ExpenseModel.name,
+            # Raw cents; the writers format them without a Decimal per row.
+            type_coerce(ExpenseModel.price, BigInteger),
+            ExpenseModel.currency,
+            ExpenseModel.category_id,
+            CategoryModel.name,
+            tags,
+        )
+        .join(ExpenseModel.category)
+        .where(*criteria)
+        .order_by(ExpenseModel.id)
+    )
+
+
+def tag_list(tags):
+    # Aggregate order is up to the database; sort for a stable output.
+    return TAG_SEPARATOR.join(sorted(tags.split(TAG_SEPARATOR))) if tags else ""
+
+
+def csv_chunks(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([name for name, _ in COLUMNS])
+    for rows in chunks:
+        for expense_id, created_at, name, cents, currency, category_id, category_name, tags in rows:
+            writer.writerow([
+                expense_id,
+                created_at.isoformat() if created_at else "",
+                name,
+                from_minor_units(cents),
+                currency,
+                category_id,
+                category_name,
+                tag_list(tags),
+            ])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def little_endian(values):
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values.tobytes()
+
+
+def microseconds(value):
+    if value is None:
+        return NULL_TIMESTAMP
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_microseconds(value):
+    if value == NULL_TIMESTAMP:
+        return None
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_column(kind, values):
+    if kind in ("int64", "decimal"):
+        return little_endian(array("q", values))
+    if kind == "timestamp":
+        return little_endian(array("q", [microseconds(value) for value in values]))
+    encoded = [value.encode() for value in values]
+    offsets = array("I", [0])
+    for value in encoded:
+        offsets.append(offsets[-1] + len(value))
+    return little_endian(offsets) + b"".join(encoded)
+
+
+def columnar_chunks(chunks):
+    header = json.dumps([{"name": name, "type": kind} for name, kind in COLUMNS]).encode()
+    yield COLUMNAR_MAGIC + struct.pack("<I", len(header)) + header
+    for rows in chunks:
+        if not rows:
+            continue
+        columns = list(zip(*rows))
+        columns[-1] = [tag_list(tags) for tags in columns[-1]]
+        parts = [struct.pack("<I", len(rows))]
+        parts += [encode_column(kind, values) for (_, kind), values in zip(COLUMNS, columns)]
+        yield b"".join(parts)
+    yield struct.pack("<I", 0)
+
+
+def read_columnar(stream):
+    """Decode a columnar export from a binary file object into a dict of column lists."""
+    if stream.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("Not a columnar expense export.")
+
+    def unpack(fmt):
+        return struct.unpack(fmt, stream.read(struct.calcsize(fmt)))[0]
+
+    def values(typecode, count):
+        column = array(typecode)
+        column.frombytes(stream.read(count * column.itemsize))
+        if sys.byteorder == "big":
+            column.byteswap()
+        return column
+
+    header = json.loads(stream.read(unpack("<I")))
+    result = {column["name"]: [] for column in header}
+    while True:
+        count = unpack("<I")
+        if count == 0:
+            return result
+        for column in header:
+            kind = column["type"]
+            if kind == "string":
+                offsets = values("I", count + 1)
+                data = stream.read(offsets[-1])
+                column_values = [data[offsets[i]:offsets[i + 1]].decode() for i in range(count)]
+            elif kind == "timestamp":
+                column_values = [from_microseconds(value) for value in values("q", count)]
+            elif kind == "decimal":
+                column_values = [from_minor_units(value) for value in values("q", count)]
+            else:
+                column_values = list(values("q", count))
+            result[column["name"]].extend(column_values)
+
+
+def gzip_chunks(chunks, level=6):
+    """Compress ``chunks`` into a gzip stream, flushing after every chunk."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+FORMATS = {
+    "csv": (csv_chunks, "text/csv", "csv"),
+    "columnar": (columnar_chunks, "application/octet-stream", "expcol"),
+}
@@ -0,0 +1,30 @@
+# Loaded by gunicorn from the working directory; see serving.py for the settings.
+import os
+
+from serving import serving_settings
+
+settings = serving_settings()
+
+bind = os.getenv("WEB_BIND", "0.0.0.0:80")
+worker_class = settings["worker_class"]
+workers = settings["workers"]
+threads = settings["threads"]
+timeout = int(os.getenv("WEB_TIMEOUT", 30))
+
+# create_app skips migrations and defers the OpenAPI spec when serving.
+os.environ.setdefault("SERVING", "true")
+
+# Import and build the app once in the master; workers fork with it ready.
+preload_app = os.getenv("WEB_PRELOAD", "true").lower() == "true"
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from db import db
+
+    # Connections the master opened (the startup schema check) can't be
+    # shared with a forked worker; drop them without closing the master's.
+    with server.app.wsgi().app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -0,0 +1,200 @@
+"""
+instrumentation.py
+
+Opt-in per-request instrumentation, enabled with INSTRUMENTATION_ENABLED
+(the INSTRUMENTATION environment variable in create_app).
+
+For every request it records wall time, number and total time of SQL
+statements, time spent marshalling the result in ``@blp.response`` and the
+number of rows in the response body. Each response carries the numbers in a
+Server-Timing header, and per-endpoint totals are served in Prometheus text
+format at /metrics.
+
+With PROFILE_SAMPLE_RATE above zero a fraction of requests runs under
+cProfile; the stats of those slower than PROFILE_SLOW_MS are kept in
+INSTRUMENTATION.slow_profiles (and written to PROFILE_DIR if set).
+"""
+import cProfile
+import io
+import os
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+import flask_smorest
+from flask import Response, g, has_request_context, request, request_finished, request_started
+from flask_smorest.utils import get_appcontext
+from sqlalchemy import event
+
+from cache import RESPONSE_CACHE
+from db import POOL_METRICS, db
+
+
+class Blueprint(flask_smorest.Blueprint):
+    """flask-smorest Blueprint that times the marshalling done by ``response``."""
+
+    def response(self, *args, **kwargs):
+        decorator = super().response(*args, **kwargs)
+
+        def wrapper(func):
+            @wraps(func)
+            def view(*view_args, **view_kwargs):
+                start = time.perf_counter()
+                try:
+                    return func(*view_args, **view_kwargs)
+                finally:
+                    if has_request_context():
+                        g.instrumentation_view_time = time.perf_counter() - start
+
+            marshalled = decorator(view)
+
+            @wraps(marshalled)
+            def timed(*view_args, **view_kwargs):
+                start = time.perf_counter()
+                result = marshalled(*view_args, **view_kwargs)
+                stats = g.get("instrumentation")
+                if stats is not None:
+                    view_time = g.pop("instrumentation_view_time", 0.0)
+                    stats["serialize_time"] += time.perf_counter() - start - view_time
+                return result
+
+            return timed
+
+        return wrapper
+
+
+class Instrumentation:
+    metric_names = ("requests", "wall_time", "sql_count", "sql_time", "serialize_time", "rows")
+
+    def __init__(self):
+        self.enabled = False
+        self.endpoints = {}
+        self.slow_profiles = deque(maxlen=20)
+        self.sample_rate = 0.0
+        self.slow_threshold = 0.5
+        self.profile_dir = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault("INSTRUMENTATION_ENABLED", False)
+        if not self.enabled:
+            return
+        self.sample_rate = app.config.setdefault("PROFILE_SAMPLE_RATE", 0.0)
+        self.slow_threshold = app.config.setdefault("PROFILE_SLOW_MS", 500) / 1000
+        self.profile_dir = app.config.setdefault("PROFILE_DIR", None)
+
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, "before_cursor_execute", self.before_cursor_execute)
+                event.listen(engine, "after_cursor_execute", self.after_cursor_execute)
+        request_started.connect(self.request_started, app)
+        request_finished.connect(self.request_finished, app)
+        app.add_url_rule("/metrics", "metrics", self.metrics_view)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and "instrumentation" in g:
+            conn.info.setdefault("instrumentation_start", []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("instrumentation_start")
+        if starts and has_request_context() and "instrumentation" in g:
+            stats = g.instrumentation
+            stats["sql_count"] += 1
+            stats["sql_time"] += time.perf_counter() - starts.pop()
+
+    def request_started(self, sender, **extra):
+        g.instrumentation = dict.fromkeys(self.metric_names, 0)
+        g.instrumentation["requests"] = 1
+        g.instrumentation_start = time.perf_counter()
+        if self.sample_rate and random.random() < self.sample_rate:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process, so a
+                # request on another gthread thread may already hold it.
+                return
+            g.instrumentation_profile = profile
+
+    def request_finished(self, sender, response, **extra):
+        stats = g.pop("instrumentation", None)
+        if stats is None:
+            return
+        stats["wall_time"] = time.perf_counter() - g.pop("instrumentation_start")
+        dump = get_appcontext().get("result_dump")
+        if dump is not None:
+            stats["rows"] = len(dump) if isinstance(dump, list) else 1
+
+        profile = g.pop("instrumentation_profile", None)
+        if profile is not None:
+            profile.disable()
+            if stats["wall_time"] >= self.slow_threshold:
+                self.keep_profile(profile, stats["wall_time"])
+
+        response.headers["Server-Timing"] = ", ".join([
+            'db;dur={:.2f};desc="{} queries"'.format(1000 * stats["sql_time"], stats["sql_count"]),
+            "serialize;dur={:.2f}".format(1000 * stats["serialize_time"]),
+            "total;dur={:.2f}".format(1000 * stats["wall_time"]),
+        ])
+
+        key = (request.endpoint or "unmatched", request.method)
+        with self.lock:
+            totals = self.endpoints.setdefault(key, dict.fromkeys(self.metric_names, 0))
+            for name, value in stats.items():
+                totals[name] += value
+
+    def keep_profile(self, profile, wall_time):
+        output = io.StringIO()
+        pstats.Stats(profile, stream=output).sort_stats("cumulative").print_stats(30)
+        self.slow_profiles.append({
+            "endpoint": request.endpoint,
+            "path": request.full_path,
+            "wall_time": wall_time,
+            "stats": output.getvalue(),
+        })
+        if self.profile_dir:
+            name = "{}-{}.prof".format(request.endpoint or "unmatched", int(time.time() * 1000))
+            profile.dump_stats(os.path.join(self.profile_dir, name))
+
+    def metrics_view(self):
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append("# HELP {} {}".format(name, help_text))
+            lines.append("# TYPE {} {}".format(name, kind))
+            for labels, value in samples:
+                label_text = ",".join('{}="{}"'.format(key, val) for key, val in labels.items())
+                lines.append("{}{{{}}} {}".format(name, label_text, value) if label_text else "{} {}".format(name, value))
+
+        with self.lock:
+            endpoints = {key: dict(totals) for key, totals in self.endpoints.items()}
+
+        def per_endpoint(name):
+            return [
+                ({"endpoint": endpoint, "method": method}, totals[name])
+                for (endpoint, method), totals in sorted(endpoints.items())
+            ]
+
+        metric("http_requests_total", "counter", "Requests handled.", per_endpoint("requests"))
+        metric("http_request_seconds_total", "counter", "Wall time spent in requests.", per_endpoint("wall_time"))
+        metric("db_statements_total", "counter", "SQL statements executed.", per_endpoint("sql_count"))
+        metric("db_seconds_total", "counter", "Time spent executing SQL.", per_endpoint("sql_time"))
+        metric("serialize_seconds_total", "counter", "Time spent marshalling responses.", per_endpoint("serialize_time"))
+        metric("response_rows_total", "counter", "Rows returned in response bodies.", per_endpoint("rows"))
+
+        pool = POOL_METRICS.stats
+        metric("db_pool_checkouts_total", "counter", "Connections checked out of the pool.", [({}, pool["checkouts"])])
+        metric("db_pool_wait_seconds_total", "counter", "Time spent waiting for a connection.", [({}, pool["wait_total"])])
+        metric("db_pool_wait_seconds_max", "gauge", "Longest wait for a connection.", [({}, pool["wait_max"])])
+        metric("db_pool_timeouts_total", "counter", "Pool checkouts that timed out.", [({}, pool["timeouts"])])
+
+        metric("response_cache_events_total", "counter", "Response cache events.",
+               [({"event": name}, value) for name, value in sorted(RESPONSE_CACHE.stats.items())])
+
+        return Response("\n".join(lines) + "\n", mimetype="text/plain; version=0.0.4")
+
+
+INSTRUMENTATION = Instrumentation()
@@ -0,0 +1,53 @@
+"""
+leases.py
+
+Leases let one process among many run a job: the holder of a lease's row
+owns the job until expires_at, and renews it while it keeps running. When
+the holder dies its lease runs out and another process takes over.
+
+Times are the app's UTC clock, so the hosts' clocks should agree to well
+within a lease's length.
+"""
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import LeaseModel
+
+
+def acquire_lease(session, name, holder, seconds):
+    """Take or renew lease ``name`` for ``seconds``; return whether ``holder`` has it.
+
+    Commits, so the lease is visible to other processes at once.
+    """
+    lease = LeaseModel.__table__
+    now = datetime.utcnow()
+    values = {"holder": holder, "expires_at": now + timedelta(seconds=seconds)}
+    result = session.execute(
+        update(lease)
+        .where(lease.c.name == name, or_(lease.c.holder == holder, lease.c.expires_at < now))
+        .values(**values)
+    )
+    acquired = result.rowcount == 1
+    if not acquired and session.execute(select(lease.c.name).where(lease.c.name == name)).first() is None:
+        try:
+            session.execute(insert(lease).values(name=name, **values))
+            acquired = True
+        except IntegrityError:
+            # Another process created it first.
+            session.rollback()
+            return False
+    session.commit()
+    return acquired
+
+
+def release_lease(session, name, holder):
+    """Let lease ``name`` go at once, if ``holder`` has it."""
+    lease = LeaseModel.__table__
+    session.execute(
+        update(lease)
+        .where(lease.c.name == name, lease.c.holder == holder)
+        .values(expires_at=datetime.utcnow())
+    )
+    session.commit()
@@ -0,0 +1,76 @@
+"""
+loaders.py
+
+Eager-loading strategy for each response schema. The list endpoints pass
+these options to their queries so that nested fields are fetched with a
+fixed number of statements instead of one lazy load per row.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.orm import joinedload, selectinload
+
+from db import db
+from models import CategoryModel, ExpenseModel, TagModel
+from schemas import CategorySchema, ExpenseSchema, TagSchema
+
+# Many-to-one relationships are joined into the main query, collections are
+# fetched with one extra "IN" query each.
+LOADER_OPTIONS = {
+    ExpenseSchema: (
+        joinedload(ExpenseModel.category),
+        selectinload(ExpenseModel.tag),
+    ),
+    CategorySchema: (
+        selectinload(CategoryModel.expense),
+        selectinload(CategoryModel.tag),
+    ),
+    TagSchema: (
+        joinedload(TagModel.category),
+        selectinload(TagModel.expense),
+    ),
+}
+
+
+def loader_options(schema):
+    """Return the loader options needed to dump ``schema`` without lazy loads."""
+    if not isinstance(schema, type):
+        schema = type(schema)
+    return LOADER_OPTIONS.get(schema, ())
+
+
+class QueryCounter:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+
+@contextmanager
+def count_queries(engine=None):
+    """Record every SQL statement executed on ``engine`` inside the block."""
+    engine = engine or db.engine
+    counter = QueryCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", counter)
+
+
+@contextmanager
+def assert_query_count(expected, engine=None):
+    """Fail if the block does not execute exactly ``expected`` statements."""
+    with count_queries(engine) as counter:
+        yield counter
+    if counter.count != expected:
+        raise AssertionError(
+            "Expected {} queries, got {}:\n{}".format(
+                expected, counter.count, "\n".join(counter.statements)
+            )
+        )
@@ -0,0 +1,128 @@
+"""indexes for foreign key lookups
+
+Revision ID: 2a3f9047b47c
+Revises: 97decc49da1a
+Create Date: 2026-10-18 12:40:05.937120
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a3f9047b47c'
+down_revision = '97decc49da1a'
+branch_labels = None
+depends_on = None
+
+PERIODS = ('day', 'week', 'month')
+
+
+def bucket(period, moment):
+    day = moment.date()
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def recount_tag_summaries(connection, tag_ids):
+    """Replace the expense_summary rows of ``tag_ids`` with counts from expense_tag."""
+    if not tag_ids:
+        return
+    connection.execute(
+        sa.text("DELETE FROM expense_summary WHERE dimension = 'tag' AND key_id IN :ids")
+        .bindparams(sa.bindparam('ids', expanding=True)),
+        {'ids': sorted(tag_ids)},
+    )
+    rows = connection.execute(
+        sa.text(
+            "SELECT expense_tag.tag_id, expense.created_at, expense.price "
+            "FROM expense_tag JOIN expense ON expense.id = expense_tag.expense_id "
+            "WHERE expense_tag.tag_id IN :ids"
+        ).bindparams(sa.bindparam('ids', expanding=True)).columns(
+            sa.column('tag_id', sa.Integer()), sa.column('created_at', sa.DateTime()), sa.column('price', sa.Float()),
+        ),
+        {'ids': sorted(tag_ids)},
+    )
+    summaries = {}
+    for tag_id, created_at, price in rows:
+        for period in PERIODS:
+            key = (period, tag_id, bucket(period, created_at))
+            count, total, low, high = summaries.get(key, (0, 0, price, price))
+            summaries[key] = (count + 1, total + price, min(low, price), max(high, price))
+    if summaries:
+        connection.execute(
+            sa.text(
+                "INSERT INTO expense_summary "
+                "(dimension, key_id, period, bucket, count, total, min_price, max_price) "
+                "VALUES ('tag', :key_id, :period, :bucket, :count, :total, :min_price, :max_price)"
+            ),
+            [
+                dict(period=period, key_id=tag_id, bucket=day, count=count, total=total,
+                     min_price=low, max_price=high)
+                for (period, tag_id, day), (count, total, low, high) in summaries.items()
+            ],
+        )
+
+
+def upgrade():
+    connection = op.get_bind()
+    # Merging moves links onto the surviving tag, and an expense linked to
+    # more than one copy, or to one tag twice, was counted more than once.
+    # Those tags' summary rows are recounted after the merge.
+    merged = {row[0] for row in connection.execute(sa.text(
+        "SELECT t1.id FROM tag t1 JOIN tag t2 "
+        "ON t1.category_id = t2.category_id AND t1.name = t2.name AND t1.id <> t2.id"
+    ))}
+    repeated = {row[0] for row in connection.execute(sa.text(
+        "SELECT tag_id FROM expense_tag WHERE tag_id IS NOT NULL "
+        "GROUP BY expense_id, tag_id HAVING COUNT(*) > 1"
+    ))}
+
+    # The new unique constraints fail on existing duplicates, so merge
+    # same-named tags within a category and drop repeated links first.
+    op.execute(
+        "UPDATE expense_tag SET tag_id = ("
+        "SELECT MIN(t2.id) FROM tag t1 JOIN tag t2 "
+        "ON t1.category_id = t2.category_id AND t1.name = t2.name "
+        "WHERE t1.id = expense_tag.tag_id"
+        ") WHERE tag_id IN (SELECT id FROM tag)"
+    )
+    op.execute(
+        "DELETE FROM tag WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tag GROUP BY category_id, name)"
+    )
+    op.execute(
+        "DELETE FROM expense_tag WHERE id NOT IN "
+        "(SELECT MIN(id) FROM expense_tag GROUP BY expense_id, tag_id)"
+    )
+    # Merged-away tags have no links left, so their rows are only deleted.
+    recount_tag_summaries(connection, merged | repeated)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_expense_category_id'), ['category_id'], unique=False)
+
+    # The (category_id, name) and (expense_id, tag_id) constraints also serve
+    # lookups on their leading column, so those need no index of their own.
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_tag_category_id_name', ['category_id', 'name'])
+
+    with op.batch_alter_table('expense_tag', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_expense_tag_expense_id_tag_id', ['expense_id', 'tag_id'])
+        batch_op.create_index(batch_op.f('ix_expense_tag_tag_id'), ['tag_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('expense_tag', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_expense_tag_tag_id'))
+        batch_op.drop_constraint('uq_expense_tag_expense_id_tag_id', type_='unique')
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_tag_category_id_name', type_='unique')
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_expense_category_id'))
@@ -0,0 +1,73 @@
+"""full-text search index on expense name and description
+
+Revision ID: 5e7a1c93d4b8
+Revises: 8c41e6f0b2d7
+Create Date: 2026-10-18 17:20:41.302915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import SQLITE_TABLE, SQLITE_TRIGGERS
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a1c93d4b8'
+down_revision = '8c41e6f0b2d7'
+branch_labels = None
+depends_on = None
+
+SQLITE_UPGRADE = [SQLITE_TABLE] + SQLITE_TRIGGERS + [
+    # Index the rows that already exist.
+    "INSERT INTO expense_fts(expense_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DOWNGRADE = [
+    "DROP TRIGGER IF EXISTS expense_fts_update",
+    "DROP TRIGGER IF EXISTS expense_fts_delete",
+    "DROP TRIGGER IF EXISTS expense_fts_insert",
+    "DROP TABLE IF EXISTS expense_fts",
+]
+
+POSTGRESQL_UPGRADE = [
+    "ALTER TABLE expense ADD COLUMN search_vector tsvector",
+    "CREATE OR REPLACE FUNCTION expense_search_vector_update() RETURNS trigger AS $$ "
+    "BEGIN "
+    "NEW.search_vector := setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') "
+    "|| setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B'); "
+    "RETURN NEW; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER expense_search_vector_trigger BEFORE INSERT OR UPDATE OF name, description "
+    "ON expense FOR EACH ROW EXECUTE FUNCTION expense_search_vector_update()",
+    "UPDATE expense SET search_vector = "
+    "setweight(to_tsvector('simple', coalesce(name, '')), 'A') "
+    "|| setweight(to_tsvector('simple', coalesce(description, '')), 'B')",
+    "CREATE INDEX ix_expense_search_vector ON expense USING gin (search_vector)",
+]
+
+POSTGRESQL_DOWNGRADE = [
+    "DROP INDEX IF EXISTS ix_expense_search_vector",
+    "DROP TRIGGER IF EXISTS expense_search_vector_trigger ON expense",
+    "DROP FUNCTION IF EXISTS expense_search_vector_update()",
+    "ALTER TABLE expense DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def statements(sqlite, postgresql):
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return sqlite
+    if dialect == 'postgresql':
+        return postgresql
+    # Other backends search with LIKE and need nothing here.
+    return []
+
+
+def upgrade():
+    for statement in statements(SQLITE_UPGRADE, POSTGRESQL_UPGRADE):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in statements(SQLITE_DOWNGRADE, POSTGRESQL_DOWNGRADE):
+        op.execute(statement)
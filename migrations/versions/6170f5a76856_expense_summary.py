@@ -0,0 +1,73 @@
+"""expense created_at and expense_summary
+
+Revision ID: 6170f5a76856
+Revises: 4b2491717409
+Create Date: 2026-10-18 09:12:41.522310
+
+"""
+from datetime import datetime, timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6170f5a76856'
+down_revision = '4b2491717409'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    now = datetime.utcnow()
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.execute(sa.text("UPDATE expense SET created_at = :now").bindparams(now=now))
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=False)
+
+    op.create_table('expense_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(length=16), nullable=False),
+    sa.Column('key_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('min_price', sa.Float(), nullable=True),
+    sa.Column('max_price', sa.Float(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dimension', 'period', 'key_id', 'bucket')
+    )
+
+    # Every existing expense was just stamped with the same created_at, so
+    # each period has exactly one bucket and the backfill is a plain GROUP BY.
+    today = now.date()
+    buckets = {
+        'day': today,
+        'week': today - timedelta(days=today.weekday()),
+        'month': today.replace(day=1),
+    }
+    for period, bucket in buckets.items():
+        params = dict(period=period, bucket=bucket)
+        op.execute(sa.text(
+            "INSERT INTO expense_summary "
+            "(dimension, key_id, period, bucket, count, total, min_price, max_price) "
+            "SELECT 'category', category_id, :period, :bucket, "
+            "COUNT(*), SUM(price), MIN(price), MAX(price) "
+            "FROM expense GROUP BY category_id"
+        ).bindparams(**params))
+        op.execute(sa.text(
+            "INSERT INTO expense_summary "
+            "(dimension, key_id, period, bucket, count, total, min_price, max_price) "
+            "SELECT 'tag', expense_tag.tag_id, :period, :bucket, "
+            "COUNT(*), SUM(expense.price), MIN(expense.price), MAX(expense.price) "
+            "FROM expense_tag JOIN expense ON expense.id = expense_tag.expense_id "
+            "GROUP BY expense_tag.tag_id"
+        ).bindparams(**params))
+
+
+def downgrade():
+    op.drop_table('expense_summary')
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_column('created_at')
@@ -0,0 +1,51 @@
+"""store money as integer cents with a currency
+
+Revision ID: 8c41e6f0b2d7
+Revises: 2a3f9047b47c
+Create Date: 2026-10-18 16:02:18.410552
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41e6f0b2d7'
+down_revision = '2a3f9047b47c'
+branch_labels = None
+depends_on = None
+
+# (table, float column, cents column, nullable)
+MONEY_COLUMNS = [
+    ('expense', 'price', 'price_cents', False),
+    ('expense_summary', 'total', 'total_cents', False),
+    ('expense_summary', 'min_price', 'min_price_cents', True),
+    ('expense_summary', 'max_price', 'max_price_cents', True),
+]
+
+
+def upgrade():
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default='USD', nullable=False))
+
+    for table, old, new, nullable in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(new, sa.BigInteger(), nullable=True))
+        # The float columns held two-place amounts, so rounding recovers the cents.
+        op.execute("UPDATE {} SET {} = CAST(ROUND({} * 100) AS BIGINT)".format(table, new, old))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(new, existing_type=sa.BigInteger(), nullable=nullable)
+            batch_op.drop_column(old)
+
+
+def downgrade():
+    for table, old, new, nullable in reversed(MONEY_COLUMNS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column(old, sa.Float(), nullable=True))
+        op.execute("UPDATE {} SET {} = {} / 100.0".format(table, old, new))
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(old, existing_type=sa.Float(), nullable=nullable)
+            batch_op.drop_column(new)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_column('currency')
@@ -0,0 +1,32 @@
+"""cache_version table
+
+Revision ID: 97decc49da1a
+Revises: d1edb233101d
+Create Date: 2026-10-18 11:26:52.804117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '97decc49da1a'
+down_revision = 'd1edb233101d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    cache_version = op.create_table('cache_version',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(cache_version, [
+        {'name': name, 'version': 0}
+        for name in ('category', 'tag', 'expense', 'expense_tag')
+    ])
+
+
+def downgrade():
+    op.drop_table('cache_version')
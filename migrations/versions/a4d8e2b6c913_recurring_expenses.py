@@ -0,0 +1,71 @@
+"""recurring expense templates and leases
+
+Revision ID: a4d8e2b6c913
+Revises: f7a3c9e1d254
+Create Date: 2026-10-18 23:52:17.604418
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e2b6c913'
+down_revision = 'f7a3c9e1d254'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('lease',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('holder', sa.String(length=128), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.create_table('recurring_expense',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=80), nullable=False),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('price_cents', sa.BigInteger(), nullable=False),
+    sa.Column('currency', sa.String(length=3), server_default='USD', nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('interval', sa.String(length=8), nullable=False),
+    sa.Column('every', sa.Integer(), nullable=False),
+    sa.Column('starts_at', sa.DateTime(), nullable=False),
+    sa.Column('ends_at', sa.DateTime(), nullable=True),
+    sa.Column('next_run_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], name='fk_recurring_expense_category_id_category', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('recurring_expense', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recurring_expense_category_id'), ['category_id'], unique=False)
+        batch_op.create_index('ix_recurring_expense_next_run_at', ['next_run_at'], unique=False)
+        batch_op.create_index('ix_recurring_expense_user_id', ['user_id'], unique=False)
+
+    op.create_table('recurring_expense_tag',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('recurring_expense_id', sa.Integer(), nullable=False),
+    sa.Column('tag_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['recurring_expense_id'], ['recurring_expense.id'], name='fk_recurring_expense_tag_recurring_expense_id_recurring_expense', ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], name='fk_recurring_expense_tag_tag_id_tag', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('recurring_expense_id', 'tag_id', name='uq_recurring_expense_tag_recurring_expense_id_tag_id')
+    )
+    with op.batch_alter_table('recurring_expense_tag', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_recurring_expense_tag_tag_id'), ['tag_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('recurring_expense_tag', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_recurring_expense_tag_tag_id'))
+
+    op.drop_table('recurring_expense_tag')
+    with op.batch_alter_table('recurring_expense', schema=None) as batch_op:
+        batch_op.drop_index('ix_recurring_expense_user_id')
+        batch_op.drop_index('ix_recurring_expense_next_run_at')
+        batch_op.drop_index(batch_op.f('ix_recurring_expense_category_id'))
+
+    op.drop_table('recurring_expense')
+    op.drop_table('lease')
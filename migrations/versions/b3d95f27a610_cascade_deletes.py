@@ -0,0 +1,72 @@
+"""cascade deletes from category, expense and tag
+
+Revision ID: b3d95f27a610
+Revises: 5e7a1c93d4b8
+Create Date: 2026-10-18 18:05:13.127490
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import SQLITE_TRIGGERS
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d95f27a610'
+down_revision = '5e7a1c93d4b8'
+branch_labels = None
+depends_on = None
+
+# (table, column, referred table)
+FOREIGN_KEYS = [
+    ('expense', 'category_id', 'category'),
+    ('tag', 'category_id', 'category'),
+    ('expense_tag', 'expense_id', 'expense'),
+    ('expense_tag', 'tag_id', 'tag'),
+]
+
+# Lets batch mode find SQLite's unnamed foreign keys by these names.
+NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+def existing_name(table, column, referred):
+    if op.get_bind().dialect.name == 'sqlite':
+        return 'fk_{}_{}_{}'.format(table, column, referred)
+    # PostgreSQL's default name for the unnamed constraints of the initial schema.
+    return '{}_{}_fkey'.format(table, column)
+
+
+def replace_foreign_keys(ondelete, old_name, new_name):
+    for table, column, referred in FOREIGN_KEYS:
+        with op.batch_alter_table(table, schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(old_name(table, column, referred), type_='foreignkey')
+            batch_op.create_foreign_key(
+                new_name(table, column, referred), referred, [column], ['id'], ondelete=ondelete,
+            )
+    if op.get_bind().dialect.name == 'sqlite':
+        # Recreating expense on SQLite drops the full-text search triggers.
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+
+
+def cascade_name(table, column, referred):
+    return 'fk_{}_{}_{}'.format(table, column, referred)
+
+
+def upgrade():
+    # Deleting categories through the ORM left their tags and the links of
+    # deleted expenses behind; the new constraints would reject them.
+    op.execute("DELETE FROM tag WHERE category_id NOT IN (SELECT id FROM category)")
+    op.execute(
+        "DELETE FROM expense_tag WHERE expense_id NOT IN (SELECT id FROM expense) "
+        "OR tag_id NOT IN (SELECT id FROM tag)"
+    )
+    op.execute(
+        "DELETE FROM expense_summary WHERE "
+        "(dimension = 'category' AND key_id NOT IN (SELECT id FROM category)) "
+        "OR (dimension = 'tag' AND key_id NOT IN (SELECT id FROM tag))"
+    )
+    replace_foreign_keys('CASCADE', existing_name, cascade_name)
+
+
+def downgrade():
+    replace_foreign_keys(None, cascade_name, existing_name)
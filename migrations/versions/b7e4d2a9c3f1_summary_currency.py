@@ -0,0 +1,138 @@
+"""expense_summary and budget per currency
+
+Revision ID: b7e4d2a9c3f1
+Revises: d8b2a6f4e571
+Create Date: 2026-10-20 09:41:17.382514
+
+"""
+from datetime import timedelta
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e4d2a9c3f1'
+down_revision = 'd8b2a6f4e571'
+branch_labels = None
+depends_on = None
+
+PERIODS = ('day', 'week', 'month')
+DEFAULT_CURRENCY = 'USD'
+SUMMARY_KEY = 'uq_expense_summary_dimension_period_key_id_bucket_currency'
+BUDGET_KEY = 'uq_budget_dimension_period_key_id_currency'
+OLD_BUDGET_KEY = 'uq_budget_dimension_period_key_id'
+# Lets batch mode find SQLite's unnamed unique constraint by this name.
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def old_summary_key():
+    if op.get_bind().dialect.name == 'sqlite':
+        return 'uq_expense_summary_dimension'
+    # PostgreSQL's default name for the unnamed constraint of 6170f5a76856.
+    return 'expense_summary_dimension_period_key_id_bucket_key'
+
+
+def bucket(period, moment):
+    day = moment.date()
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def mixed_keys(connection):
+    """The category and tag ids that have expenses in a currency other than USD."""
+    categories = connection.execute(sa.text(
+        "SELECT DISTINCT category_id FROM expense WHERE currency <> :currency"
+    ), {'currency': DEFAULT_CURRENCY}).scalars().all()
+    tags = connection.execute(sa.text(
+        "SELECT DISTINCT expense_tag.tag_id FROM expense_tag "
+        "JOIN expense ON expense.id = expense_tag.expense_id WHERE expense.currency <> :currency"
+    ), {'currency': DEFAULT_CURRENCY}).scalars().all()
+    return {'category': categories, 'tag': tags}
+
+
+def recount(connection, keys, by_currency):
+    """Replace the expense_summary rows of ``keys`` with counts from expense.
+
+    With ``by_currency`` each currency gets rows of its own, as the
+    application keeps them; without, all currencies are added together.
+    """
+    queries = {
+        'category': "SELECT category_id, created_at, price_cents, currency FROM expense WHERE category_id IN :ids",
+        'tag': (
+            "SELECT expense_tag.tag_id, expense.created_at, expense.price_cents, expense.currency "
+            "FROM expense_tag JOIN expense ON expense.id = expense_tag.expense_id WHERE expense_tag.tag_id IN :ids"
+        ),
+    }
+    summaries = {}
+    for dimension, key_ids in keys.items():
+        if not key_ids:
+            continue
+        ids = {'ids': sorted(key_ids)}
+        connection.execute(
+            sa.text("DELETE FROM expense_summary WHERE dimension = :dimension AND key_id IN :ids")
+            .bindparams(sa.bindparam('ids', expanding=True)),
+            dict(ids, dimension=dimension),
+        )
+        rows = connection.execute(
+            sa.text(queries[dimension]).bindparams(sa.bindparam('ids', expanding=True)).columns(
+                sa.column('key_id', sa.Integer()), sa.column('created_at', sa.DateTime()),
+                sa.column('price_cents', sa.BigInteger()), sa.column('currency', sa.String()),
+            ),
+            ids,
+        )
+        for key_id, created_at, price, currency in rows:
+            currency = currency if by_currency else DEFAULT_CURRENCY
+            for period in PERIODS:
+                key = (dimension, period, key_id, bucket(period, created_at), currency)
+                count, total, low, high = summaries.get(key, (0, 0, price, price))
+                summaries[key] = (count + 1, total + price, min(low, price), max(high, price))
+    if summaries:
+        connection.execute(
+            sa.text(
+                "INSERT INTO expense_summary "
+                "(dimension, period, key_id, bucket, currency, count, total_cents, min_price_cents, max_price_cents) "
+                "VALUES (:dimension, :period, :key_id, :bucket, :currency, :count, :total, :min_price, :max_price)"
+            ),
+            [
+                dict(dimension=dimension, period=period, key_id=key_id, bucket=day, currency=currency,
+                     count=count, total=total, min_price=low, max_price=high)
+                for (dimension, period, key_id, day, currency), (count, total, low, high) in summaries.items()
+            ],
+        )
+
+
+def upgrade():
+    with op.batch_alter_table('expense_summary', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default=DEFAULT_CURRENCY, nullable=False))
+        batch_op.drop_constraint(old_summary_key(), type_='unique')
+        batch_op.create_unique_constraint(SUMMARY_KEY, ['dimension', 'period', 'key_id', 'bucket', 'currency'])
+
+    with op.batch_alter_table('budget', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('currency', sa.String(length=3), server_default=DEFAULT_CURRENCY, nullable=False))
+        batch_op.drop_constraint(OLD_BUDGET_KEY, type_='unique')
+        batch_op.create_unique_constraint(BUDGET_KEY, ['dimension', 'period', 'key_id', 'currency'])
+
+    # Every existing row is now labelled USD; the keys that added other
+    # currencies into it are split by currency. Existing budgets count USD.
+    connection = op.get_bind()
+    recount(connection, mixed_keys(connection), by_currency=True)
+
+
+def downgrade():
+    connection = op.get_bind()
+    recount(connection, mixed_keys(connection), by_currency=False)
+    op.execute("DELETE FROM budget WHERE currency <> '{}'".format(DEFAULT_CURRENCY))
+
+    with op.batch_alter_table('budget', schema=None) as batch_op:
+        batch_op.drop_constraint(BUDGET_KEY, type_='unique')
+        batch_op.create_unique_constraint(OLD_BUDGET_KEY, ['dimension', 'period', 'key_id'])
+        batch_op.drop_column('currency')
+
+    with op.batch_alter_table('expense_summary', schema=None) as batch_op:
+        batch_op.drop_constraint(SUMMARY_KEY, type_='unique')
+        batch_op.create_unique_constraint(old_summary_key(), ['dimension', 'period', 'key_id', 'bucket'])
+        batch_op.drop_column('currency')
@@ -0,0 +1,30 @@
+"""revoked_token.revoked_at
+
+Revision ID: c5e1f7a9b302
+Revises: a4d8e2b6c913
+Create Date: 2026-10-19 09:12:44.871203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1f7a9b302'
+down_revision = 'a4d8e2b6c913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Rows from before it count as revoked at the epoch; a worker's first
+    # sync reads every row anyway.
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('revoked_at', sa.Float(), server_default='0', nullable=False))
+        batch_op.create_index(batch_op.f('ix_revoked_token_revoked_at'), ['revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('revoked_token', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_revoked_token_revoked_at'))
+        batch_op.drop_column('revoked_at')
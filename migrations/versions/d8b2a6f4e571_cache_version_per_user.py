@@ -0,0 +1,37 @@
+"""cache_version per user
+
+Revision ID: d8b2a6f4e571
+Revises: c5e1f7a9b302
+Create Date: 2026-10-19 10:27:05.114690
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8b2a6f4e571'
+down_revision = 'c5e1f7a9b302'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Versions only matter relative to themselves and ETags now include the
+    # table names, so the global rows can go and per-user ones start afresh.
+    op.drop_table('cache_version')
+    op.create_table('cache_version',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('user_id', 'name')
+    )
+
+
+def downgrade():
+    op.drop_table('cache_version')
+    op.create_table('cache_version',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
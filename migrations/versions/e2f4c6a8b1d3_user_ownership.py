@@ -0,0 +1,82 @@
+"""categories, tags and expenses owned by a user
+
+Revision ID: e2f4c6a8b1d3
+Revises: b3d95f27a610
+Create Date: 2026-10-18 20:14:36.552108
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import SQLITE_TRIGGERS
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2f4c6a8b1d3'
+down_revision = 'b3d95f27a610'
+branch_labels = None
+depends_on = None
+
+OWNED_TABLES = ['category', 'tag', 'expense']
+
+# Lets batch mode find SQLite's unnamed unique constraint on category.name.
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+def category_name_constraint():
+    if op.get_bind().dialect.name == 'sqlite':
+        return 'uq_category_name'
+    # PostgreSQL's default name for the unnamed constraint of the initial schema.
+    return 'category_name_key'
+
+
+def recreate_search_triggers():
+    if op.get_bind().dialect.name == 'sqlite':
+        # Recreating expense on SQLite drops the full-text search triggers.
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    connection = op.get_bind()
+    # Rows from before ownership go to the first user, the admin.
+    owner = connection.execute(sa.text('SELECT MIN(id) FROM "user"')).scalar()
+    for table in OWNED_TABLES:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('user_id', sa.Integer(), nullable=True))
+        if owner is not None:
+            op.execute(sa.text('UPDATE {} SET user_id = :owner'.format(table)).bindparams(owner=owner))
+        elif connection.execute(sa.text('SELECT COUNT(*) FROM {}'.format(table))).scalar():
+            raise RuntimeError("Existing {} rows need an owner; register a user first.".format(table))
+
+    with op.batch_alter_table('category', schema=None, naming_convention=NAMING_CONVENTION) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.drop_constraint(category_name_constraint(), type_='unique')
+        batch_op.create_unique_constraint('uq_category_user_id_name', ['user_id', 'name'])
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_tag_user_id_name', ['user_id', 'name'], unique=False)
+
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_index('ix_expense_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index('ix_expense_user_id_created_at', ['user_id', 'created_at'], unique=False)
+    recreate_search_triggers()
+
+
+def downgrade():
+    with op.batch_alter_table('expense', schema=None) as batch_op:
+        batch_op.drop_index('ix_expense_user_id_created_at')
+        batch_op.drop_index('ix_expense_user_id_id')
+        batch_op.drop_column('user_id')
+
+    with op.batch_alter_table('tag', schema=None) as batch_op:
+        batch_op.drop_index('ix_tag_user_id_name')
+        batch_op.drop_column('user_id')
+
+    # Fails if two users have categories of the same name.
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_category_user_id_name', type_='unique')
+        batch_op.create_unique_constraint(category_name_constraint(), ['name'])
+        batch_op.drop_column('user_id')
+    recreate_search_triggers()
@@ -0,0 +1,51 @@
+"""budgets and overspend alerts
+
+Revision ID: f7a3c9e1d254
+Revises: e2f4c6a8b1d3
+Create Date: 2026-10-18 22:41:09.318274
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7a3c9e1d254'
+down_revision = 'e2f4c6a8b1d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('budget',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('dimension', sa.String(length=16), nullable=False),
+    sa.Column('key_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(length=8), nullable=False),
+    sa.Column('limit_cents', sa.BigInteger(), nullable=False),
+    sa.Column('alert_at', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('dimension', 'period', 'key_id', name='uq_budget_dimension_period_key_id')
+    )
+    with op.batch_alter_table('budget', schema=None) as batch_op:
+        batch_op.create_index('ix_budget_user_id', ['user_id'], unique=False)
+
+    op.create_table('budget_alert',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('budget_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('total_cents', sa.BigInteger(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['budget_id'], ['budget.id'], name='fk_budget_alert_budget_id_budget', ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('budget_id', 'bucket', name='uq_budget_alert_budget_id_bucket')
+    )
+
+
+def downgrade():
+    op.drop_table('budget_alert')
+    with op.batch_alter_table('budget', schema=None) as batch_op:
+        batch_op.drop_index('ix_budget_user_id')
+
+    op.drop_table('budget')
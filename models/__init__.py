@@ -2,4 +2,10 @@ from models.category import CategoryModel
 from models.expense import ExpenseModel
 from models.tag import TagModel
 from models.expense_tag import ExpenseTags
-from models.user import UserModel
\ No newline at end of file
+from models.user import UserModel
+from models.expense_summary import ExpenseSummaryModel
+from models.revoked_token import RevokedTokenModel
+from models.cache_version import CacheVersionModel
+from models.budget import BudgetModel, BudgetAlertModel
+from models.recurring_expense import RecurringExpenseModel, RecurringExpenseTags
+from models.lease import LeaseModel
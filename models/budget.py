@@ -0,0 +1,51 @@
+from datetime import datetime
+
+from db import db
+from models.money import DEFAULT_CURRENCY, MinorUnits
+
+
+class BudgetModel(db.Model):
+    __tablename__ = "budget"
+    __table_args__ = (
+        # One budget per category or tag, period and currency; also finds the
+        # budgets of the summary buckets a write touches.
+        db.UniqueConstraint(
+            "dimension", "period", "key_id", "currency", name="uq_budget_dimension_period_key_id_currency",
+        ),
+        db.Index("ix_budget_user_id", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    # Same keys as expense_summary: "category" or "tag", its id, and
+    # "day", "week" or "month".
+    dimension = db.Column(db.String(16), nullable=False)
+    key_id = db.Column(db.Integer, nullable=False)
+    period = db.Column(db.String(8), nullable=False)
+    limit = db.Column("limit_cents", MinorUnits, key="limit", nullable=False)
+    # Only expenses in this currency count toward the limit.
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
+    # Percent of the limit at which spending raises an alert.
+    alert_at = db.Column(db.Integer, nullable=False, default=100)
+    alerts = db.relationship("BudgetAlertModel", back_populates="budget", cascade="all, delete", passive_deletes=True)
+
+
+class BudgetAlertModel(db.Model):
+    __tablename__ = "budget_alert"
+    __table_args__ = (
+        # At most one alert per budget and period.
+        db.UniqueConstraint("budget_id", "bucket", name="uq_budget_alert_budget_id_bucket"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    budget_id = db.Column(
+        db.Integer,
+        db.ForeignKey("budget.id", name="fk_budget_alert_budget_id_budget", ondelete="CASCADE"),
+        nullable=False,
+    )
+    # First day of the period that went over, as in expense_summary.
+    bucket = db.Column(db.Date, nullable=False)
+    # Spending in the period right after the write that crossed the threshold.
+    total = db.Column("total_cents", MinorUnits, key="total", nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    budget = db.relationship("BudgetModel", back_populates="alerts")
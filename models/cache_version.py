@@ -0,0 +1,11 @@
+from db import db
+
+
+class CacheVersionModel(db.Model):
+    __tablename__ = "cache_version"
+
+    # No foreign key: in sharded mode the user table lives in another database.
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    # Table name whose writes invalidate the user's cached responses.
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
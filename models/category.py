@@ -3,8 +3,15 @@ from .expense import ExpenseModel
 
 class CategoryModel(db.Model):
     __tablename__ = "category"
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "name", name="uq_category_user_id_name"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(80), unique=True, nullable=False)
-    expense = db.relationship("ExpenseModel", back_populates="category", lazy="dynamic",cascade="all, delete")
-    tag= db.relationship("TagModel",back_populates="category",lazy="dynamic")
\ No newline at end of file
+    # No foreign key: in sharded mode the user table lives in another database.
+    user_id = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String(80), nullable=False)
+    # The foreign keys cascade, so deleting a category is left to the
+    # database instead of loading every expense and tag (see deletes.py).
+    expense = db.relationship("ExpenseModel", back_populates="category",cascade="all, delete", passive_deletes=True)
+    tag= db.relationship("TagModel",back_populates="category",cascade="all, delete", passive_deletes=True)
\ No newline at end of file
@@ -1,13 +1,31 @@
+from datetime import datetime
+
 from db import db
+from models.money import DEFAULT_CURRENCY, MinorUnits
 
 
 class ExpenseModel(db.Model):
     __tablename__ = "expense"
+    __table_args__ = (
+        # Every query is scoped to one user: listing pages by id, reports by date.
+        db.Index("ix_expense_user_id_id", "user_id", "id"),
+        db.Index("ix_expense_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
+    # No foreign key: in sharded mode the user table lives in another database.
+    user_id = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(80), unique=False, nullable=False)
     description = db.Column(db.String)
-    price = db.Column(db.Float(precision=2), unique=False, nullable=False)
-    category_id = db.Column(db.Integer,db.ForeignKey("category.id"), unique=False, nullable=False)
+    price = db.Column("price_cents", MinorUnits, key="price", unique=False, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
+    category_id = db.Column(
+        db.Integer,
+        db.ForeignKey("category.id", name="fk_expense_category_id_category", ondelete="CASCADE"),
+        unique=False,
+        nullable=False,
+        index=True,
+    )
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     category = db.relationship("CategoryModel", back_populates="expense")
-    tag= db.relationship("TagModel",back_populates="expense",secondary="expense_tag")
\ No newline at end of file
+    tag= db.relationship("TagModel",back_populates="expense",secondary="expense_tag",order_by="TagModel.id")
\ No newline at end of file
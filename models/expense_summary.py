@@ -0,0 +1,26 @@
+from db import db
+from models.money import DEFAULT_CURRENCY, MinorUnits
+
+
+class ExpenseSummaryModel(db.Model):
+    __tablename__ = "expense_summary"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "dimension", "period", "key_id", "bucket", "currency",
+            name="uq_expense_summary_dimension_period_key_id_bucket_currency",
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # "category" or "tag"; key_id is the id of that category or tag.
+    dimension = db.Column(db.String(16), nullable=False)
+    key_id = db.Column(db.Integer, nullable=False)
+    # "day", "week" or "month"; bucket is the first day of the period.
+    period = db.Column(db.String(8), nullable=False)
+    bucket = db.Column(db.Date, nullable=False)
+    # Amounts in different currencies are never added together.
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column("total_cents", MinorUnits, key="total", nullable=False, default=0)
+    min_price = db.Column("min_price_cents", MinorUnits, key="min_price")
+    max_price = db.Column("max_price_cents", MinorUnits, key="max_price")
@@ -2,9 +2,12 @@ from db import db
 
 class ExpenseTags(db.Model):
     __tablename__="expense_tag"
+    __table_args__ = (
+        db.UniqueConstraint("expense_id", "tag_id", name="uq_expense_tag_expense_id_tag_id"),
+    )
 
     id = db.Column(db.Integer,primary_key="True")
-    expense_id=db.Column(db.Integer,db.ForeignKey("expense.id"))
-    tag_id= db.Column(db.Integer,db.ForeignKey("tag.id"))
+    expense_id=db.Column(db.Integer,db.ForeignKey("expense.id", name="fk_expense_tag_expense_id_expense", ondelete="CASCADE"))
+    tag_id= db.Column(db.Integer,db.ForeignKey("tag.id", name="fk_expense_tag_tag_id_tag", ondelete="CASCADE"), index=True)
 
     
\ No newline at end of file
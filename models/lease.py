@@ -0,0 +1,10 @@
+from db import db
+
+
+class LeaseModel(db.Model):
+    __tablename__ = "lease"
+
+    # What the lease is for, e.g. "recurring".
+    name = db.Column(db.String(32), primary_key=True)
+    holder = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,37 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from db import db
+
+CENT = Decimal("0.01")
+# Far inside a BigInteger of cents, so summary totals of many amounts fit too.
+MAX_AMOUNT = Decimal("1e13")
+DEFAULT_CURRENCY = "USD"
+
+
+def to_minor_units(amount):
+    """Convert a decimal amount (Decimal, str, int or float) to integer cents."""
+    if not isinstance(amount, Decimal):
+        # str() first so a float like 0.29 isn't read as 0.28999...
+        amount = Decimal(str(amount))
+    return int(amount.quantize(CENT, rounding=ROUND_HALF_UP).scaleb(2))
+
+
+def from_minor_units(cents):
+    return Decimal(cents).scaleb(-2)
+
+
+class MinorUnits(db.TypeDecorator):
+    """A money amount stored as an integer number of cents.
+
+    Python sees Decimal amounts with two places; SQL sums, minimums and
+    maximums run on the integers and are converted back on the way out.
+    """
+
+    impl = db.BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_minor_units(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else from_minor_units(value)
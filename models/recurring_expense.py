@@ -0,0 +1,59 @@
+from db import db
+from models.money import DEFAULT_CURRENCY, MinorUnits
+
+
+class RecurringExpenseModel(db.Model):
+    __tablename__ = "recurring_expense"
+    __table_args__ = (
+        # The scheduler's query for what is due.
+        db.Index("ix_recurring_expense_next_run_at", "next_run_at"),
+        db.Index("ix_recurring_expense_user_id", "user_id"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    # Copied into every expense made from the template.
+    name = db.Column(db.String(80), nullable=False)
+    description = db.Column(db.String)
+    price = db.Column("price_cents", MinorUnits, key="price", nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default=DEFAULT_CURRENCY, server_default=DEFAULT_CURRENCY)
+    category_id = db.Column(
+        db.Integer,
+        db.ForeignKey("category.id", name="fk_recurring_expense_category_id_category", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
+    # Repeats every ``every`` days, weeks, months or years from starts_at.
+    interval = db.Column(db.String(8), nullable=False)
+    every = db.Column(db.Integer, nullable=False, default=1)
+    starts_at = db.Column(db.DateTime, nullable=False)
+    ends_at = db.Column(db.DateTime)
+    # The first occurrence not yet turned into an expense; None once ended.
+    next_run_at = db.Column(db.DateTime)
+    tags = db.relationship("TagModel", secondary="recurring_expense_tag", order_by="TagModel.id")
+
+    @property
+    def tag_ids(self):
+        return [tag.id for tag in self.tags]
+
+
+class RecurringExpenseTags(db.Model):
+    __tablename__ = "recurring_expense_tag"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "recurring_expense_id", "tag_id", name="uq_recurring_expense_tag_recurring_expense_id_tag_id"
+        ),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    recurring_expense_id = db.Column(
+        db.Integer,
+        db.ForeignKey("recurring_expense.id", name="fk_recurring_expense_tag_recurring_expense_id_recurring_expense", ondelete="CASCADE"),
+        nullable=False,
+    )
+    tag_id = db.Column(
+        db.Integer,
+        db.ForeignKey("tag.id", name="fk_recurring_expense_tag_tag_id_tag", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    )
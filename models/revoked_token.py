@@ -0,0 +1,12 @@
+from db import db
+
+
+class RevokedTokenModel(db.Model):
+    __tablename__ = "revoked_token"
+
+    id = db.Column(db.Integer, primary_key=True)
+    jti = db.Column(db.String(36), unique=True, nullable=False)
+    # Unix timestamp copied from the token's "exp" claim.
+    expires_at = db.Column(db.Integer, nullable=False, index=True)
+    # Unix timestamp of the logout; workers pull new revocations by it.
+    revoked_at = db.Column(db.Float, nullable=False, default=0, server_default="0", index=True)
@@ -3,12 +3,18 @@ from db import db
 
 class TagModel(db.Model):
     __tablename__ = "tag"
+    __table_args__ = (
+        db.UniqueConstraint("category_id", "name", name="uq_tag_category_id_name"),
+        db.Index("ix_tag_user_id_name", "user_id", "name"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
+    # Always the category's owner. No foreign key, as for category.
+    user_id = db.Column(db.Integer, nullable=False)
     name = db.Column(db.String(80), unique=False, nullable=False)
     category_id = db.Column(
         db.Integer,
-        db.ForeignKey("category.id"),
+        db.ForeignKey("category.id", name="fk_tag_category_id_category", ondelete="CASCADE"),
         nullable=False
     )
 
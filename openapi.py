@@ -0,0 +1,49 @@
+"""
+openapi.py
+
+flask-smorest documents every view as its blueprint is registered, resolving
+each schema into the OpenAPI spec. That is a large share of create_app, and a
+serving worker rarely needs the spec at all.
+
+With OPENAPI_LAZY the views are only documented on the first request for
+/openapi.json (or the Swagger UI). With OPENAPI_SPEC_CACHE pointing to a file
+written by "flask openapi write", /openapi.json serves that file instead and
+the spec is never built in the worker.
+"""
+import os
+import threading
+
+import flask_smorest
+from flask import send_file
+
+
+class Api(flask_smorest.Api):
+    def __init__(self, *args, **kwargs):
+        self.pending = []
+        self.pending_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def register_blueprint(self, blp, *, parameters=None, **options):
+        if not self._app.config.get("OPENAPI_LAZY"):
+            return super().register_blueprint(blp, parameters=parameters, **options)
+
+        # Same as flask_smorest.Api.register_blueprint, minus the documentation.
+        name = options.get("name", blp.name)
+        self._app.extensions["flask-smorest"]["blp_name_to_api"][name] = self
+        self._app.register_blueprint(blp, **options)
+        with self.pending_lock:
+            self.pending.append((blp, name, parameters))
+
+    def document_pending(self):
+        with self.pending_lock:
+            pending, self.pending = self.pending, []
+            for blp, name, parameters in pending:
+                blp.register_views_in_doc(self, self._app, self.spec, name=name, parameters=parameters)
+                self.spec.tag({"name": name, "description": blp.description})
+
+    def _openapi_json(self):
+        cache = self._app.config.get("OPENAPI_SPEC_CACHE")
+        if cache and os.path.exists(cache):
+            return send_file(os.path.abspath(cache), mimetype="application/json")
+        self.document_pending()
+        return super()._openapi_json()
@@ -0,0 +1,29 @@
+"""
+ownership.py
+
+Categories, tags and expenses belong to the user whose token created them.
+Every query in resources/ starts from ``owned`` (or filters on
+``current_user_id``), so a request only sees, and only scans, its caller's
+rows. The indexes on those tables lead with user_id for that reason.
+"""
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from flask_smorest import abort
+
+
+def current_user_id():
+    """The id of the user making the request; needs a verified token."""
+    return int(get_jwt_identity())
+
+
+def owned(model):
+    """``model.query`` limited to the current user's rows."""
+    return model.query.filter(model.user_id == current_user_id())
+
+
+def get_owned_or_404(model, id):
+    return owned(model).filter(model.id == id).first_or_404()
+
+
+def require_self_or_admin(user_id):
+    if user_id != current_user_id() and not get_jwt().get("is_admin"):
+        abort(403, message="You can only access your own account.")
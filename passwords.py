@@ -0,0 +1,161 @@
+"""
+passwords.py
+
+Password hashing for the user resources.
+
+The pbkdf2_sha256 cost is set per deployment with PASSWORD_HASH_ROUNDS;
+hashes made with a different cost are upgraded the next time the user logs
+in. Hashing and verification run on a small process pool so a slow hash does
+not hold the GIL of the serving worker, and at most PASSWORD_POOL_MAX_PENDING
+jobs may be queued before new ones are turned away.
+
+LOGIN_THROTTLE rejects logins before any hashing is done once a username or a
+client address has had too many failed ones, so a user who logs in often is
+never locked out. Registrations, which always hash, have their own per-address
+limit. The counters live in each worker process, so a deployment with N
+workers allows up to N times the configured attempts.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# passlib's own default for pbkdf2_sha256.
+DEFAULT_ROUNDS = 29000
+
+_contexts = {}
+
+
+def get_context(rounds):
+    # CryptContext instances can't be pickled, so pool workers build their own.
+    if rounds not in _contexts:
+        # Imported here to keep passlib off the worker startup path.
+        from passlib.context import CryptContext
+        _contexts[rounds] = CryptContext(schemes=["pbkdf2_sha256"], pbkdf2_sha256__rounds=rounds)
+    return _contexts[rounds]
+
+
+def _hash(rounds, password):
+    return get_context(rounds).hash(password)
+
+
+def _verify(rounds, password, stored):
+    return get_context(rounds).verify(password, stored)
+
+
+class PoolBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.rounds = DEFAULT_ROUNDS
+        self.workers = 0
+        self.slots = threading.BoundedSemaphore(1)
+        self.pool = None
+        self.pool_pid = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config.setdefault("PASSWORD_HASH_ROUNDS", DEFAULT_ROUNDS)
+        self.workers = app.config.setdefault("PASSWORD_POOL_WORKERS", 2)
+        max_pending = app.config.setdefault("PASSWORD_POOL_MAX_PENDING", self.workers * 4)
+        self.slots = threading.BoundedSemaphore(max(max_pending, 1))
+
+    def get_pool(self):
+        # A pool inherited through a gunicorn fork is unusable; start a new one.
+        with self.lock:
+            if self.pool is None or self.pool_pid != os.getpid():
+                self.pool = ProcessPoolExecutor(max_workers=self.workers)
+                self.pool_pid = os.getpid()
+            return self.pool
+
+    def run(self, func, *args):
+        if self.workers <= 0:
+            return func(self.rounds, *args)
+        if not self.slots.acquire(blocking=False):
+            raise PoolBusy()
+        try:
+            return self.get_pool().submit(func, self.rounds, *args).result()
+        finally:
+            self.slots.release()
+
+    def hash(self, password):
+        return self.run(_hash, password)
+
+    def verify(self, password, stored):
+        return self.run(_verify, password, stored)
+
+    def needs_update(self, stored):
+        return get_context(self.rounds).needs_update(stored)
+
+
+class LoginThrottle:
+    def __init__(self):
+        self.user_limit = (5, 60)
+        self.address_limit = (20, 60)
+        self.register_limit = (20, 60)
+        self.hits = {}
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        # Failed logins per username and per address, and registrations per address.
+        self.user_limit = app.config.setdefault("LOGIN_THROTTLE_PER_USER", (5, 60))
+        self.address_limit = app.config.setdefault("LOGIN_THROTTLE_PER_ADDRESS", (20, 60))
+        self.register_limit = app.config.setdefault("LOGIN_THROTTLE_REGISTER_PER_ADDRESS", (20, 60))
+        with self.lock:
+            self.hits.clear()
+
+    def full(self, key, limit, now):
+        attempts, window = limit
+        history = self.hits.get(key)
+        if history is None:
+            return False
+        while history and history[0] <= now - window:
+            history.popleft()
+        return len(history) >= attempts
+
+    def record(self, key, now):
+        if len(self.hits) > 10_000:
+            self.prune(now)
+        self.hits.setdefault(key, deque()).append(now)
+
+    def login_keys(self, username, address):
+        keys = []
+        if address is not None:
+            keys.append((("address", address), self.address_limit))
+        if username is not None:
+            keys.append((("user", username), self.user_limit))
+        return keys
+
+    def allow(self, username=None, address=None):
+        """Return False if either key has had too many failed logins."""
+        now = time.monotonic()
+        with self.lock:
+            return not any(self.full(key, limit, now) for key, limit in self.login_keys(username, address))
+
+    def record_failure(self, username=None, address=None):
+        now = time.monotonic()
+        with self.lock:
+            for key, _ in self.login_keys(username, address):
+                self.record(key, now)
+
+    def allow_register(self, address):
+        """Record a registration, returning False if ``address`` is over its limit."""
+        now = time.monotonic()
+        key = ("register", address)
+        with self.lock:
+            if self.full(key, self.register_limit, now):
+                return False
+            self.record(key, now)
+            return True
+
+    def prune(self, now):
+        window = max(self.user_limit[1], self.address_limit[1], self.register_limit[1])
+        for key in [key for key, history in self.hits.items() if not history or history[-1] <= now - window]:
+            del self.hits[key]
+
+
+PASSWORDS = PasswordHasher()
+LOGIN_THROTTLE = LoginThrottle()
@@ -0,0 +1,268 @@
+"""
+recurring.py
+
+Recurring expenses such as rent, subscriptions and salaries. A template
+repeats every ``every`` days, weeks, months or years from starts_at, until
+ends_at if it has one. Its next_run_at is the first occurrence not yet turned
+into an expense.
+
+``materialize_due`` turns every occurrence up to now into an expense, for a
+batch of templates at a time. Each batch is one transaction with a fixed
+number of statements: the INSERT of the expenses, the INSERT of their
+expense_tag links, the summary and cache updates, and one UPDATE moving the
+templates' next_run_at. A template that missed a month of days catches up in
+the same statements as one that is due once. A crash rolls the batch back
+whole, so a later run neither skips nor repeats an occurrence.
+
+With RECURRING_SCHEDULER set, every worker starts a scheduler thread at its
+first request, and it wakes every RECURRING_INTERVAL seconds. Only the worker
+holding the "recurring" lease (see leases.py) materializes anything; the
+lease lasts RECURRING_LEASE_SECONDS unless renewed. "flask run-recurring"
+does one run from the command line.
+"""
+import calendar
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import insert, select, update
+
+from cache import bump_versions
+from db import db
+from leases import acquire_lease, release_lease
+from models import ExpenseModel, ExpenseTags, RecurringExpenseModel, RecurringExpenseTags
+from shards import SHARDS
+from summaries import apply_changes
+
+INTERVALS = ("day", "week", "month", "year")
+LEASE_NAME = "recurring"
+# Templates per transaction.
+TEMPLATE_BATCH_SIZE = 500
+# Rows per INSERT; see BULK_CHUNK_SIZE in resources/expense.py.
+INSERT_CHUNK_SIZE = 1000
+
+
+def add_months(moment, months, day):
+    """``moment`` moved by ``months``, on ``day`` or the last day of a shorter month."""
+    month = moment.month - 1 + months
+    year = moment.year + month // 12
+    month = month % 12 + 1
+    return moment.replace(year=year, month=month, day=min(day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(template, n):
+    """The ``n``th occurrence of ``template``, counting starts_at as 0."""
+    steps = n * template.every
+    if template.interval == "day":
+        return template.starts_at + timedelta(days=steps)
+    if template.interval == "week":
+        return template.starts_at + timedelta(weeks=steps)
+    months = steps * 12 if template.interval == "year" else steps
+    # From starts_at each time, so a rent due on the 31st stays on it after February.
+    return add_months(template.starts_at, months, template.starts_at.day)
+
+
+def occurrence_index(template, moment):
+    """The ``n`` of the occurrence at ``moment``."""
+    if template.interval in ("day", "week"):
+        step = timedelta(days=template.every * (7 if template.interval == "week" else 1))
+        return (moment - template.starts_at) // step
+    months = (moment.year - template.starts_at.year) * 12 + moment.month - template.starts_at.month
+    return months // (template.every * (12 if template.interval == "year" else 1))
+
+
+def first_run(template):
+    """The next_run_at of a new template: starts_at, or None if it ends first."""
+    if template.ends_at is not None and template.ends_at < template.starts_at:
+        return None
+    return template.starts_at
+
+
+def due_occurrences(template, now):
+    """The occurrences of ``template`` up to ``now``, and the one after them.
+
+    The one after is None when the template ends before it.
+    """
+    n = occurrence_index(template, template.next_run_at)
+    moment = template.next_run_at
+    moments = []
+    while moment is not None and moment <= now:
+        moments.append(moment)
+        n += 1
+        moment = occurrence(template, n)
+        if template.ends_at is not None and moment > template.ends_at:
+            moment = None
+    return moments, moment
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def materialize_due(session, now, limit=TEMPLATE_BATCH_SIZE):
+    """Create the expenses due by ``now`` for up to ``limit`` templates and commit.
+
+    Returns how many templates were due and how many expenses were created.
+    """
+    template = RecurringExpenseModel
+    templates = session.execute(
+        select(
+            template.id, template.user_id, template.name, template.description, template.price,
+            template.currency, template.category_id, template.interval, template.every,
+            template.starts_at, template.ends_at, template.next_run_at,
+        )
+        .where(template.next_run_at <= now)
+        .order_by(template.id)
+        .limit(limit)
+    ).all()
+    if not templates:
+        return 0, 0
+
+    tags = {}
+    rows = session.execute(
+        select(RecurringExpenseTags.recurring_expense_id, RecurringExpenseTags.tag_id)
+        .where(RecurringExpenseTags.recurring_expense_id.in_([row.id for row in templates]))
+        .order_by(RecurringExpenseTags.tag_id)
+    )
+    for template_id, tag_id in rows:
+        tags.setdefault(template_id, []).append(tag_id)
+
+    records = []
+    record_tags = []
+    next_runs = []
+    for row in templates:
+        moments, next_run_at = due_occurrences(row, now)
+        for moment in moments:
+            records.append({
+                "user_id": row.user_id,
+                "name": row.name,
+                "price": row.price,
+                "currency": row.currency,
+                "description": row.description,
+                "category_id": row.category_id,
+                "created_at": moment,
+            })
+            record_tags.append(tags.get(row.id, []))
+        next_runs.append({"id": row.id, "next_run_at": next_run_at})
+
+    try:
+        ids = []
+        for chunk in chunked(records, INSERT_CHUNK_SIZE):
+            result = session.execute(
+                insert(ExpenseModel).returning(ExpenseModel.id, sort_by_parameter_order=True),
+                chunk,
+            )
+            ids.extend(result.scalars())
+
+        links = [
+            {"expense_id": expense_id, "tag_id": tag_id}
+            for expense_id, expense_tag_ids in zip(ids, record_tags)
+            for tag_id in expense_tag_ids
+        ]
+        for chunk in chunked(links, INSERT_CHUNK_SIZE):
+            session.execute(insert(ExpenseTags), chunk)
+
+        # Bulk inserts skip the flush events, as in ExpenseBulk.post.
+        apply_changes(session.connection(), [
+            (1, record["category_id"], record["created_at"], record["price"], record["currency"], expense_tag_ids)
+            for record, expense_tag_ids in zip(records, record_tags)
+        ])
+        bump_versions(session, {record["user_id"] for record in records}, ["expense", "expense_tag"])
+        session.execute(update(RecurringExpenseModel), next_runs)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    return len(templates), len(records)
+
+
+class RecurringScheduler:
+    """Materializes recurring expenses on a thread of whichever worker holds the lease."""
+
+    def __init__(self):
+        self.enabled = False
+        self.interval = 60
+        self.lease_seconds = 300
+        self.batch_size = TEMPLATE_BATCH_SIZE
+        self.holder = None
+        self.thread = None
+        self.thread_pid = None
+        self.lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.setdefault("RECURRING_SCHEDULER", False)
+        self.interval = app.config.setdefault("RECURRING_INTERVAL", 60)
+        # Outlasts a few missed renewals.
+        self.lease_seconds = app.config.setdefault("RECURRING_LEASE_SECONDS", 300)
+        self.batch_size = app.config.setdefault("RECURRING_BATCH_SIZE", TEMPLATE_BATCH_SIZE)
+        app.cli.add_command(run_recurring_command)
+        if self.enabled:
+            app.before_request(self.start)
+
+    def start(self):
+        # Like the password pool, a thread inherited through a fork is gone.
+        if self.thread is not None and self.thread_pid == os.getpid():
+            return
+        with self.lock:
+            if self.thread is not None and self.thread_pid == os.getpid():
+                return
+            self.holder = "{}:{}:{}".format(socket.gethostname(), os.getpid(), uuid.uuid4().hex[:8])
+            self.thread = threading.Thread(
+                target=self.loop, args=(current_app._get_current_object(),), name="recurring", daemon=True
+            )
+            self.thread_pid = os.getpid()
+            self.thread.start()
+
+    def loop(self, app):
+        while True:
+            with app.app_context():
+                try:
+                    self.run(self.holder)
+                except Exception:
+                    db.session.rollback()
+                    app.logger.exception("Recurring expense run failed")
+            time.sleep(self.interval)
+
+    def run(self, holder, now=None):
+        """Materialize everything due if ``holder`` gets the lease.
+
+        Returns the number of expenses created, or None without the lease.
+        """
+        if not acquire_lease(db.session, LEASE_NAME, holder, self.lease_seconds):
+            return None
+        now = now or datetime.utcnow()
+        created = 0
+        for shard in SHARDS.keys or [None]:
+            with SHARDS.pinned(db.session, shard):
+                while True:
+                    templates, expenses = materialize_due(db.session, now, self.batch_size)
+                    created += expenses
+                    if templates < self.batch_size:
+                        break
+                    # A long catch-up must not outlive the lease.
+                    if not acquire_lease(db.session, LEASE_NAME, holder, self.lease_seconds):
+                        return created
+        return created
+
+
+RECURRING = RecurringScheduler()
+
+
+@click.command("run-recurring")
+@with_appcontext
+def run_recurring_command():
+    """Create the expenses that recurring templates have due."""
+    holder = "cli:{}:{}".format(socket.gethostname(), os.getpid())
+    created = RECURRING.run(holder)
+    if created is None:
+        raise click.ClickException("A worker's scheduler holds the lease and is creating them already.")
+    # Hand the lease straight back to the workers.
+    release_lease(db.session, LEASE_NAME, holder)
+    click.echo("Created {} recurring expenses.".format(created))
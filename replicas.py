@@ -0,0 +1,156 @@
+"""
+replicas.py
+
+Optional read replicas. DATABASE_REPLICA_URLS lists them, comma-separated;
+each becomes a Flask-SQLAlchemy bind named replica_0, replica_1, ...
+
+RoutingSession (see routing.py) sends the queries of GET and HEAD requests
+to a healthy replica and everything else to the primary: other methods,
+anything run while the session has pending changes, and reads of
+revoked_token (a revoked token must stop working at once). A successful write gives the client a cookie that
+keeps its reads on the primary for REPLICA_STICKY_SECONDS, so it reads its own
+writes.
+
+Each worker checks the replicas at most every REPLICA_CHECK_INTERVAL seconds,
+lazily from a request. Every write bumps a row of cache_version (see
+cache.py), so the sum of its versions only grows, and a replica is as fresh
+as the primary was when it had the same sum. One that fails the check, or has
+not caught up with what the primary had REPLICA_MAX_LAG seconds ago, gets no
+reads until a later check passes.
+"""
+import random
+import threading
+import time
+from collections import deque
+
+from flask import g, has_request_context, request
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+READ_METHODS = ("GET", "HEAD")
+# Tables whose reads must never be stale.
+PRIMARY_TABLES = ("revoked_token",)
+STICKY_COOKIE = "primary_until"
+
+
+def replica_binds(urls, options):
+    """SQLALCHEMY_BINDS for a comma-separated list of replica URLs.
+
+    ``options(url)`` gives the engine options, as for the primary.
+    """
+    urls = [url.strip() for url in (urls or "").split(",") if url.strip()]
+    return {"replica_{}".format(i): {"url": url, **options(url)} for i, url in enumerate(urls)}
+
+
+POSITION = text("SELECT COALESCE(SUM(version), 0) FROM cache_version")
+
+
+def caught_up(position, snapshot):
+    return position >= snapshot
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.keys = []
+        self.sticky_seconds = 5
+        self.max_lag = 10.0
+        self.check_interval = 2.0
+        self.logger = None
+        self.health = {}
+        # (monotonic time, primary cache_version sum) from recent checks, oldest first.
+        self.snapshots = deque()
+        self.checked_at = None
+        self.check_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.keys = sorted(key for key in app.config.get("SQLALCHEMY_BINDS") or {} if key.startswith("replica_"))
+        self.sticky_seconds = app.config.setdefault("REPLICA_STICKY_SECONDS", 5)
+        self.max_lag = app.config.setdefault("REPLICA_MAX_LAG", 10.0)
+        self.check_interval = app.config.setdefault("REPLICA_CHECK_INTERVAL", 2.0)
+        self.logger = app.logger
+        # Unchecked replicas get no reads.
+        self.health = {key: {"healthy": False, "lag": None, "error": None} for key in self.keys}
+        self.snapshots.clear()
+        self.checked_at = None
+        if self.keys:
+            app.after_request(self.make_sticky)
+
+    def bind_key(self, session):
+        """The bind for this request's reads: a replica's key, or None for the primary."""
+        if not self.keys or not has_request_context():
+            return None
+        if "replica" not in g:
+            g.replica = None
+            if request.method in READ_METHODS and not self.sticky():
+                g.replica = self.choose(session)
+        return g.replica
+
+    def sticky(self):
+        try:
+            return float(request.cookies.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def make_sticky(self, response):
+        if request.method not in READ_METHODS + ("OPTIONS",) and response.status_code < 400:
+            response.set_cookie(
+                STICKY_COOKIE,
+                "{:.3f}".format(time.time() + self.sticky_seconds),
+                max_age=self.sticky_seconds,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+    def choose(self, session):
+        now = time.monotonic()
+        if self.checked_at is None or now - self.checked_at >= self.check_interval:
+            # One thread checks; the others keep using the last result.
+            if self.check_lock.acquire(blocking=False):
+                try:
+                    self.check(session)
+                finally:
+                    self.check_lock.release()
+        healthy = [key for key in self.keys if self.health[key]["healthy"]]
+        return random.choice(healthy) if healthy else None
+
+    def check(self, session):
+        engines = session._db.engines
+        now = time.monotonic()
+        self.checked_at = now
+        try:
+            # The request may already hold a primary connection, and the pool
+            # may have no other one to spare.
+            primary = session.connection(bind_arguments={"bind": engines[None]}).execute(POSITION).scalar()
+        except SQLAlchemyError as e:
+            self.logger.warning("Skipping replica check, primary not reachable: %s", e)
+            return
+        self.snapshots.append((now, primary))
+        # Keep the newest snapshot at least max_lag old, and everything after it.
+        while len(self.snapshots) > 1 and now - self.snapshots[1][0] >= self.max_lag:
+            self.snapshots.popleft()
+
+        for key in self.keys:
+            try:
+                with engines[key].connect() as connection:
+                    position = connection.execute(POSITION).scalar()
+            except SQLAlchemyError as e:
+                self.update(key, False, None, str(e))
+                continue
+            lag = next(
+                (now - taken_at for taken_at, snapshot in self.snapshots if not caught_up(position, snapshot)),
+                0.0,
+            )
+            self.update(key, caught_up(position, self.snapshots[0][1]), lag, None)
+
+    def update(self, key, healthy, lag, error):
+        if healthy != self.health[key]["healthy"]:
+            if healthy:
+                self.logger.info("Replica %s is healthy, routing reads to it.", key)
+            else:
+                self.logger.warning("Replica %s is unhealthy (lag %s, error %s), reading from the primary.", key, lag, error)
+        self.health[key] = {"healthy": healthy, "lag": lag, "error": error}
+
+
+REPLICAS = ReplicaRouter()
+
@@ -0,0 +1,47 @@
+"""
+reports.py
+
+In-Python reporting over expense prices. The integer cents of every matching
+expense are loaded into one NumPy int64 array with a single query, and sums,
+percentiles and histograms are computed on the array rather than by
+iterating rows or ORM objects.
+"""
+import numpy as np
+from sqlalchemy import BigInteger, select, type_coerce
+
+from db import db
+from models import ExpenseModel
+from models.money import from_minor_units
+
+PERCENTILES = (50, 75, 90, 95, 99)
+
+
+def load_prices(criteria, session=None):
+    """Return the prices of the expenses matching ``criteria`` as an int64 array of cents."""
+    session = session or db.session
+    result = session.scalars(select(type_coerce(ExpenseModel.price, BigInteger)).where(*criteria))
+    return np.fromiter(result, dtype=np.int64)
+
+
+def price_distribution(cents, bins=10):
+    if cents.size == 0:
+        return {"count": 0, "total": 0, "percentiles": {}, "histogram": []}
+
+    counts, edges = np.histogram(cents, bins=bins)
+    edges = edges / 100
+    return {
+        "count": int(cents.size),
+        # Integer sum, so the total is exact to the cent.
+        "total": from_minor_units(int(cents.sum())),
+        "mean": float(cents.mean()) / 100,
+        "min_price": from_minor_units(int(cents.min())),
+        "max_price": from_minor_units(int(cents.max())),
+        "percentiles": {
+            "p{}".format(q): float(value) / 100
+            for q, value in zip(PERCENTILES, np.percentile(cents, PERCENTILES))
+        },
+        "histogram": [
+            {"lower": float(edges[i]), "upper": float(edges[i + 1]), "count": int(counts[i])}
+            for i in range(len(counts))
+        ],
+    }
@@ -0,0 +1,95 @@
+from flask import current_app, request
+from flask.views import MethodView
+from flask_smorest import abort
+from werkzeug.test import EnvironBuilder
+
+from db import db
+from schemas import BatchSchema, BatchResultSchema
+from instrumentation import Blueprint
+
+
+blp = Blueprint("Batch", "batch", description="Several API calls in one request")
+
+# Blueprints whose endpoints may be called from a batch.
+BATCH_BLUEPRINTS = {"Expense", "Categories", "Tag"}
+# Body and CORS headers that don't apply to an embedded response.
+DROPPED_HEADERS = {"Content-Length", "Content-Type", "Transfer-Encoding", "Vary"}
+
+
+def embedded_headers(response):
+    return {
+        key: value
+        for key, value in response.headers.items()
+        if key not in DROPPED_HEADERS and not key.startswith("Access-Control-")
+    }
+
+
+def sub_request_environ(sub_request):
+    headers = {}
+    if "Authorization" in request.headers:
+        headers["Authorization"] = request.headers["Authorization"]
+    kwargs = {"json": sub_request["body"]} if sub_request.get("body") is not None else {}
+    builder = EnvironBuilder(
+        path=sub_request["path"],
+        method=sub_request["method"],
+        headers=headers,
+        base_url=request.host_url,
+        environ_base={"REMOTE_ADDR": request.remote_addr},
+        **kwargs,
+    )
+    try:
+        return builder.get_environ()
+    finally:
+        builder.close()
+
+
+def dispatch(app, sub_request):
+    """Run one sub-request inside the current app context and return its response."""
+    with app.request_context(sub_request_environ(sub_request)):
+        if request.routing_exception is None and request.blueprint not in BATCH_BLUEPRINTS:
+            return {"status": 400, "headers": {}, "body": {"message": "Not allowed in a batch."}}
+        # Like Flask.full_dispatch_request, minus the request signals: the
+        # sub-requests are accounted to the batch request itself.
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = app.dispatch_request()
+        except Exception as e:
+            try:
+                rv = app.handle_user_exception(e)
+            except Exception:
+                current_app.logger.exception("Batched %s %s failed", request.method, request.path)
+                db.session.rollback()
+                return {"status": 500, "headers": {}, "body": {"message": "Internal server error."}}
+        response = app.process_response(app.make_response(rv))
+        # A failed sub-request may leave a failed flush or commit behind
+        # (CategoryList.post aborts with 400 on a duplicate name), which
+        # would fail every later sub-request of the batch.
+        transaction = db.session().get_transaction()
+        if response.status_code >= 400 or (transaction is not None and not transaction.is_active):
+            db.session.rollback()
+        return {
+            "status": response.status_code,
+            "headers": embedded_headers(response),
+            "body": response.get_json(silent=True) if response.is_json else response.get_data(as_text=True),
+        }
+
+
+@blp.route("/batch")
+class Batch(MethodView):
+    @blp.arguments(BatchSchema)
+    @blp.response(200, BatchResultSchema)
+    def post(self, batch_data):
+        """Run sub-requests against the expense, category and tag endpoints.
+
+        Sub-requests run in order, in this request's app context, with its
+        Authorization header. They share one database session, so a batch of
+        GETs reads from a single transaction; writes commit as they would
+        on their own.
+        """
+        sub_requests = batch_data["requests"]
+        if len(sub_requests) > current_app.config["BATCH_MAX_REQUESTS"]:
+            abort(400, message="A batch may hold at most {} requests.".format(current_app.config["BATCH_MAX_REQUESTS"]))
+
+        app = current_app._get_current_object()
+        return {"responses": [dispatch(app, sub_request) for sub_request in sub_requests]}
@@ -0,0 +1,108 @@
+from datetime import datetime
+
+from flask.views import MethodView
+from flask_smorest import abort
+from flask_jwt_extended import jwt_required
+from sqlalchemy import tuple_
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+
+from db import db
+from models import BudgetAlertModel, BudgetModel, CategoryModel, ExpenseSummaryModel, TagModel
+from models.money import from_minor_units
+from ownership import current_user_id, get_owned_or_404, owned
+from budgets import evaluate_budgets
+from summaries import bucket_bounds
+from schemas import BudgetSchema, BudgetAlertSchema, BudgetAlertQueryArgsSchema
+from instrumentation import Blueprint
+
+
+blp = Blueprint("Budget", "budget", description="Spending limits and overspend alerts")
+
+KEY_MODELS = {"category": CategoryModel, "tag": TagModel}
+
+
+def summary_key(budget):
+    return budget.dimension, budget.period, budget.key_id, budget.bucket, budget.currency
+
+
+def with_spending(budgets):
+    """Set ``bucket`` and ``spent`` for each budget's current period, with one query."""
+    now = datetime.utcnow()
+    for budget in budgets:
+        budget.bucket, _ = bucket_bounds(budget.period, now)
+    spent = {}
+    if budgets:
+        summary = ExpenseSummaryModel
+        key = tuple_(summary.dimension, summary.period, summary.key_id, summary.bucket, summary.currency)
+        rows = db.session.query(
+            summary.dimension, summary.period, summary.key_id, summary.bucket, summary.currency, summary.total,
+        ).filter(key.in_([summary_key(budget) for budget in budgets]))
+        spent = {tuple(row[:5]): row.total for row in rows}
+    for budget in budgets:
+        budget.spent = spent.get(summary_key(budget), from_minor_units(0))
+    return budgets
+
+
+@blp.route("/budget")
+class BudgetList(MethodView):
+    @jwt_required()
+    @blp.response(200, BudgetSchema(many=True))
+    def get(self):
+        return with_spending(owned(BudgetModel).order_by(BudgetModel.id).all())
+
+    @jwt_required()
+    @blp.arguments(BudgetSchema)
+    @blp.response(201, BudgetSchema)
+    def post(self, budget_data):
+        """Create a budget for one of the caller's categories or tags.
+
+        Periods already over the threshold are alerted right away.
+        """
+        keys = KEY_MODELS[budget_data["dimension"]]
+        if owned(keys).filter(keys.id == budget_data["key_id"]).first() is None:
+            abort(400, message="{} not found.".format(budget_data["dimension"].capitalize()))
+
+        budget = BudgetModel(user_id=current_user_id(), **budget_data)
+        try:
+            db.session.add(budget)
+            db.session.flush()
+            evaluate_budgets(db.session.connection(), [budget.id])
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            abort(
+                409,
+                message="A budget for that {}, period and currency already exists.".format(budget_data["dimension"]),
+            )
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while creating the budget.")
+        return with_spending([budget])[0]
+
+
+@blp.route("/budget/<int:budget_id>")
+class Budget(MethodView):
+    @jwt_required()
+    @blp.response(200, BudgetSchema)
+    def get(self, budget_id):
+        return with_spending([get_owned_or_404(BudgetModel, budget_id)])[0]
+
+    @jwt_required()
+    def delete(self, budget_id):
+        budget = get_owned_or_404(BudgetModel, budget_id)
+        db.session.delete(budget)
+        db.session.commit()
+        return {"message": "Budget deleted."}
+
+
+@blp.route("/budget/alerts")
+class BudgetAlerts(MethodView):
+    @jwt_required()
+    @blp.arguments(BudgetAlertQueryArgsSchema, location="query")
+    @blp.response(200, BudgetAlertSchema(many=True))
+    def get(self, query_args):
+        """The caller's overspend alerts, newest first."""
+        query = BudgetAlertModel.query.join(BudgetAlertModel.budget).filter(BudgetModel.user_id == current_user_id())
+        if "budget_id" in query_args:
+            query = query.filter(BudgetAlertModel.budget_id == query_args["budget_id"])
+        return query.order_by(BudgetAlertModel.id.desc()).limit(query_args["limit"]).all()
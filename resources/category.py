@@ -1,40 +1,68 @@
 
-from flask import request
+from flask import current_app, request
 from flask.views import MethodView
-from flask_smorest import Blueprint, abort
+from flask_smorest import abort
+from flask_jwt_extended import jwt_required
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from models import CategoryModel
 from db import db
+from loaders import loader_options
+from ownership import current_user_id, get_owned_or_404, owned
+from cache import RESPONSE_CACHE
+from deletes import BACKGROUND_DELETES, delete_category
 
-from schemas import CategorySchema 
+from schemas import CategorySchema, CategoryDeleteArgsSchema
+from instrumentation import Blueprint
 
 blp = Blueprint("Categories", __name__, description="Operations on categories")
 
 
 @blp.route("/category/<string:category_id>")
 class Category(MethodView):
+    @jwt_required()
+    # Categories embed their tags and expenses, but not the links between them.
+    @RESPONSE_CACHE.cached("category", "tag", "expense")
     @blp.response(200 , CategorySchema)
     def get(self, category_id):
-        category = CategoryModel.query.get_or_404(category_id)
+        category = get_owned_or_404(CategoryModel, category_id)
         return category
 
-    def delete(self, category_id):
-        category= CategoryModel.query.get_or_404(category_id)
-        db.session.delete(category)
-        db.session.commit()
+    @jwt_required()
+    @blp.arguments(CategoryDeleteArgsSchema, location="query")
+    def delete(self, delete_args, category_id):
+        """Delete a category with its expenses and tags.
+
+        With ``chunked=true`` the expenses are deleted in batches in the
+        background and the response is 202 Accepted.
+        """
+        get_owned_or_404(CategoryModel, category_id)
+        if delete_args["chunked"]:
+            BACKGROUND_DELETES.delete_category(current_app._get_current_object(), current_user_id(), int(category_id))
+            return {"message": "Category deletion started"}, 202
+
+        try:
+            delete_category(db.session, int(category_id))
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while deleting the category.")
         return{"message":"Category deleted"}
 
 
 @blp.route("/category")
 class CategoryList(MethodView):
+    @jwt_required()
+    # Categories embed their tags and expenses, but not the links between them.
+    @RESPONSE_CACHE.cached("category", "tag", "expense")
     @blp.response(200 , CategorySchema(many=True))
     def get(self):
-        return CategoryModel.query.all() 
+        return owned(CategoryModel).options(*loader_options(CategorySchema)).all()
 
+    @jwt_required()
     @blp.arguments(CategorySchema)
     @blp.response(200,CategorySchema)
     def post(self , category_data):
-        category = CategoryModel(**category_data)
+        category = CategoryModel(user_id=current_user_id(), **category_data)
         try:
             db.session.add(category)
             db.session.commit()
@@ -1,21 +1,117 @@
 
+import csv
+import io
+from datetime import datetime
+
 from flask.views import MethodView
-from flask_smorest import Blueprint, abort
+from flask_smorest import abort
 from flask_jwt_extended import jwt_required ,  get_jwt
+from sqlalchemy import insert, or_, select
 from sqlalchemy.exc import SQLAlchemyError
-from flask import make_response, jsonify
+from marshmallow import ValidationError
+from flask import current_app, make_response, jsonify, json, request, Response, stream_with_context
 from db import db
-from models import ExpenseModel
+from models import CategoryModel, ExpenseModel, ExpenseTags, TagModel
+from models.money import DEFAULT_CURRENCY
+from loaders import loader_options
+from ownership import current_user_id, get_owned_or_404, owned
+from summaries import apply_changes
+from serializers import expense_documents, json_response
+from export import FORMATS, export_rows, gzip_chunks
+from search import search, search_terms
+from instrumentation import Blueprint
 
 blp = Blueprint("Expense", __name__, description="Operations on expenses")
-from schemas import ExpenseSchema ,ExpenseUpdateSchema
+from schemas import (
+    ExpenseSchema,
+    ExpenseUpdateSchema,
+    ExpenseQueryArgsSchema,
+    ExpenseSearchArgsSchema,
+    ExpenseExportArgsSchema,
+    ExpenseBulkItemSchema,
+    ExpenseBulkResultSchema,
+)
+
+# Rows fetched per round trip when streaming NDJSON.
+STREAM_BATCH_SIZE = 500
+# Rows fetched per round trip, and encoded per chunk, by /expense/export.
+EXPORT_BATCH_SIZE = 5000
+# Rows sent per multi-row INSERT during bulk ingestion.
+BULK_CHUNK_SIZE = 1000
+
+
+def expense_filters(query_args):
+    """Return the WHERE criteria for the filters in ``query_args``, within the caller's expenses."""
+    criteria = [ExpenseModel.user_id == current_user_id()]
+    if "cursor" in query_args:
+        criteria.append(ExpenseModel.id > query_args["cursor"])
+    if "category_id" in query_args:
+        criteria.append(ExpenseModel.category_id == query_args["category_id"])
+    if "tag_id" in query_args:
+        criteria.append(ExpenseModel.tag.any(TagModel.id == query_args["tag_id"]))
+    if "min_price" in query_args:
+        criteria.append(ExpenseModel.price >= query_args["min_price"])
+    if "max_price" in query_args:
+        criteria.append(ExpenseModel.price <= query_args["max_price"])
+    if "currency" in query_args:
+        criteria.append(ExpenseModel.currency == query_args["currency"])
+    if query_args.get("name"):
+        criteria.append(ExpenseModel.name.startswith(query_args["name"], autoescape=True))
+    return criteria
+
+
+def filter_expenses(query_args):
+    """Build the filtered, id-ordered expense query shared by the list endpoints."""
+    query = ExpenseModel.query.options(*loader_options(ExpenseSchema))
+    return query.filter(*expense_filters(query_args)).order_by(ExpenseModel.id)
+
+
+def expense_rows(query_args):
+    """Same rows as ``filter_expenses``, as the column tuples ``expense_documents`` takes."""
+    return (
+        select(
+            ExpenseModel.id,
+            ExpenseModel.name,
+            ExpenseModel.price,
+            ExpenseModel.currency,
+            CategoryModel.id,
+            CategoryModel.name,
+        )
+        .join(ExpenseModel.category)
+        .where(*expense_filters(query_args))
+        .order_by(ExpenseModel.id)
+    )
+
+
+def require_owned_category(category_id):
+    if owned(CategoryModel).filter(CategoryModel.id == category_id).first() is None:
+        abort(400, message="Category not found.")
+
+
+def stream_expenses(query):
+    """Yield one JSON document per line, fetching rows in fixed-size batches."""
+    schema = ExpenseSchema()
+    # The view's session is torn down before streaming starts; reading
+    # through it would check out a connection nothing ever returns.
+    rows = query.with_session(db.session()).yield_per(STREAM_BATCH_SIZE)
+    for expense in rows:
+        yield json.dumps(schema.dump(expense)) + "\n"
+
+
+def stream_expense_rows(statement):
+    """Like ``stream_expenses``, for a statement from ``expense_rows``."""
+    result = db.session.execute(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+    for rows in result.partitions():
+        documents, _ = expense_documents(rows)
+        for document in documents:
+            yield json.dumps(document) + "\n"
 
 @blp.route("/expense/<string:expense_id>")
 class Expense(MethodView):
     @blp.response(200,ExpenseSchema)
     @jwt_required()
     def get(self, expense_id):
-        expense = ExpenseModel.query.get_or_404(expense_id)
+        expense = get_owned_or_404(ExpenseModel, expense_id)
         return expense
 
     @jwt_required()
@@ -25,20 +121,29 @@ class Expense(MethodView):
             if not jwt.get("is_admin"):
                 abort(401, message="Admin privilege required.")
 
-        expense = ExpenseModel.query.get_or_404(expense_id)
+        expense = get_owned_or_404(ExpenseModel, expense_id)
         db.session.delete(expense)
         db.session.commit()
         return{"message":"Expense deleted"}
 
+    @jwt_required()
     @blp.arguments(ExpenseUpdateSchema)
     @blp.response( 200 ,ExpenseSchema)
     def put(self, expense_data ,expense_id):
-        expense = ExpenseModel.query.get(expense_id)
+        expense = owned(ExpenseModel).filter(ExpenseModel.id == expense_id).first()
         if expense:
             expense.price=expense_data["price"]
             expense.name=expense_data["name"]
+            if "currency" in expense_data:
+                expense.currency = expense_data["currency"]
+            if "description" in expense_data:
+                expense.description = expense_data["description"]
         else:
-            expense=ExpenseModel(id = expense_id ,**expense_data)
+            if ExpenseModel.query.filter(ExpenseModel.id == expense_id).first() is not None:
+                # Another user's expense.
+                abort(409, message="An expense with that id already exists.")
+            require_owned_category(expense_data.get("category_id"))
+            expense=ExpenseModel(id = expense_id ,user_id=current_user_id(),**expense_data)
         db.session.add(expense)
         db.session.commit()
 
@@ -47,18 +152,261 @@ class Expense(MethodView):
 @blp.route("/expense")
 class ExpenseList(MethodView):
     @jwt_required()
+    @blp.arguments(ExpenseQueryArgsSchema, location="query")
     @blp.response(200, ExpenseSchema(many=True))
-    def get(self):
-        return ExpenseModel.query.all() 
+    def get(self, query_args):
+        if current_app.config["FAST_SERIALIZATION"]:
+            return self.get_rows(query_args)
+
+        query = filter_expenses(query_args)
+        if query_args["stream"]:
+            return Response(
+                stream_with_context(stream_expenses(query)),
+                mimetype="application/x-ndjson",
+            )
+
+        # Fetch one extra row to know whether another page exists.
+        limit = query_args["limit"]
+        expenses = query.limit(limit + 1).all()
+        headers = {}
+        if len(expenses) > limit:
+            expenses = expenses[:limit]
+            headers["X-Next-Cursor"] = str(expenses[-1].id)
+        return expenses, headers
+
+    def get_rows(self, query_args):
+        # Bypasses ExpenseSchema; the documents are identical (see serializers.py).
+        statement = expense_rows(query_args)
+        if query_args["stream"]:
+            return Response(
+                stream_with_context(stream_expense_rows(statement)),
+                mimetype="application/x-ndjson",
+            )
+
+        limit = query_args["limit"]
+        rows = db.session.execute(statement.limit(limit + 1)).all()
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Cursor"] = str(rows[-1][0])
+        documents, orjson_safe = expense_documents(rows)
+        return json_response(documents, orjson_safe), headers
 
     @jwt_required(fresh=True)
     @blp.arguments(ExpenseSchema)
     @blp.response(201, ExpenseSchema)
     def post(self, expense_data):
-        expense = ExpenseModel(**expense_data)
+        require_owned_category(expense_data["category_id"])
+        expense = ExpenseModel(user_id=current_user_id(), **expense_data)
         try:
             db.session.add(expense)
             db.session.commit()
         except SQLAlchemyError:
             abort(500, message="An error occurred while inserting the item.")
         return expense  # ✅ Flask-Smorest will serialize & return 201
+
+
+@blp.route("/expense/search")
+class ExpenseSearch(MethodView):
+    @jwt_required()
+    @blp.arguments(ExpenseSearchArgsSchema, location="query")
+    @blp.response(200, ExpenseSchema(many=True))
+    def get(self, query_args):
+        """Expenses whose name or description contains words starting with each term in ``q``.
+
+        Results are ordered by relevance. When there are more, the
+        X-Next-Offset header holds the ``offset`` of the next page.
+        """
+        terms = search_terms(query_args["q"])
+        if not terms:
+            return []
+
+        statement = search(expense_rows(query_args).order_by(None), terms, db.session.get_bind().dialect.name)
+        limit, offset = query_args["limit"], query_args["offset"]
+        rows = db.session.execute(statement.limit(limit + 1).offset(offset)).all()
+        headers = {}
+        if len(rows) > limit:
+            rows = rows[:limit]
+            headers["X-Next-Offset"] = str(offset + limit)
+
+        if not current_app.config["FAST_SERIALIZATION"]:
+            ids = [row[0] for row in rows]
+            expenses = {
+                expense.id: expense
+                for expense in filter_expenses({}).filter(ExpenseModel.id.in_(ids))
+            }
+            return [expenses[expense_id] for expense_id in ids], headers
+
+        documents, orjson_safe = expense_documents(rows)
+        return json_response(documents, orjson_safe), headers
+
+
+@blp.route("/expense/export")
+class ExpenseExport(MethodView):
+    @jwt_required()
+    @blp.arguments(ExpenseExportArgsSchema, location="query")
+    @blp.response(200, content_type="text/csv", description="CSV, or the columnar format described in export.py.")
+    def get(self, query_args):
+        write_chunks, mimetype, extension = FORMATS[query_args["format"]]
+        statement = export_rows(expense_filters(query_args))
+
+        def row_chunks():
+            result = db.session.execute(statement.execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for rows in result.partitions():
+                yield rows
+
+        body = write_chunks(row_chunks())
+        headers = {"Content-Disposition": "attachment; filename=expenses.{}".format(extension)}
+        if "gzip" in request.accept_encodings:
+            body = gzip_chunks(body)
+            headers["Content-Encoding"] = "gzip"
+            headers["Vary"] = "Accept-Encoding"
+        return Response(stream_with_context(body), mimetype=mimetype, headers=headers)
+
+
+def read_bulk_rows():
+    """Return the raw bulk rows from a JSON array body or a CSV upload."""
+    upload = request.files.get("file")
+    if upload is not None or request.mimetype == "text/csv":
+        raw = upload.read() if upload is not None else request.get_data()
+        reader = csv.DictReader(io.StringIO(raw.decode("utf-8-sig")))
+        return [csv_row_to_item(row) for row in reader]
+
+    rows = request.get_json(silent=True)
+    if not isinstance(rows, list):
+        abort(400, message="Expected a JSON array of expenses or a CSV file.")
+    return rows
+
+
+def csv_row_to_item(row):
+    # Empty cells are treated as missing; tag columns are ";"-separated.
+    item = {
+        key.strip(): value.strip()
+        for key, value in row.items()
+        if key and isinstance(value, str) and value.strip()
+    }
+    for key in ("tag_names", "tag_ids"):
+        if key in item:
+            item[key] = [value.strip() for value in item[key].split(";") if value.strip()]
+    return item
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@blp.route("/expense/bulk")
+class ExpenseBulk(MethodView):
+    @jwt_required(fresh=True)
+    @blp.response(201, ExpenseBulkResultSchema)
+    def post(self):
+        rows = read_bulk_rows()
+        try:
+            items = ExpenseBulkItemSchema(many=True).load(rows)
+            errors = {}
+        except ValidationError as err:
+            errors = err.messages
+            items = err.valid_data
+        valid = [(index, item) for index, item in enumerate(items) if index not in errors]
+
+        # Resolve every referenced category and tag with one query per table.
+        category_names = {item["category_name"] for _, item in valid if "category_name" in item}
+        category_ids = {item["category_id"] for _, item in valid if "category_id" in item}
+        user_id = current_user_id()
+        categories = []
+        if category_names or category_ids:
+            categories = (
+                db.session.query(CategoryModel.id, CategoryModel.name)
+                .filter(
+                    CategoryModel.user_id == user_id,
+                    or_(CategoryModel.name.in_(category_names), CategoryModel.id.in_(category_ids)),
+                )
+                .all()
+            )
+        category_by_name = {name: category_id for category_id, name in categories}
+        known_category_ids = {category_id for category_id, _ in categories}
+
+        tag_names = {name for _, item in valid for name in item.get("tag_names", ())}
+        tag_ids = {tag_id for _, item in valid for tag_id in item.get("tag_ids", ())}
+        tags = []
+        if tag_names or tag_ids:
+            tags = (
+                db.session.query(TagModel.id, TagModel.name, TagModel.category_id)
+                .filter(TagModel.user_id == user_id, or_(TagModel.name.in_(tag_names), TagModel.id.in_(tag_ids)))
+                .all()
+            )
+        tag_by_name = {(category_id, name): tag_id for tag_id, name, category_id in tags}
+        tag_categories = {tag_id: category_id for tag_id, _, category_id in tags}
+
+        created_at = datetime.utcnow()
+        records = []
+        record_tags = []
+        for index, item in valid:
+            if "category_name" in item:
+                category_id = category_by_name.get(item["category_name"])
+            else:
+                category_id = item["category_id"]
+            if category_id not in known_category_ids:
+                errors[index] = {"category_id": ["Category not found."]}
+                continue
+
+            row_tags = []
+            for name in item.get("tag_names", ()):
+                if (category_id, name) not in tag_by_name:
+                    errors[index] = {"tag_names": ["Tag {!r} not found in category.".format(name)]}
+                    break
+                row_tags.append(tag_by_name[(category_id, name)])
+            for tag_id in item.get("tag_ids", ()):
+                if tag_id not in tag_categories:
+                    errors[index] = {"tag_ids": ["Tag {} not found.".format(tag_id)]}
+                    break
+                if tag_categories[tag_id] != category_id:
+                    errors[index] = {"tag_ids": ["Tag {} doesn't belong to the expense's category.".format(tag_id)]}
+                    break
+                row_tags.append(tag_id)
+            if index in errors:
+                continue
+
+            records.append({
+                "user_id": user_id,
+                "name": item["name"],
+                "price": item["price"],
+                "currency": item.get("currency", DEFAULT_CURRENCY),
+                "description": item.get("description"),
+                "category_id": category_id,
+                "created_at": created_at,
+            })
+            record_tags.append(list(dict.fromkeys(row_tags)))
+
+        ids = []
+        try:
+            for chunk in chunked(records, BULK_CHUNK_SIZE):
+                result = db.session.execute(
+                    insert(ExpenseModel).returning(ExpenseModel.id, sort_by_parameter_order=True),
+                    chunk,
+                )
+                ids.extend(result.scalars())
+
+            links = [
+                {"expense_id": expense_id, "tag_id": tag_id}
+                for expense_id, expense_tag_ids in zip(ids, record_tags)
+                for tag_id in expense_tag_ids
+            ]
+            for chunk in chunked(links, BULK_CHUNK_SIZE):
+                db.session.execute(insert(ExpenseTags), chunk)
+
+            # Bulk inserts skip the flush events, so fold them into the summary here.
+            apply_changes(
+                db.session.connection(),
+                [
+                    (1, record["category_id"], created_at, record["price"], record["currency"], expense_tag_ids)
+                    for record, expense_tag_ids in zip(records, record_tags)
+                ],
+            )
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while inserting the expenses.")
+
+        return {"created": len(ids), "ids": ids, "errors": errors}
@@ -0,0 +1,68 @@
+from datetime import datetime
+
+from flask.views import MethodView
+from flask_smorest import abort
+from flask_jwt_extended import jwt_required
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db
+from models import CategoryModel, RecurringExpenseModel, TagModel
+from ownership import current_user_id, get_owned_or_404, owned
+from recurring import first_run
+from schemas import RecurringExpenseSchema
+from instrumentation import Blueprint
+
+
+blp = Blueprint("Recurring", "recurring", description="Recurring expense templates")
+
+
+@blp.route("/recurring")
+class RecurringExpenseList(MethodView):
+    @jwt_required()
+    @blp.response(200, RecurringExpenseSchema(many=True))
+    def get(self):
+        return owned(RecurringExpenseModel).order_by(RecurringExpenseModel.id).all()
+
+    @jwt_required()
+    @blp.arguments(RecurringExpenseSchema)
+    @blp.response(201, RecurringExpenseSchema)
+    def post(self, template_data):
+        """Create a template; the scheduler adds its expenses from starts_at on."""
+        if owned(CategoryModel).filter(CategoryModel.id == template_data["category_id"]).first() is None:
+            abort(400, message="Category not found.")
+        tag_ids = set(template_data.pop("tag_ids"))
+        tags = []
+        if tag_ids:
+            tags = owned(TagModel).filter(
+                TagModel.id.in_(tag_ids), TagModel.category_id == template_data["category_id"]
+            ).all()
+            invalid = tag_ids - {tag.id for tag in tags}
+            if invalid:
+                abort(400, message="Tags {} don't belong to the expense's category.".format(sorted(invalid)))
+
+        template_data.setdefault("starts_at", datetime.utcnow())
+        template = RecurringExpenseModel(user_id=current_user_id(), tags=tags, **template_data)
+        template.next_run_at = first_run(template)
+        try:
+            db.session.add(template)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while creating the recurring expense.")
+        return template
+
+
+@blp.route("/recurring/<int:template_id>")
+class RecurringExpense(MethodView):
+    @jwt_required()
+    @blp.response(200, RecurringExpenseSchema)
+    def get(self, template_id):
+        return get_owned_or_404(RecurringExpenseModel, template_id)
+
+    @jwt_required()
+    def delete(self, template_id):
+        """Stop a template; the expenses it already created stay."""
+        template = get_owned_or_404(RecurringExpenseModel, template_id)
+        db.session.delete(template)
+        db.session.commit()
+        return {"message": "Recurring expense deleted."}
@@ -0,0 +1,120 @@
+from datetime import datetime, time, timedelta
+
+from flask.views import MethodView
+from flask_jwt_extended import jwt_required
+from sqlalchemy import func, select, type_coerce
+
+from db import db
+from models import CategoryModel, ExpenseModel, ExpenseSummaryModel, TagModel
+from models.money import MinorUnits
+from schemas import (
+    StatsQueryArgsSchema,
+    CategoryStatsSchema,
+    TagStatsSchema,
+    StatsSchema,
+    DistributionQueryArgsSchema,
+    DistributionSchema,
+)
+from resources.expense import expense_filters
+from ownership import current_user_id
+from instrumentation import Blueprint
+
+
+blp = Blueprint("Stats", "stats", description="Spending aggregates")
+
+# Summary rows are keyed by category or tag, which belong to one user.
+KEY_MODELS = {"category": CategoryModel, "tag": TagModel}
+
+
+def summary_query(dimension, query_args, columns, default_period="month"):
+    """Aggregate the caller's expense_summary rows; never touches the expense table.
+
+    Rows are also grouped by currency, so amounts in different currencies
+    are never added together.
+    """
+    columns = columns + [ExpenseSummaryModel.currency]
+    keys = KEY_MODELS[dimension]
+    count = func.sum(ExpenseSummaryModel.count)
+    total = func.sum(ExpenseSummaryModel.total)
+    query = db.session.query(
+        *columns,
+        count.label("count"),
+        total.label("total"),
+        func.min(ExpenseSummaryModel.min_price).label("min_price"),
+        func.max(ExpenseSummaryModel.max_price).label("max_price"),
+        # Integer cents divided in SQL; converted back to an amount on the way out.
+        type_coerce(total / count, MinorUnits).label("avg_price"),
+    ).filter(
+        ExpenseSummaryModel.dimension == dimension,
+        ExpenseSummaryModel.period == query_args.get("period", default_period),
+        ExpenseSummaryModel.key_id.in_(select(keys.id).where(keys.user_id == current_user_id())),
+    )
+    if "start" in query_args:
+        query = query.filter(ExpenseSummaryModel.bucket >= query_args["start"])
+    if "end" in query_args:
+        query = query.filter(ExpenseSummaryModel.bucket <= query_args["end"])
+    if "currency" in query_args:
+        query = query.filter(ExpenseSummaryModel.currency == query_args["currency"])
+    return query.group_by(*columns).order_by(*columns)
+
+
+def keyed_summary(dimension, query_args):
+    # Without a period, totals per key are the sum of its month buckets.
+    columns = [ExpenseSummaryModel.key_id]
+    if "period" in query_args:
+        columns.append(ExpenseSummaryModel.bucket)
+    return summary_query(dimension, query_args, columns).all()
+
+
+@blp.route("/stats/category")
+class CategoryStats(MethodView):
+    @jwt_required()
+    @blp.arguments(StatsQueryArgsSchema, location="query")
+    @blp.response(200, CategoryStatsSchema(many=True))
+    def get(self, query_args):
+        return keyed_summary("category", query_args)
+
+
+@blp.route("/stats/tag")
+class TagStats(MethodView):
+    @jwt_required()
+    @blp.arguments(StatsQueryArgsSchema, location="query")
+    @blp.response(200, TagStatsSchema(many=True))
+    def get(self, query_args):
+        return keyed_summary("tag", query_args)
+
+
+@blp.route("/stats/period")
+class PeriodStats(MethodView):
+    @jwt_required()
+    @blp.arguments(StatsQueryArgsSchema, location="query")
+    @blp.response(200, StatsSchema(many=True))
+    def get(self, query_args):
+        # Every expense has exactly one category, so the category rows of a
+        # bucket add up to that bucket's overall totals.
+        return summary_query("category", query_args, [ExpenseSummaryModel.bucket]).all()
+
+
+@blp.route("/stats/distribution")
+class PriceDistribution(MethodView):
+    @jwt_required()
+    @blp.arguments(DistributionQueryArgsSchema, location="query")
+    @blp.response(200, DistributionSchema)
+    def get(self, query_args):
+        """Price percentiles and histogram for the matching expenses.
+
+        Unlike the other /stats endpoints this reads the expense table, since
+        percentiles can't be folded into expense_summary. It covers one
+        currency, USD unless ``currency`` is given.
+        """
+        criteria = expense_filters(query_args)
+        if "start" in query_args:
+            criteria.append(ExpenseModel.created_at >= datetime.combine(query_args["start"], time()))
+        if "end" in query_args:
+            criteria.append(ExpenseModel.created_at < datetime.combine(query_args["end"] + timedelta(days=1), time()))
+        # NumPy is imported on first use rather than at worker startup.
+        from reports import load_prices, price_distribution
+
+        distribution = price_distribution(load_prices(criteria), query_args["bins"])
+        distribution["currency"] = query_args["currency"]
+        return distribution
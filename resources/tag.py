@@ -1,33 +1,50 @@
 from flask.views import MethodView
-from flask_smorest import Blueprint, abort
-from sqlalchemy.exc import SQLAlchemyError
+from flask_smorest import abort
+from flask_jwt_extended import jwt_required
+from sqlalchemy import delete, exists, insert, literal, select
+from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 
 from db import db
-from models import TagModel , CategoryModel ,ExpenseModel
-from schemas import TagSchema ,TagAndExpenseSchema
+from models import TagModel , CategoryModel ,ExpenseModel, ExpenseTags, BudgetModel
+from schemas import TagSchema ,TagAndExpenseSchema, ExpenseSchema, ExpenseTagSetSchema
+from loaders import loader_options
+from ownership import current_user_id, get_owned_or_404, owned
+from cache import RESPONSE_CACHE
+from summaries import apply_changes
+from instrumentation import Blueprint
 
 
 blp = Blueprint("Tag","tag",description="Operation on tag")
 
 @blp.route("/category/<string:category_id>/tag")
 class TagsInCategory(MethodView):
+    @jwt_required()
+    @RESPONSE_CACHE.cached("category", "tag", "expense", "expense_tag")
     @blp.response(200, TagSchema(many=True))
     def get(self, category_id):
-        category = CategoryModel.query.get_or_404(category_id)
+        get_owned_or_404(CategoryModel, category_id)
 
-        return category.tag.all()
+        return (
+            owned(TagModel).options(*loader_options(TagSchema))
+            .filter(TagModel.category_id == category_id)
+            .all()
+        )
 
+    @jwt_required()
     @blp.arguments(TagSchema)
     @blp.response(201, TagSchema)
     def post(self, tag_data, category_id):
-        if TagModel.query.filter(TagModel.category_id == category_id, TagModel.name == tag_data["name"]).first():
+        get_owned_or_404(CategoryModel, category_id)
+        if owned(TagModel).filter(TagModel.category_id == category_id, TagModel.name == tag_data["name"]).first():
             abort(400, message="A tag with that name already exists in that category.")
 
-        tag = TagModel(**tag_data, category_id=category_id)
+        tag = TagModel(**tag_data, category_id=category_id, user_id=current_user_id())
 
         try:
             db.session.add(tag)
             db.session.commit()
+        except IntegrityError:
+            abort(400, message="A tag with that name already exists in that category.")
         except SQLAlchemyError as e:
             abort(
                 500,
@@ -38,11 +55,14 @@ class TagsInCategory(MethodView):
 
 @blp.route("/expense/<string:expense_id>/tag/<string:tag_id>")
 class LinkTagsToExpense(MethodView):
+    @jwt_required()
     @blp.response(201, TagSchema)
     def post(self, expense_id, tag_id):
-        expense = ExpenseModel.query.get_or_404(expense_id)
-        tag = TagModel.query.get_or_404(tag_id)
+        expense = get_owned_or_404(ExpenseModel, expense_id)
+        tag = get_owned_or_404(TagModel, tag_id)
 
+        if tag in expense.tag:
+            return tag
         expense.tag.append(tag)
 
         try:
@@ -54,10 +74,11 @@ class LinkTagsToExpense(MethodView):
         return tag
     
 
+    @jwt_required()
     @blp.response(200, TagAndExpenseSchema)
     def delete(self, expense_id, tag_id):
-        expense = ExpenseModel.query.get_or_404(expense_id)
-        tag = TagModel.query.get_or_404(tag_id)
+        expense = get_owned_or_404(ExpenseModel, expense_id)
+        tag = get_owned_or_404(TagModel, tag_id)
 
         expense.tag.remove(tag)
 
@@ -69,11 +90,74 @@ class LinkTagsToExpense(MethodView):
 
         return {"message": "Expense removed from tag", "expense": expense, "tag": tag}
 
+@blp.route("/expense/<string:expense_id>/tags")
+class ExpenseTagSet(MethodView):
+    @jwt_required()
+    @blp.arguments(ExpenseTagSetSchema)
+    @blp.response(200, ExpenseSchema)
+    def put(self, tag_data, expense_id):
+        """Replace the expense's tags with ``tag_ids``.
+
+        The difference is applied in SQL with one DELETE and one INSERT, so
+        the number of statements doesn't grow with the number of tags.
+        """
+        expense = db.session.execute(
+            select(
+                ExpenseModel.id, ExpenseModel.category_id, ExpenseModel.created_at, ExpenseModel.price,
+                ExpenseModel.currency,
+            )
+            .where(ExpenseModel.id == expense_id, ExpenseModel.user_id == current_user_id())
+        ).first()
+        if expense is None:
+            abort(404, message="Expense not found.")
+
+        tag_ids = set(tag_data["tag_ids"])
+        if tag_ids:
+            valid = set(db.session.scalars(
+                select(TagModel.id).where(TagModel.id.in_(tag_ids), TagModel.category_id == expense.category_id)
+            ))
+            if valid != tag_ids:
+                abort(
+                    400,
+                    message="Tags {} don't belong to the expense's category.".format(sorted(tag_ids - valid)),
+                )
+
+        try:
+            removed = db.session.scalars(
+                delete(ExpenseTags)
+                .where(ExpenseTags.expense_id == expense.id, ExpenseTags.tag_id.not_in(tag_ids))
+                .returning(ExpenseTags.tag_id)
+            ).all()
+            added = []
+            if tag_ids:
+                already_linked = exists().where(ExpenseTags.expense_id == expense.id, ExpenseTags.tag_id == TagModel.id)
+                added = db.session.scalars(
+                    insert(ExpenseTags)
+                    .from_select(
+                        ["expense_id", "tag_id"],
+                        select(literal(expense.id), TagModel.id).where(TagModel.id.in_(tag_ids), ~already_linked),
+                    )
+                    .returning(ExpenseTags.tag_id)
+                ).all()
+            # Bulk statements skip the flush hook that maintains expense_summary.
+            apply_changes(db.session.connection(), [
+                (1, None, expense.created_at, expense.price, expense.currency, added),
+                (-1, None, expense.created_at, expense.price, expense.currency, removed),
+            ])
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            abort(500, message="An error occurred while updating the tags.")
+
+        return owned(ExpenseModel).options(*loader_options(ExpenseSchema)).filter(ExpenseModel.id == expense.id).one()
+
 @blp.route("/tag/<string:tag_id>")
 class Tag(MethodView):
+    @jwt_required()
+    @RESPONSE_CACHE.cached("category", "tag", "expense", "expense_tag")
     @blp.response(200, TagSchema)
     def get(self, tag_id):
-        tag = TagModel.query.get_or_404(tag_id)
+        tag = get_owned_or_404(TagModel, tag_id)
         return tag
 
     @blp.response(
@@ -86,10 +170,12 @@ class Tag(MethodView):
         400,
         description="Returned if the tag is assigned to one or more expense. In this case, the tag is not deleted.",
     )
+    @jwt_required()
     def delete(self, tag_id):
-        tag = TagModel.query.get_or_404(tag_id)
+        tag = get_owned_or_404(TagModel, tag_id)
 
         if not tag.expense:
+            db.session.execute(delete(BudgetModel).where(BudgetModel.dimension == "tag", BudgetModel.key_id == tag.id))
             db.session.delete(tag)
             db.session.commit()
             return {"message": "Tag deleted."}
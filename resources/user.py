@@ -1,6 +1,6 @@
+from flask import request
 from flask.views import MethodView
-from flask_smorest import Blueprint, abort
-from passlib.hash import pbkdf2_sha256
+from flask_smorest import abort
 from flask_jwt_extended import (
     create_access_token,
     create_refresh_token,
@@ -12,6 +12,11 @@ from db import db
 from models import UserModel
 from schemas import UserSchema
 from blocklist import BLOCKLIST
+from deletes import delete_user_data
+from ownership import require_self_or_admin
+from shards import SHARDS
+from passwords import PASSWORDS, LOGIN_THROTTLE, PoolBusy
+from instrumentation import Blueprint
 
 
 blp = Blueprint("User", "user", description="Operations on user")
@@ -20,12 +25,19 @@ blp = Blueprint("User", "user", description="Operations on user")
 class UserRegister(MethodView):
     @blp.arguments(UserSchema)
     def post(self, user_data):
+        if not LOGIN_THROTTLE.allow_register(request.remote_addr):
+            abort(429, message="Too many attempts. Try again later.")
         if UserModel.query.filter(UserModel.username == user_data["username"]).first():
             abort(409, message="A user with that username already exists.")
 
+        try:
+            password = PASSWORDS.hash(user_data["password"])
+        except PoolBusy:
+            abort(503, message="The server is busy. Try again shortly.")
+
         user = UserModel(
             username=user_data["username"],
-            password=pbkdf2_sha256.hash(user_data["password"]),
+            password=password,
         )
         db.session.add(user)
         db.session.commit()
@@ -36,15 +48,32 @@ class UserRegister(MethodView):
 class UserLogin(MethodView):
     @blp.arguments(UserSchema)
     def post(self, user_data):
+        if not LOGIN_THROTTLE.allow(user_data["username"], request.remote_addr):
+            abort(429, message="Too many login attempts. Try again later.")
+
         user = UserModel.query.filter(
             UserModel.username == user_data["username"]
         ).first()
 
-        if user and pbkdf2_sha256.verify(user_data["password"], user.password):
+        try:
+            verified = user is not None and PASSWORDS.verify(user_data["password"], user.password)
+        except PoolBusy:
+            abort(503, message="The server is busy. Try again shortly.")
+
+        if verified:
+            # Upgrade hashes made with a different cost; if the pool is busy
+            # it will be retried on a later login.
+            if PASSWORDS.needs_update(user.password):
+                try:
+                    user.password = PASSWORDS.hash(user_data["password"])
+                    db.session.commit()
+                except PoolBusy:
+                    pass
             access_token = create_access_token(identity=str(user.id), fresh=True)
             refresh_token = create_refresh_token(identity=str(user.id))
             return {"access_token": access_token, "refresh_token":refresh_token},200
 
+        LOGIN_THROTTLE.record_failure(user_data["username"], request.remote_addr)
         abort(401, message="Invalid credentials.")
 
 
@@ -52,21 +81,28 @@ class UserLogin(MethodView):
 class UserLogout(MethodView):
     @jwt_required()
     def post(self):
-        jti = get_jwt()["jti"]
-        BLOCKLIST.add(jti)
+        jwt = get_jwt()
+        BLOCKLIST.add(jwt["jti"], jwt["exp"])
         return {"message": "Successfully logged out"}, 200
 
 @blp.route("/user/<int:user_id>")
 class User(MethodView):
     
 
+    @jwt_required()
     @blp.response(200, UserSchema)
     def get(self, user_id):
+        require_self_or_admin(user_id)
         user = UserModel.query.get_or_404(user_id)
         return user
 
+    @jwt_required()
     def delete(self, user_id):
+        require_self_or_admin(user_id)
         user = UserModel.query.get_or_404(user_id)
+        # An admin may be deleting someone else, whose data is in another shard.
+        with SHARDS.pinned(db.session, SHARDS.key_for(user_id)):
+            delete_user_data(db.session, user_id)
         db.session.delete(user)
         db.session.commit()
         return {"message": "User deleted."}, 200
@@ -78,7 +114,7 @@ class TokenRefresh(MethodView):
         current_user = get_jwt_identity()
         new_token = create_access_token(identity=current_user, fresh=False)
 
-        jti = get_jwt()["jti"]
-        BLOCKLIST.add(jti)
+        jwt = get_jwt()
+        BLOCKLIST.add(jwt["jti"], jwt["exp"])
         return {"access_token": new_token}
      
\ No newline at end of file
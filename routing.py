@@ -0,0 +1,38 @@
+"""
+routing.py
+
+The session class behind ``db.session``. Each statement goes to the user's
+shard when sharding is configured (see shards.py), otherwise to a read replica
+when the request allows it (see replicas.py), otherwise to the primary.
+"""
+from flask_sqlalchemy.session import Session
+from sqlalchemy import inspect
+from sqlalchemy.sql.util import find_tables
+
+from replicas import PRIMARY_TABLES, REPLICAS
+from shards import SHARDS
+
+
+def statement_tables(mapper, clause):
+    """Names of the tables a statement reads or writes; empty when unknown."""
+    if mapper is not None:
+        return {inspect(mapper).local_table.name}
+    if clause is not None:
+        return {
+            table.name
+            for table in find_tables(clause, include_aliases=True, include_crud=True)
+            if hasattr(table, "name")
+        }
+    return set()
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and (SHARDS.keys or REPLICAS.keys):
+            tables = statement_tables(mapper, clause)
+            key = SHARDS.bind_key(self, tables)
+            if key is None and not self._flushing and self._is_clean() and not tables & set(PRIMARY_TABLES):
+                key = REPLICAS.bind_key(self)
+            if key is not None:
+                return self._db.engines[key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
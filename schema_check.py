@@ -0,0 +1,65 @@
+"""
+schema_check.py
+
+Startup check that the live database has every index and unique constraint
+the models declare. A missing one usually means "flask db upgrade" was not
+run, and it shows up as full table scans rather than as an error, so it is
+logged loudly instead.
+"""
+from sqlalchemy import inspect
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import db
+
+
+def declared_indexes(table):
+    expected = set()
+    for index in table.indexes:
+        expected.add((tuple(column.name for column in index.columns), bool(index.unique)))
+    for constraint in table.constraints:
+        if isinstance(constraint, db.UniqueConstraint):
+            expected.add((tuple(column.name for column in constraint.columns), True))
+    return expected
+
+
+def live_indexes(inspector, table_name):
+    live = set()
+    for index in inspector.get_indexes(table_name):
+        live.add((tuple(index["column_names"]), bool(index["unique"])))
+    for constraint in inspector.get_unique_constraints(table_name):
+        live.add((tuple(constraint["column_names"]), True))
+    return live
+
+
+def missing_indexes(engine):
+    """Return ``(table, columns, unique)`` for every declared index the database lacks."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    missing = []
+    for table in db.metadata.sorted_tables:
+        # Tables that don't exist yet are the migrations' problem, not ours.
+        if table.name not in existing_tables:
+            continue
+        live = live_indexes(inspector, table.name)
+        for columns, unique in declared_indexes(table):
+            # A unique index also satisfies a plain one on the same columns.
+            if (columns, True) in live or (columns, unique) in live:
+                continue
+            missing.append((table.name, columns, unique))
+    return missing
+
+
+def warn_missing_indexes(app):
+    with app.app_context():
+        try:
+            missing = missing_indexes(db.engine)
+        except SQLAlchemyError as e:
+            app.logger.warning("Skipping index check, database not reachable: %s", e)
+            return
+    for table, columns, unique in missing:
+        app.logger.warning(
+            "Missing %s on %s(%s); run 'flask db upgrade'.",
+            "unique index" if unique else "index",
+            table,
+            ", ".join(columns),
+        )
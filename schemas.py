@@ -1,10 +1,37 @@
-from marshmallow import Schema, fields
+from datetime import timezone
+from decimal import InvalidOperation
+
+from marshmallow import Schema, fields, validate, validates_schema, ValidationError
+
+from models.money import CENT, DEFAULT_CURRENCY, MAX_AMOUNT
+
+
+class Money(fields.Decimal):
+    """A decimal amount with at most two places, emitted as a JSON number."""
+
+    def _deserialize(self, value, attr, data, **kwargs):
+        amount = super()._deserialize(value, attr, data, **kwargs)
+        if abs(amount) >= MAX_AMOUNT:
+            raise ValidationError("Amounts must be between -{0:,} and {0:,}.".format(int(MAX_AMOUNT)))
+        try:
+            cents = amount.quantize(CENT)
+        except InvalidOperation:
+            raise ValidationError("Not a valid amount.")
+        if amount != cents:
+            raise ValidationError("Amounts can have at most two decimal places.")
+        return cents
+
+    def _serialize(self, value, attr, obj, **kwargs):
+        amount = super()._serialize(value, attr, obj, **kwargs)
+        return None if amount is None else float(amount)
 
 
 class PlainExpenseSchema(Schema):
     id = fields.Str(dump_only=True)
     name = fields.Str(required=True)
-    price = fields.Float(required=True)
+    price = Money(required=True)
+    currency = fields.Str(validate=validate.Regexp(r"^[A-Z]{3}$"))
+    description = fields.Str(load_only=True, allow_none=True)
 
 class PlainCategorySchema(Schema):
     id = fields.Str(dump_only=True)
@@ -19,11 +46,53 @@ class ExpenseSchema(PlainExpenseSchema):
     category = fields.Nested(PlainCategorySchema(), dump_only=True)
     tag=fields.List(fields.Nested(PlainTagSchema()),dump_only=True)
 
+class ExpenseBulkItemSchema(ExpenseSchema):
+    category_id = fields.Int(load_only=True)
+    category_name = fields.Str(load_only=True)
+    tag_names = fields.List(fields.Str(), load_only=True)
+    tag_ids = fields.List(fields.Int(), load_only=True)
+
+    @validates_schema(skip_on_field_errors=False)
+    def validate_category(self, data, **kwargs):
+        if "category_id" not in data and "category_name" not in data:
+            raise ValidationError("Either category_id or category_name is required.", "category_id")
+
+class ExpenseBulkResultSchema(Schema):
+    created = fields.Int()
+    ids = fields.List(fields.Int())
+    errors = fields.Dict(keys=fields.Str(), values=fields.Raw())
+
+class ExpenseFilterSchema(Schema):
+    cursor = fields.Int(validate=validate.Range(min=0))
+    category_id = fields.Int()
+    tag_id = fields.Int()
+    min_price = Money()
+    max_price = Money()
+    currency = fields.Str(validate=validate.Regexp(r"^[A-Z]{3}$"))
+    name = fields.Str()
+
+class ExpenseQueryArgsSchema(ExpenseFilterSchema):
+    limit = fields.Int(load_default=100, validate=validate.Range(min=1, max=1000))
+    stream = fields.Bool(load_default=False)
+
+class ExpenseSearchArgsSchema(ExpenseFilterSchema):
+    q = fields.Str(required=True, validate=validate.Length(min=1, max=200))
+    limit = fields.Int(load_default=20, validate=validate.Range(min=1, max=100))
+    offset = fields.Int(load_default=0, validate=validate.Range(min=0, max=10000))
+
+class ExpenseExportArgsSchema(ExpenseFilterSchema):
+    format = fields.Str(load_default="csv", validate=validate.OneOf(["csv", "columnar"]))
+
 class ExpenseUpdateSchema(Schema):
     name = fields.Str()
-    price = fields.Float()
+    price = Money()
+    currency = fields.Str(validate=validate.Regexp(r"^[A-Z]{3}$"))
+    description = fields.Str(allow_none=True)
     category_id = fields.Int()
 
+class CategoryDeleteArgsSchema(Schema):
+    chunked = fields.Bool(load_default=False)
+
 class CategorySchema(PlainCategorySchema):
     expense = fields.List(fields.Nested(PlainExpenseSchema()), dump_only=True)
     tag = fields.List(fields.Nested(PlainTagSchema()), dump_only=True)
@@ -33,11 +102,109 @@ class TagSchema(PlainTagSchema):
     category = fields.Nested(PlainCategorySchema(), dump_only=True)
     expense=fields.List(fields.Nested(PlainExpenseSchema()),dump_only=True)
     
+class ExpenseTagSetSchema(Schema):
+    tag_ids = fields.List(fields.Int(), required=True)
+
 class TagAndExpenseSchema(Schema):
     message=fields.Str()
     expense=fields.Nested(ExpenseSchema)
     tag=fields.Nested(TagSchema)
 
+class StatsQueryArgsSchema(Schema):
+    period = fields.Str(validate=validate.OneOf(["day", "week", "month"]))
+    start = fields.Date()
+    end = fields.Date()
+    currency = fields.Str(validate=validate.Regexp(r"^[A-Z]{3}$"))
+
+class StatsSchema(Schema):
+    bucket = fields.Date()
+    # One row per currency; amounts in different currencies are never added.
+    currency = fields.Str()
+    count = fields.Int()
+    total = fields.Float()
+    min_price = fields.Float()
+    max_price = fields.Float()
+    avg_price = fields.Float()
+
+class CategoryStatsSchema(StatsSchema):
+    category_id = fields.Int(attribute="key_id")
+
+class TagStatsSchema(StatsSchema):
+    tag_id = fields.Int(attribute="key_id")
+
+class BatchRequestSchema(Schema):
+    method = fields.Str(load_default="GET", validate=validate.OneOf(["GET", "POST", "PUT", "DELETE"]))
+    path = fields.Str(required=True, validate=validate.Regexp(r"^/"))
+    body = fields.Raw(allow_none=True)
+
+class BatchSchema(Schema):
+    requests = fields.List(fields.Nested(BatchRequestSchema), required=True, validate=validate.Length(min=1))
+
+class BatchResponseSchema(Schema):
+    status = fields.Int()
+    headers = fields.Dict(keys=fields.Str(), values=fields.Str())
+    body = fields.Raw(allow_none=True)
+
+class BatchResultSchema(Schema):
+    responses = fields.List(fields.Nested(BatchResponseSchema))
+
+class DistributionQueryArgsSchema(ExpenseFilterSchema):
+    start = fields.Date()
+    end = fields.Date()
+    bins = fields.Int(load_default=10, validate=validate.Range(min=1, max=100))
+    # Prices in different currencies can't share percentiles, so one at a time.
+    currency = fields.Str(load_default=DEFAULT_CURRENCY, validate=validate.Regexp(r"^[A-Z]{3}$"))
+
+class HistogramBinSchema(Schema):
+    lower = fields.Float()
+    upper = fields.Float()
+    count = fields.Int()
+
+class DistributionSchema(Schema):
+    currency = fields.Str()
+    count = fields.Int()
+    total = Money()
+    mean = fields.Float()
+    min_price = Money()
+    max_price = Money()
+    percentiles = fields.Dict(keys=fields.Str(), values=fields.Float())
+    histogram = fields.List(fields.Nested(HistogramBinSchema))
+
+class BudgetSchema(Schema):
+    id = fields.Int(dump_only=True)
+    dimension = fields.Str(required=True, validate=validate.OneOf(["category", "tag"]))
+    key_id = fields.Int(required=True)
+    period = fields.Str(load_default="month", validate=validate.OneOf(["day", "week", "month"]))
+    limit = Money(required=True, validate=validate.Range(min=0, min_inclusive=False))
+    # Only expenses in this currency count toward the limit.
+    currency = fields.Str(load_default=DEFAULT_CURRENCY, validate=validate.Regexp(r"^[A-Z]{3}$"))
+    alert_at = fields.Int(load_default=100, validate=validate.Range(min=1, max=1000))
+    # Spending in the current period, from expense_summary.
+    bucket = fields.Date(dump_only=True)
+    spent = Money(dump_only=True)
+
+class BudgetAlertSchema(Schema):
+    id = fields.Int(dump_only=True)
+    budget_id = fields.Int()
+    bucket = fields.Date()
+    total = Money()
+    created_at = fields.DateTime()
+
+class BudgetAlertQueryArgsSchema(Schema):
+    budget_id = fields.Int()
+    limit = fields.Int(load_default=100, validate=validate.Range(min=1, max=1000))
+
+class RecurringExpenseSchema(PlainExpenseSchema):
+    category_id = fields.Int(required=True)
+    tag_ids = fields.List(fields.Int(), load_default=list)
+    # Every ``every`` days, weeks, months or years from starts_at (default now).
+    interval = fields.Str(required=True, validate=validate.OneOf(["day", "week", "month", "year"]))
+    every = fields.Int(load_default=1, validate=validate.Range(min=1, max=1000))
+    # Stored as naive UTC, like created_at.
+    starts_at = fields.NaiveDateTime(timezone=timezone.utc)
+    ends_at = fields.NaiveDateTime(timezone=timezone.utc, allow_none=True)
+    next_run_at = fields.DateTime(dump_only=True)
+
 class UserSchema(Schema):
     id = fields.Int(dump_only=True)
     username=fields.Str(required=True)
@@ -0,0 +1,114 @@
+"""
+search.py
+
+Full-text search over expense names and descriptions.
+
+On SQLite the text is indexed by an external-content FTS5 table, and on
+PostgreSQL by a tsvector column with a GIN index. Triggers keep both in sync
+with the expense table, so rows written by bulk statements are indexed too.
+The migrations create them for existing databases, and the DDL below does
+the same for ``db.create_all()``. Other backends fall back to a LIKE scan.
+"""
+import re
+
+from sqlalchemy import DDL, event, func, literal_column, or_, table, column
+
+from models import ExpenseModel
+
+# Words of letters and digits; everything else, including FTS operators and
+# quotes, is a separator.
+TERM = re.compile(r"[^\W_]+")
+# Name matches count for more than description matches.
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+expense_fts = table("expense_fts", column("rowid"))
+search_vector = literal_column("expense.search_vector")
+
+SQLITE_TABLE = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS expense_fts USING fts5("
+    "name, description, content='expense', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+)
+# Shared with the migrations, which re-create them whenever SQLite recreates
+# the expense table. Changing them needs a migration of its own.
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS expense_fts_insert AFTER INSERT ON expense BEGIN "
+    "INSERT INTO expense_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS expense_fts_delete AFTER DELETE ON expense BEGIN "
+    "INSERT INTO expense_fts(expense_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS expense_fts_update AFTER UPDATE OF name, description ON expense BEGIN "
+    "INSERT INTO expense_fts(expense_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO expense_fts(rowid, name, description) VALUES (new.id, new.name, new.description); "
+    "END",
+]
+SQLITE_DDL = [SQLITE_TABLE] + SQLITE_TRIGGERS
+
+POSTGRESQL_DDL = [
+    "ALTER TABLE expense ADD COLUMN search_vector tsvector",
+    "CREATE OR REPLACE FUNCTION expense_search_vector_update() RETURNS trigger AS $$ "
+    "BEGIN "
+    "NEW.search_vector := setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') "
+    "|| setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B'); "
+    "RETURN NEW; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE TRIGGER expense_search_vector_trigger BEFORE INSERT OR UPDATE OF name, description "
+    "ON expense FOR EACH ROW EXECUTE FUNCTION expense_search_vector_update()",
+    "CREATE INDEX ix_expense_search_vector ON expense USING gin (search_vector)",
+]
+
+for statement in SQLITE_DDL:
+    event.listen(ExpenseModel.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+for statement in POSTGRESQL_DDL:
+    event.listen(ExpenseModel.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+# The FTS table isn't in the metadata, so drop_all wouldn't remove it.
+event.listen(
+    ExpenseModel.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS expense_fts").execute_if(dialect="sqlite"),
+)
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Keep autogenerate from dropping the search index, which the models don't declare."""
+    if type_ == "table" and name.startswith("expense_fts"):
+        return False
+    if name in ("search_vector", "ix_expense_search_vector"):
+        return False
+    return True
+
+
+def search_terms(q):
+    return TERM.findall(q.lower())
+
+
+def search(statement, terms, dialect):
+    """Restrict ``statement`` to expenses matching every term and order it by rank.
+
+    Each term also matches words it is a prefix of, so "gro" finds "groceries".
+    ``statement`` selects from the expense table and has no ORDER BY.
+    """
+    if dialect == "sqlite":
+        match = " ".join('"{}"*'.format(term) for term in terms)
+        rank = func.bm25(literal_column("expense_fts"), NAME_WEIGHT, DESCRIPTION_WEIGHT)
+        return (
+            statement.join(expense_fts, expense_fts.c.rowid == ExpenseModel.id)
+            .where(literal_column("expense_fts").op("MATCH")(match))
+            .order_by(rank, ExpenseModel.id)
+        )
+
+    if dialect == "postgresql":
+        query = func.to_tsquery("simple", " & ".join("{}:*".format(term) for term in terms))
+        return (
+            statement.where(search_vector.op("@@")(query))
+            .order_by(func.ts_rank(search_vector, query).desc(), ExpenseModel.id)
+        )
+
+    for term in terms:
+        pattern = "%{}%".format(term)
+        statement = statement.where(or_(ExpenseModel.name.ilike(pattern), ExpenseModel.description.ilike(pattern)))
+    return statement.order_by(ExpenseModel.id)
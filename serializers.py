@@ -0,0 +1,106 @@
+"""
+serializers.py
+
+Fast path for the expense list responses. Instead of loading ExpenseModel
+entities and dumping them field by field through ExpenseSchema, the list
+endpoints select plain column tuples, build the same documents here and
+encode them with orjson when it is installed.
+
+The output is byte-identical to what ``@blp.response(200, ExpenseSchema(many=True))``
+produces through Flask's JSON provider: ids of PlainExpenseSchema and
+PlainCategorySchema are strings, prices are numbers, tags are ordered by id
+(like ExpenseModel.tag) and keys are sorted. Where orjson would encode a
+document differently from the json module (non-ASCII text, DEL, floats that
+Python writes in exponent notation) or the app is not using the default
+compact provider, the document is handed to ``current_app.json`` instead.
+Run ``python -m benchmarks.serialization`` to compare both paths.
+"""
+import re
+import time
+
+from flask import current_app, g
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import select
+
+from db import db
+from models import ExpenseTags, TagModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Bytes json.dumps(ensure_ascii=True) would have written as a \u escape.
+NOT_PRINTABLE_ASCII = re.compile(rb"[^\x20-\x7e]")
+
+
+def plain_float(value):
+    """Whether json.dumps and orjson write ``value`` the same way."""
+    return value == 0 or 1e-4 <= abs(value) < 1e16
+
+
+def tags_by_expense(session, expense_ids):
+    tags = {expense_id: [] for expense_id in expense_ids}
+    if not expense_ids:
+        return tags
+    rows = session.execute(
+        select(ExpenseTags.expense_id, TagModel.id, TagModel.name)
+        .join(TagModel, TagModel.id == ExpenseTags.tag_id)
+        .where(ExpenseTags.expense_id.in_(expense_ids))
+        .order_by(ExpenseTags.expense_id, TagModel.id)
+    )
+    for expense_id, tag_id, tag_name in rows:
+        tags[expense_id].append({"id": tag_id, "name": tag_name})
+    return tags
+
+
+def expense_documents(rows, session=None):
+    """Build ExpenseSchema documents from (id, name, price, currency, category_id, category_name) rows.
+
+    Returns the documents and whether all prices can go through orjson.
+    """
+    session = session or db.session
+    tags = tags_by_expense(session, [row[0] for row in rows])
+    documents = []
+    plain = True
+    for expense_id, name, price, currency, category_id, category_name in rows:
+        price = float(price)
+        plain = plain and plain_float(price)
+        documents.append({
+            "id": str(expense_id),
+            "name": name,
+            "price": price,
+            "currency": currency,
+            "category": {"id": str(category_id), "name": category_name},
+            "tag": tags[expense_id],
+        })
+    return documents, plain
+
+
+def uses_default_encoding(provider):
+    return (
+        isinstance(provider, DefaultJSONProvider)
+        and provider.sort_keys
+        and provider.ensure_ascii
+        and provider.compact is not False
+        and not (provider.compact is None and current_app.debug)
+    )
+
+
+def json_response(documents, orjson_safe=True):
+    """Return the response ``current_app.json.response(documents)`` would, preferably via orjson."""
+    start = time.perf_counter()
+    provider = current_app.json
+    response = None
+    if orjson is not None and orjson_safe and uses_default_encoding(provider):
+        body = orjson.dumps(documents, option=orjson.OPT_SORT_KEYS)
+        if not NOT_PRINTABLE_ASCII.search(body):
+            response = current_app.response_class(body + b"\n", mimetype=provider.mimetype)
+    if response is None:
+        response = provider.response(documents)
+
+    stats = g.get("instrumentation")
+    if stats is not None:
+        stats["serialize_time"] += time.perf_counter() - start
+        stats["rows"] = len(documents)
+    return response
@@ -0,0 +1,57 @@
+"""
+serving.py
+
+How the app is served, read from WEB_* environment variables so that
+gunicorn.conf.py and the database pool sizing in db.py agree.
+
+    WEB_WORKER_CLASS   "sync" (default) or "gthread"
+    WEB_WORKERS        worker processes (default 2 x CPUs + 1 for sync, CPUs for gthread)
+    WEB_THREADS        threads per gthread worker (default 8; always 1 for sync)
+
+A sync worker handles one request at a time, so a request waiting on the
+database idles a whole process. A gthread worker runs WEB_THREADS requests
+concurrently in one process and shares its memory between them.
+
+Async workers (gevent, eventlet) aren't supported: psycopg2 blocks their
+event loop unless it is patched, and the password hashing pool relies on
+real threads and processes.
+
+Besides its request threads, every worker may run background threads that
+use the database: one for chunked category deletes (deletes.py) and, with
+RECURRING_SCHEDULER set, the recurring expense scheduler (recurring.py).
+They get connections of their own in the pool.
+
+Everything request-scoped is safe under gthread: Flask-SQLAlchemy gives each
+app context (and so each request thread) its own db.session, and the
+process-wide caches, throttles and metrics guard their state with locks.
+"""
+import os
+
+WORKER_CLASSES = ("sync", "gthread")
+
+
+def serving_settings():
+    worker_class = os.getenv("WEB_WORKER_CLASS", "sync")
+    if worker_class not in WORKER_CLASSES:
+        raise ValueError("WEB_WORKER_CLASS must be one of {}, not {!r}.".format(", ".join(WORKER_CLASSES), worker_class))
+
+    cpus = os.cpu_count() or 1
+    if worker_class == "sync":
+        workers, threads = 2 * cpus + 1, 1
+    else:
+        workers, threads = cpus, int(os.getenv("WEB_THREADS", 8))
+    workers = int(os.getenv("WEB_WORKERS", workers))
+    background_threads = 1 + (os.getenv("RECURRING_SCHEDULER", "false").lower() == "true")
+    return {"worker_class": worker_class, "workers": workers, "threads": threads, "background_threads": background_threads}
+
+
+def pool_size(settings, max_connections):
+    """Connections each worker's pool should hold.
+
+    A worker never runs more requests at once than it has threads, and its
+    background threads hold at most one connection each, so that many
+    connections avoid waiting on the pool. All workers together stay within
+    ``max_connections``, the database's connection budget.
+    """
+    wanted = settings["threads"] + settings["background_threads"]
+    return max(1, min(wanted, max_connections // settings["workers"]))
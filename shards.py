@@ -0,0 +1,112 @@
+"""
+shards.py
+
+Optional sharded storage. SHARD_URLS lists N databases, comma-separated, and
+each becomes a Flask-SQLAlchemy bind named shard_0, shard_1, ... A user's
+categories, tags and expenses, with their expense_summary and cache_version
+rows, live in the shard picked by a hash of the user id. A request only
+touches its caller's shard, so its cost depends on that shard's data and
+the load spreads across them. user, revoked_token and lease stay in the
+primary database (DATABASE_URL).
+
+A shard can be a SQLite file or a PostgreSQL schema, chosen with the
+connection's search_path:
+
+    postgresql://host/finance?options=-csearch_path%3Dshard_0
+
+Ids are only unique within a shard; every lookup is scoped to its owner
+anyway (see ownership.py).
+
+RoutingSession (see routing.py) picks the shard from the request's token.
+Code running outside a request pins one with ``SHARDS.pinned``. Migrations
+only run on the primary. "flask create-shards" creates the tables in every
+shard from the models.
+"""
+import hashlib
+from contextlib import contextmanager
+
+import click
+from flask import has_request_context
+from flask.cli import with_appcontext
+from flask_jwt_extended import get_jwt_identity
+
+# Shared by every user, so kept in the primary database.
+DIRECTORY_TABLES = ("user", "revoked_token", "lease")
+
+
+def shard_binds(urls, options):
+    """SQLALCHEMY_BINDS for a comma-separated list of shard URLs.
+
+    ``options(url)`` gives the engine options, as for the primary.
+    """
+    urls = [url.strip() for url in (urls or "").split(",") if url.strip()]
+    return {"shard_{}".format(i): {"url": url, **options(url)} for i, url in enumerate(urls)}
+
+
+def shard_index(user_id, count):
+    # Not hash(), which differs between processes.
+    digest = hashlib.blake2b(str(user_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little") % count
+
+
+class ShardRouter:
+    def __init__(self):
+        self.keys = []
+
+    def init_app(self, app):
+        binds = app.config.get("SQLALCHEMY_BINDS") or {}
+        self.keys = sorted((key for key in binds if key.startswith("shard_")), key=lambda key: int(key[6:]))
+        app.cli.add_command(create_shards_command)
+
+    def key_for(self, user_id):
+        """The bind holding ``user_id``'s rows, or None when not sharded."""
+        if not self.keys:
+            return None
+        return self.keys[shard_index(user_id, len(self.keys))]
+
+    @contextmanager
+    def pinned(self, session, key):
+        """Send ``session``'s queries to shard ``key`` inside the block."""
+        if key is None:
+            yield
+            return
+        previous = session.info.get("shard")
+        session.info["shard"] = key
+        try:
+            yield
+        finally:
+            if previous is None:
+                session.info.pop("shard", None)
+            else:
+                session.info["shard"] = previous
+
+    def bind_key(self, session, tables):
+        """The shard for a statement on ``tables`` (None: unknown), or None for the primary."""
+        if not self.keys or (tables and all(table in DIRECTORY_TABLES for table in tables)):
+            return None
+        if "shard" in session.info:
+            return session.info["shard"]
+        identity = None
+        if has_request_context():
+            try:
+                identity = get_jwt_identity()
+            except RuntimeError:
+                pass
+        if identity is None:
+            raise RuntimeError("Sharded data needs a signed-in user, or a shard pinned with SHARDS.pinned().")
+        return self.key_for(int(identity))
+
+
+SHARDS = ShardRouter()
+
+
+@click.command("create-shards")
+@with_appcontext
+def create_shards_command():
+    """Create the per-user tables that are missing in every shard."""
+    from db import db
+
+    tables = [table for table in db.metadata.sorted_tables if table.name not in DIRECTORY_TABLES]
+    for key in SHARDS.keys:
+        db.metadata.create_all(db.engines[key], tables=tables)
+        click.echo("Created tables in {}.".format(key))
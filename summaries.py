@@ -0,0 +1,324 @@
+"""
+summaries.py
+
+Keeps the expense_summary table in step with the expense table. Every flush
+that inserts, updates or deletes an ExpenseModel (or changes its tags) is
+turned into +/- contributions, which are folded into the per-category and
+per-tag day/week/month buckets inside the same transaction. The /stats
+endpoints then only ever read expense_summary.
+
+Amounts in different currencies are never added together: every bucket is
+per currency, so a category with expenses in USD and EUR has a USD and an
+EUR row for each period. The /stats endpoints report a row per currency, and
+budgets (see budgets.py) only count expenses in their own currency.
+"""
+from datetime import datetime, time, timedelta
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, delete, event, func, insert, literal, select, tuple_, union_all, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+from budgets import evaluate_budgets, record_alerts
+from db import db
+from shards import SHARDS
+from models import ExpenseModel, ExpenseSummaryModel, ExpenseTags
+
+PERIODS = ("day", "week", "month")
+# Summary keys looked up per SELECT; four bound parameters each.
+KEY_CHUNK_SIZE = 500
+# SQLite's default limit on the terms of one compound SELECT.
+COMPOUND_CHUNK_SIZE = 500
+
+
+def bucket_bounds(period, moment):
+    """Return the first day of ``moment``'s bucket and the first day after it."""
+    day = moment.date() if isinstance(moment, datetime) else moment
+    if period == "day":
+        start = day
+        return start, start + timedelta(days=1)
+    if period == "week":
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + timedelta(days=32)).replace(day=1)
+
+
+class Delta:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.added = []
+        self.removed = []
+
+    def add(self, sign, price):
+        self.count += sign
+        self.total += sign * price
+        (self.added if sign > 0 else self.removed).append(price)
+
+
+def collect_deltas(changes):
+    """Group ``(sign, category_id, created_at, price, currency, tag_ids)`` tuples by summary row.
+
+    A category_id of None only touches the tag rows, for tag-only changes.
+    """
+    deltas = {}
+    for sign, category_id, created_at, price, currency, tag_ids in changes:
+        keys = [("category", category_id)] if category_id is not None else []
+        keys += [("tag", tag_id) for tag_id in tag_ids]
+        for dimension, key_id in keys:
+            for period in PERIODS:
+                bucket, _ = bucket_bounds(period, created_at)
+                deltas.setdefault((dimension, period, key_id, bucket, currency), Delta()).add(sign, price)
+    return deltas
+
+
+def apply_changes(connection, changes):
+    """Fold ``changes`` into expense_summary with a fixed number of statements.
+
+    Existing rows are read with one query per KEY_CHUNK_SIZE keys and written
+    back with one DELETE, one INSERT and one executemany UPDATE. Buckets that
+    lose their current minimum or maximum get their bounds from expense in
+    one more query. Buckets whose total went up are checked against their
+    budgets (see budgets.py).
+    """
+    deltas = collect_deltas(changes)
+    if not deltas:
+        return
+    summary = ExpenseSummaryModel.__table__
+    key_columns = tuple_(summary.c.dimension, summary.c.period, summary.c.key_id, summary.c.bucket, summary.c.currency)
+    keys = list(deltas)
+    existing = {}
+    for start in range(0, len(keys), KEY_CHUNK_SIZE):
+        rows = connection.execute(select(summary).where(key_columns.in_(keys[start:start + KEY_CHUNK_SIZE])))
+        existing.update(((row.dimension, row.period, row.key_id, row.bucket, row.currency), row) for row in rows)
+
+    inserts, updates, deletes = [], [], []
+    recompute = {}
+    increased = []
+    for key, delta in deltas.items():
+        row = existing.get(key)
+        if delta.total > 0:
+            old_total = row.total if row is not None else 0
+            increased.append((key, old_total, old_total + delta.total))
+        if row is None:
+            if delta.count > 0:
+                dimension, period, key_id, bucket, currency = key
+                inserts.append({
+                    "dimension": dimension,
+                    "period": period,
+                    "key_id": key_id,
+                    "bucket": bucket,
+                    "currency": currency,
+                    "count": delta.count,
+                    "total": delta.total,
+                    "min_price": min(delta.added),
+                    "max_price": max(delta.added),
+                })
+            continue
+
+        count = row.count + delta.count
+        if count <= 0:
+            deletes.append(row.id)
+            continue
+
+        update_row = {"row_id": row.id, "new_count": count, "new_total": row.total + delta.total}
+        # Removing the current minimum or maximum is the only case that needs
+        # the source rows; everything else folds in without touching expense.
+        if any(price <= row.min_price or price >= row.max_price for price in delta.removed):
+            recompute[key] = update_row
+        else:
+            update_row["new_min_price"] = min([row.min_price] + delta.added)
+            update_row["new_max_price"] = max([row.max_price] + delta.added)
+        updates.append(update_row)
+
+    for key, (min_price, max_price) in recompute_bounds(connection, list(recompute)).items():
+        recompute[key].update(new_min_price=min_price, new_max_price=max_price)
+
+    if deletes:
+        connection.execute(delete(summary).where(summary.c.id.in_(deletes)))
+    if inserts:
+        connection.execute(insert(summary), inserts)
+    if updates:
+        connection.execute(
+            update(summary)
+            .where(summary.c.id == bindparam("row_id"))
+            .values(
+                count=bindparam("new_count"),
+                total=bindparam("new_total"),
+                min_price=bindparam("new_min_price"),
+                max_price=bindparam("new_max_price"),
+            ),
+            updates,
+        )
+    record_alerts(connection, increased)
+
+
+def bounds_query(index, key):
+    dimension, period, key_id, bucket, currency = key
+    start, end = bucket_bounds(period, bucket)
+    expense = ExpenseModel.__table__
+    query = select(literal(index), func.min(expense.c.price), func.max(expense.c.price)).where(
+        expense.c.created_at >= datetime.combine(start, time()),
+        expense.c.created_at < datetime.combine(end, time()),
+        expense.c.currency == currency,
+    )
+    if dimension == "category":
+        return query.where(expense.c.category_id == key_id)
+    expense_tag = ExpenseTags.__table__
+    return query.join(expense_tag, expense_tag.c.expense_id == expense.c.id).where(
+        expense_tag.c.tag_id == key_id
+    )
+
+
+def recompute_bounds(connection, keys):
+    """Return {key: (min_price, max_price)} read from expense, one UNION ALL per chunk of keys."""
+    bounds = {}
+    for start in range(0, len(keys), COMPOUND_CHUNK_SIZE):
+        chunk = keys[start:start + COMPOUND_CHUNK_SIZE]
+        queries = [bounds_query(index, key) for index, key in enumerate(chunk)]
+        statement = union_all(*queries) if len(queries) > 1 else queries[0]
+        for index, min_price, max_price in connection.execute(statement):
+            bounds[chunk[index]] = (min_price, max_price)
+    return bounds
+
+
+def old_value(expense, attribute):
+    history = get_history(expense, attribute)
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(expense, attribute)
+
+
+def expense_changes(session):
+    changes = []
+    for expense in session.new:
+        if isinstance(expense, ExpenseModel):
+            tag_ids = [tag.id for tag in expense.tag]
+            changes.append((1, expense.category_id, expense.created_at, expense.price, expense.currency, tag_ids))
+
+    for expense in session.deleted:
+        if isinstance(expense, ExpenseModel):
+            history = get_history(expense, "tag")
+            tag_ids = [tag.id for tag in list(history.unchanged) + list(history.deleted)]
+            changes.append((
+                -1,
+                old_value(expense, "category_id"),
+                old_value(expense, "created_at"),
+                old_value(expense, "price"),
+                old_value(expense, "currency"),
+                tag_ids,
+            ))
+
+    for expense in session.dirty:
+        if not isinstance(expense, ExpenseModel) or not session.is_modified(expense):
+            continue
+        history = get_history(expense, "tag")
+        new_tags = {tag.id for tag in expense.tag}
+        old_tags = (new_tags - {tag.id for tag in history.added}) | {tag.id for tag in history.deleted}
+        old = (
+            old_value(expense, "category_id"),
+            old_value(expense, "created_at"),
+            old_value(expense, "price"),
+            old_value(expense, "currency"),
+            old_tags,
+        )
+        new = (expense.category_id, expense.created_at, expense.price, expense.currency, new_tags)
+        if old != new:
+            changes.append((-1,) + old)
+            changes.append((1,) + new)
+    return changes
+
+
+@event.listens_for(Session, "after_flush")
+def track_expense_changes(session, flush_context):
+    changes = expense_changes(session)
+    if changes:
+        apply_changes(session.connection(), changes)
+
+
+def rebuild_summaries():
+    """Recompute expense_summary from scratch."""
+    db.session.execute(delete(ExpenseSummaryModel))
+    expense = ExpenseModel.__table__
+    expense_tag = ExpenseTags.__table__
+    rows = db.session.execute(
+        select(expense.c.id, expense.c.category_id, expense.c.created_at, expense.c.price, expense.c.currency)
+    ).all()
+    tags = {}
+    for expense_id, tag_id in db.session.execute(select(expense_tag.c.expense_id, expense_tag.c.tag_id)):
+        tags.setdefault(expense_id, []).append(tag_id)
+    deltas = collect_deltas(
+        (1, category_id, created_at, price, currency, tags.get(expense_id, ()))
+        for expense_id, category_id, created_at, price, currency in rows
+    )
+    if deltas:
+        db.session.execute(
+            insert(ExpenseSummaryModel.__table__),
+            [
+                {
+                    "dimension": dimension,
+                    "period": period,
+                    "key_id": key_id,
+                    "bucket": bucket,
+                    "currency": currency,
+                    "count": delta.count,
+                    "total": delta.total,
+                    "min_price": min(delta.added),
+                    "max_price": max(delta.added),
+                }
+                for (dimension, period, key_id, bucket, currency), delta in deltas.items()
+            ],
+        )
+    db.session.commit()
+    return len(rows)
+
+
+def summary_totals():
+    summary = ExpenseSummaryModel
+    rows = db.session.execute(
+        select(
+            summary.dimension, summary.period, summary.key_id, summary.bucket, summary.currency,
+            summary.count, summary.total,
+        )
+    )
+    return {tuple(row[:5]): tuple(row[5:]) for row in rows}
+
+
+def rebuild_budgets():
+    """Rebuild expense_summary, then re-check every budget against it.
+
+    Returns the number of summary buckets that had drifted from the expense
+    table and the number of alerts that had been missed.
+    """
+    before = summary_totals()
+    rebuild_summaries()
+    after = summary_totals()
+    drifted = sum(before.get(key) != totals for key, totals in after.items())
+    drifted += sum(key not in after for key in before)
+    missed = evaluate_budgets(db.session.connection())
+    db.session.commit()
+    return drifted, missed
+
+
+@click.command("rebuild-stats")
+@with_appcontext
+def rebuild_stats_command():
+    """Recompute the spending summary table from the expense table."""
+    for shard in SHARDS.keys or [None]:
+        with SHARDS.pinned(db.session, shard):
+            count = rebuild_summaries()
+        click.echo("Rebuilt summaries from {} expenses{}.".format(count, " in " + shard if shard else ""))
+
+
+@click.command("rebuild-budgets")
+@with_appcontext
+def rebuild_budgets_command():
+    """Recompute budget totals from scratch and report any drift."""
+    for shard in SHARDS.keys or [None]:
+        with SHARDS.pinned(db.session, shard):
+            drifted, missed = rebuild_budgets()
+        click.echo("{}{} summary buckets had drifted, {} alerts were missing.".format(
+            shard + ": " if shard else "", drifted, missed,
+        ))
@@ -0,0 +1,67 @@
+"""Fixtures shared by the tests: an app on a throwaway SQLite file and signed-in users."""
+import pytest
+from sqlalchemy import select
+
+from app import create_app
+from db import db
+from models import ExpenseSummaryModel
+from summaries import rebuild_summaries
+
+PASSWORD = "correct horse battery"
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Cheap hashes, computed inline; the tests are not about pbkdf2.
+    monkeypatch.setenv("PASSWORD_HASH_ROUNDS", "1000")
+    monkeypatch.setenv("PASSWORD_POOL_WORKERS", "0")
+    for name in ("DATABASE_REPLICA_URLS", "SHARD_URLS", "REVOCATION_STORE", "RECURRING_SCHEDULER"):
+        monkeypatch.delenv(name, raising=False)
+    app = create_app("sqlite:///{}".format(tmp_path / "test.db"))
+    app.config["TESTING"] = True
+    with app.app_context():
+        db.create_all()
+    # No app context stays pushed: requests would reuse it, and share the
+    # test's session. Tests that touch the database push their own.
+    yield app
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth(client):
+    """Register ``username`` if needed and return headers with a fresh token."""
+    def auth(username="alice"):
+        credentials = {"username": username, "password": PASSWORD}
+        client.post("/register", json=credentials)
+        response = client.post("/login", json=credentials)
+        assert response.status_code == 200, response.json
+        return {"Authorization": "Bearer " + response.json["access_token"]}
+    return auth
+
+
+def summary_rows():
+    summary = ExpenseSummaryModel
+    rows = db.session.execute(select(
+        summary.dimension, summary.period, summary.key_id, summary.bucket,
+        summary.count, summary.total, summary.min_price, summary.max_price, summary.currency,
+    ))
+    return sorted(tuple(row) for row in rows)
+
+
+@pytest.fixture
+def check_summaries(app):
+    """Assert that expense_summary equals what ``rebuild_summaries`` makes of the expenses."""
+    def check():
+        with app.app_context():
+            maintained = summary_rows()
+            rebuild_summaries()
+            assert maintained == summary_rows()
+        return maintained
+    return check
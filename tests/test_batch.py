@@ -0,0 +1,13 @@
+def test_failed_write_does_not_break_the_batch(client, auth):
+    headers = auth()
+    client.post("/category", json={"name": "food"}, headers=headers)
+    batch = {"requests": [
+        {"method": "POST", "path": "/category", "body": {"name": "food"}},
+        {"path": "/category"},
+        {"method": "POST", "path": "/category", "body": {"name": "fun"}},
+    ]}
+    response = client.post("/batch", json=batch, headers=headers)
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json["responses"]] == [400, 200, 200]
+    assert [category["name"] for category in response.json["responses"][1]["body"]] == ["food"]
+    assert sorted(category["name"] for category in client.get("/category", headers=headers).json) == ["food", "fun"]
@@ -0,0 +1,40 @@
+import time
+
+from blocklist import BLOCKLIST
+from db import db
+from models import RevokedTokenModel
+
+
+def revoke(id, jti, revoked_at):
+    db.session.add(RevokedTokenModel(id=id, jti=jti, expires_at=int(time.time()) + 3600, revoked_at=revoked_at))
+    db.session.commit()
+
+
+def test_logout_revokes_the_token(client, auth):
+    headers = auth()
+    assert client.get("/category", headers=headers).status_code == 200
+    assert client.post("/logout", headers=headers).status_code == 200
+    assert client.get("/category", headers=headers).status_code == 401
+
+
+def test_sync_sees_revocations_that_commit_out_of_order(app):
+    BLOCKLIST.sync_interval = 0
+    now = time.time()
+    with app.app_context():
+        revoke(10, "later-id", now)
+        assert "later-id" in BLOCKLIST
+
+        # Took its id and timestamp before the one above, but committed after
+        # the worker had already synced past both.
+        revoke(5, "earlier-id", now - 1)
+        assert "earlier-id" in BLOCKLIST
+        assert "never-revoked" not in BLOCKLIST
+
+
+def test_sync_does_not_count_overlapping_revocations_twice(app):
+    BLOCKLIST.sync_interval = 0
+    with app.app_context():
+        revoke(1, "jti", time.time())
+        for _ in range(3):
+            assert "jti" in BLOCKLIST
+    assert BLOCKLIST.bloom.count == 1
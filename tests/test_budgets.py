@@ -0,0 +1,36 @@
+from summaries import rebuild_budgets
+
+
+def test_alerts_follow_the_summaries(app, client, auth, check_summaries):
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json["id"]
+    tag = client.post("/category/{}/tag".format(category), json={"name": "lunch"}, headers=headers).json["id"]
+    budget = client.post("/budget", json={"dimension": "category", "key_id": int(category), "limit": "50.00"}, headers=headers).json
+    tag_budget = client.post(
+        "/budget", json={"dimension": "tag", "key_id": tag, "period": "day", "limit": "20.00", "alert_at": 80}, headers=headers,
+    ).json
+
+    def alerts(budget_id):
+        return client.get("/budget/alerts?budget_id={}".format(budget_id), headers=headers).json
+
+    expenses = []
+    for price in ("10.00", "10.00"):
+        expense = client.post("/expense", json={"name": "meal", "price": price, "category_id": int(category)}, headers=headers).json
+        client.post("/expense/{}/tag/{}".format(expense["id"], tag), headers=headers)
+        expenses.append(expense["id"])
+    check_summaries()
+    # 20.00 of 20.00 crosses 80%; 20.00 of 50.00 does not cross 100%.
+    assert [alert["total"] for alert in alerts(tag_budget["id"])] == [20.0]
+    assert alerts(budget["id"]) == []
+
+    # Down and back over the threshold in the same period: still one alert.
+    client.put("/expense/{}".format(expenses[0]), json={"name": "meal", "price": "1.00"}, headers=headers)
+    client.put("/expense/{}".format(expenses[0]), json={"name": "meal", "price": "40.00"}, headers=headers)
+    check_summaries()
+    assert len(alerts(tag_budget["id"])) == 1
+    assert [alert["total"] for alert in alerts(budget["id"])] == [50.0]
+    assert client.get("/budget/{}".format(budget["id"]), headers=headers).json["spent"] == 50.0
+
+    with app.app_context():
+        # Nothing drifted and no alert was missed.
+        assert rebuild_budgets() == (0, 0)
@@ -0,0 +1,20 @@
+def test_bulk_rows_only_take_tags_of_their_category(client, auth, check_summaries):
+    headers = auth()
+    food = client.post("/category", json={"name": "food"}, headers=headers).json["id"]
+    fun = client.post("/category", json={"name": "fun"}, headers=headers).json["id"]
+    lunch = client.post("/category/{}/tag".format(food), json={"name": "lunch"}, headers=headers).json["id"]
+    film = client.post("/category/{}/tag".format(fun), json={"name": "film"}, headers=headers).json["id"]
+
+    rows = [
+        {"name": "soup", "price": "4.50", "category_id": int(food), "tag_ids": [lunch]},
+        {"name": "popcorn", "price": "6.00", "category_id": int(food), "tag_ids": [film]},
+        {"name": "ticket", "price": "12.00", "category_name": "fun", "tag_names": ["film"]},
+    ]
+    response = client.post("/expense/bulk", json=rows, headers=headers)
+    assert response.status_code == 201
+    assert response.json["created"] == 2
+    assert response.json["errors"] == {"1": {"tag_ids": ["Tag {} doesn't belong to the expense's category.".format(film)]}}
+
+    check_summaries()
+    stats = client.get("/stats/tag", headers=headers).json
+    assert [(row["tag_id"], row["count"]) for row in stats] == [(lunch, 1), (film, 1)]
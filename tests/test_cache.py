@@ -0,0 +1,82 @@
+from sqlalchemy import select
+
+from cache import RESPONSE_CACHE, bump_versions
+from db import db
+from models import CacheVersionModel
+
+
+def get(client, path, headers, etag=None):
+    if etag is not None:
+        headers = dict(headers, **{"If-None-Match": etag})
+    return client.get(path, headers=headers)
+
+
+def test_writes_only_invalidate_their_owner(client, auth):
+    # Always re-read versions, so a 304 means they did not change.
+    RESPONSE_CACHE.sync_interval = 0
+    alice, bob = auth("alice"), auth("bob")
+    client.post("/category", json={"name": "rent"}, headers=bob)
+    etag = get(client, "/category", bob).headers["ETag"].strip('"')
+
+    category = client.post("/category", json={"name": "food"}, headers=alice).json
+    client.post("/expense", json={"name": "lunch", "price": "12.50", "category_id": int(category["id"])}, headers=alice)
+    assert get(client, "/category", bob, etag).status_code == 304
+
+
+def test_own_writes_invalidate(client, auth):
+    RESPONSE_CACHE.sync_interval = 0
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json
+    path = "/category/{}".format(category["id"])
+    etag = get(client, path, headers).headers["ETag"].strip('"')
+    assert get(client, path, headers, etag).status_code == 304
+
+    client.post("/expense", json={"name": "lunch", "price": "12.50", "category_id": int(category["id"])}, headers=headers)
+    response = get(client, path, headers, etag)
+    assert response.status_code == 200
+    assert [expense["name"] for expense in response.json["expense"]] == ["lunch"]
+
+
+def test_retagging_invalidates_tags(client, auth):
+    RESPONSE_CACHE.sync_interval = 0
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json
+    tag = client.post("/category/{}/tag".format(category["id"]), json={"name": "work"}, headers=headers).json
+    expense = client.post(
+        "/expense", json={"name": "lunch", "price": "12.50", "category_id": int(category["id"])}, headers=headers,
+    ).json
+    path = "/tag/{}".format(tag["id"])
+    etag = get(client, path, headers).headers["ETag"].strip('"')
+
+    client.put("/expense/{}/tags".format(expense["id"]), json={"tag_ids": [tag["id"]]}, headers=headers)
+    response = get(client, path, headers, etag)
+    assert response.status_code == 200
+    assert [expense["name"] for expense in response.json["expense"]] == ["lunch"]
+
+
+def test_deleting_a_category_invalidates(client, auth):
+    RESPONSE_CACHE.sync_interval = 0
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json
+    etag = get(client, "/category", headers).headers["ETag"].strip('"')
+
+    assert client.delete("/category/{}".format(category["id"]), headers=headers).status_code == 200
+    response = get(client, "/category", headers, etag)
+    assert response.status_code == 200
+    assert response.json == []
+
+
+def test_versions_are_created_and_bumped_in_place(app):
+    def versions():
+        return sorted(tuple(row) for row in db.session.execute(
+            select(CacheVersionModel.user_id, CacheVersionModel.name, CacheVersionModel.version)
+        ))
+
+    with app.app_context():
+        bump_versions(db.session, [1], ["expense"])
+        db.session.commit()
+        # Existing and new rows in one go; each bumped once per transaction.
+        bump_versions(db.session, [1, 2], ["expense", "tag"])
+        bump_versions(db.session, [1], ["expense"])
+        db.session.commit()
+        assert versions() == [(1, "expense", 2), (1, "tag", 1), (2, "expense", 1), (2, "tag", 1)]
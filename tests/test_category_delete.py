@@ -0,0 +1,39 @@
+import pytest
+
+from deletes import BACKGROUND_DELETES
+
+
+def category_with_expenses(client, headers, name, count, foreign_tag=None):
+    """A category with a tag, and ``count`` expenses linked to it and to ``foreign_tag``."""
+    category = client.post("/category", json={"name": name}, headers=headers).json
+    tag = client.post("/category/{}/tag".format(category["id"]), json={"name": name}, headers=headers).json
+    for i in range(count):
+        expense = {"name": name, "price": "{}.25".format(i + 1), "category_id": int(category["id"])}
+        expense = client.post("/expense", json=expense, headers=headers).json
+        for tag_id in (tag["id"], foreign_tag):
+            if tag_id is not None:
+                client.post("/expense/{}/tag/{}".format(expense["id"], tag_id), headers=headers)
+    return category["id"], tag["id"]
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_delete_keeps_summaries(client, auth, check_summaries, chunked):
+    # Several chunks' worth of expenses.
+    BACKGROUND_DELETES.chunk_size = 2
+    headers = auth()
+    _, film = category_with_expenses(client, headers, "fun", 2)
+    # Its expenses are also linked to the tag of the category that stays.
+    food, _ = category_with_expenses(client, headers, "food", 5, foreign_tag=film)
+    assert check_summaries()
+
+    response = client.delete("/category/{}?chunked={}".format(food, str(chunked).lower()), headers=headers)
+    assert response.status_code == (202 if chunked else 200)
+    if chunked:
+        # One worker thread, so this waits for the delete.
+        BACKGROUND_DELETES.get_executor().submit(lambda: None).result()
+
+    assert client.get("/category/{}".format(food), headers=headers).status_code == 404
+    rows = check_summaries()
+    assert {(row[0], row[1], row[4]) for row in rows} == {
+        (dimension, period, 2) for dimension in ("category", "tag") for period in ("day", "week", "month")
+    }
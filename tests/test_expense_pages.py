@@ -0,0 +1,103 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+import resources.expense
+from db import db
+from models import CategoryModel, ExpenseModel, TagModel
+
+FILTERS = [{}, {"category": "food"}, {"tag": "lunch"}, {"min_price": "5.00"}, {"name": "meal"}, {"category": "fun", "max_price": "3.00"}]
+
+
+@pytest.fixture
+def expenses(app, auth):
+    """Two users' expenses; return alice's headers and, for hers, the ids each filter of FILTERS selects."""
+    headers = auth("alice")
+    auth("bob")
+    with app.app_context():
+        categories = {}
+        for user_id in (1, 2):
+            lunch = TagModel(user_id=user_id, name="lunch")
+            food = CategoryModel(user_id=user_id, name="food", tag=[lunch])
+            fun = CategoryModel(user_id=user_id, name="fun")
+            for i in range(23):
+                db.session.add(ExpenseModel(
+                    user_id=user_id,
+                    name="meal" if i % 3 else "other",
+                    price=Decimal(i) / 2,
+                    category=food if i % 2 else fun,
+                    tag=[lunch] if i % 4 == 1 else [],
+                ))
+            if user_id == 1:
+                categories = {"food": food, "fun": fun, "lunch": lunch}
+        db.session.commit()
+
+        alice = db.session.scalars(db.select(ExpenseModel).where(ExpenseModel.user_id == 1)).all()
+        selected = []
+        for criteria in FILTERS:
+            args, keep = {}, alice
+            if "category" in criteria:
+                category = categories[criteria["category"]]
+                args["category_id"] = category.id
+                keep = [expense for expense in keep if expense.category_id == category.id]
+            if "tag" in criteria:
+                tag = categories[criteria["tag"]]
+                args["tag_id"] = tag.id
+                keep = [expense for expense in keep if tag in expense.tag]
+            if "min_price" in criteria:
+                args["min_price"] = criteria["min_price"]
+                keep = [expense for expense in keep if expense.price >= Decimal(criteria["min_price"])]
+            if "max_price" in criteria:
+                args["max_price"] = criteria["max_price"]
+                keep = [expense for expense in keep if expense.price <= Decimal(criteria["max_price"])]
+            if "name" in criteria:
+                args["name"] = criteria["name"]
+                keep = [expense for expense in keep if expense.name == criteria["name"]]
+            assert keep
+            selected.append((args, sorted(expense.id for expense in keep)))
+    return headers, selected
+
+
+def list_expenses(client, headers, **params):
+    response = client.get("/expense", query_string=params, headers=headers)
+    assert response.status_code == 200, response.json
+    return response
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_cursor_visits_every_row_once(app, client, expenses, fast):
+    app.config["FAST_SERIALIZATION"] = fast
+    headers, selected = expenses
+    for args, ids in selected:
+        for limit in (1, 4, len(ids), 100):
+            seen, params = [], dict(args, limit=limit)
+            # A cursor that doesn't move on would page forever.
+            for _ in range(len(ids)):
+                response = list_expenses(client, headers, **params)
+                page = [int(expense["id"]) for expense in response.json]
+                assert 0 < len(page) <= limit, args
+                seen += page
+                if "X-Next-Cursor" not in response.headers:
+                    break
+                params["cursor"] = response.headers["X-Next-Cursor"]
+            assert seen == ids, (args, limit)
+
+
+@pytest.mark.parametrize("fast", [False, True])
+def test_stream_matches_the_list(app, client, expenses, fast, monkeypatch):
+    app.config["FAST_SERIALIZATION"] = fast
+    # Several batches per stream.
+    monkeypatch.setattr(resources.expense, "STREAM_BATCH_SIZE", 4)
+    headers, selected = expenses
+    for args, ids in selected:
+        listed = list_expenses(client, headers, limit=1000, **args).json
+        response = list_expenses(client, headers, stream="true", **args)
+        assert response.mimetype == "application/x-ndjson"
+        streamed = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert streamed == listed, args
+        assert [int(expense["id"]) for expense in streamed] == ids
+    # The stream starts after the cursor too.
+    args, ids = selected[0]
+    response = list_expenses(client, headers, stream="true", cursor=ids[9])
+    assert [int(json.loads(line)["id"]) for line in response.data.decode().splitlines()] == ids[10:]
@@ -0,0 +1,25 @@
+def test_replacing_tags_keeps_summaries(client, auth, check_summaries):
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json
+    a, b, c = (
+        client.post("/category/{}/tag".format(category["id"]), json={"name": name}, headers=headers).json["id"]
+        for name in ("a", "b", "c")
+    )
+    path = None
+    for price in ("4.50", "30.00"):
+        expense = client.post("/expense", json={"name": "meal", "price": price, "category_id": int(category["id"])}, headers=headers).json
+        path = "/expense/{}/tags".format(expense["id"])
+        assert client.put(path, json={"tag_ids": [a, b]}, headers=headers).status_code == 200
+    assert check_summaries()
+
+    for tag_ids in ([b, c], [], [a], [a, b, c]):
+        response = client.put(path, json={"tag_ids": tag_ids}, headers=headers)
+        assert response.status_code == 200
+        assert sorted(tag["id"] for tag in response.json["tag"]) == sorted(tag_ids)
+        check_summaries()
+
+    # A tag of another category changes nothing.
+    other = client.post("/category", json={"name": "fun"}, headers=headers).json
+    foreign = client.post("/category/{}/tag".format(other["id"]), json={"name": "film"}, headers=headers).json["id"]
+    assert client.put(path, json={"tag_ids": [a, foreign]}, headers=headers).status_code == 400
+    check_summaries()
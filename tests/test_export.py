@@ -0,0 +1,98 @@
+import csv
+import gzip
+import io
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+import resources.expense
+from db import db
+from export import columnar_chunks, csv_chunks, read_columnar
+from models import ExpenseModel
+
+
+@pytest.fixture
+def expenses(app, client, auth):
+    """Three expenses, two of them tagged, and the headers of their owner."""
+    headers = auth()
+    category = int(client.post("/category", json={"name": "food"}, headers=headers).json["id"])
+    tags = [client.post("/category/{}/tag".format(category), json={"name": name}, headers=headers).json["id"] for name in ("lunch", "work")]
+    for name, price, tag_ids in (('Bread, "sourdough"', "3.50", tags), ("Café", "0.05", []), ("Soup", "-12.00", tags[1:])):
+        expense = client.post("/expense", json={"name": name, "price": price, "category_id": category}, headers=headers).json
+        for tag in tag_ids:
+            client.post("/expense/{}/tag/{}".format(expense["id"], tag), headers=headers)
+    # Another user's expenses stay out of the export.
+    other = auth("bob")
+    other_category = int(client.post("/category", json={"name": "food"}, headers=other).json["id"])
+    client.post("/expense", json={"name": "Rent", "price": "900.00", "category_id": other_category}, headers=other)
+    with app.app_context():
+        created_at = db.session.scalars(
+            db.select(ExpenseModel.created_at).where(ExpenseModel.name != "Rent").order_by(ExpenseModel.id)
+        ).all()
+    return headers, {
+        "name": ['Bread, "sourdough"', "Café", "Soup"],
+        "price": [Decimal("3.50"), Decimal("0.05"), Decimal("-12.00")],
+        "currency": ["USD"] * 3,
+        "category_id": [category] * 3,
+        "category_name": ["food"] * 3,
+        "tags": ["lunch;work", "", "work"],
+        "created_at": created_at,
+    }
+
+
+def export(client, headers, **params):
+    response = client.get("/expense/export", query_string=params, headers=headers)
+    assert response.status_code == 200
+    return response
+
+
+def test_csv_export(client, expenses):
+    headers, expected = expenses
+    response = export(client, headers)
+    assert response.mimetype == "text/csv"
+    rows = list(csv.DictReader(io.StringIO(response.data.decode())))
+    assert [row["name"] for row in rows] == expected["name"]
+    assert [Decimal(row["price"]) for row in rows] == expected["price"]
+    assert [row["tags"] for row in rows] == expected["tags"]
+    assert [datetime.fromisoformat(row["created_at"]) for row in rows] == expected["created_at"]
+
+    # Filters apply as they do to the list.
+    rows = list(csv.DictReader(io.StringIO(export(client, headers, min_price="1.00").data.decode())))
+    assert [row["name"] for row in rows] == expected["name"][:1]
+
+
+def test_columnar_export_round_trips(client, expenses, monkeypatch):
+    # One row group per two rows.
+    monkeypatch.setattr(resources.expense, "EXPORT_BATCH_SIZE", 2)
+    headers, expected = expenses
+    columns = read_columnar(io.BytesIO(export(client, headers, format="columnar").data))
+    assert len(columns["id"]) == 3 and columns["id"] == sorted(columns["id"])
+    for name, values in expected.items():
+        assert columns[name] == values, name
+
+
+def test_gzip_export_matches_the_plain_one(client, expenses):
+    headers, _ = expenses
+    for format in ("csv", "columnar"):
+        plain = export(client, headers, format=format)
+        assert "Content-Encoding" not in plain.headers
+        compressed = client.get(
+            "/expense/export", query_string={"format": format}, headers=dict(headers, **{"Accept-Encoding": "gzip"}),
+        )
+        assert (compressed.headers["Content-Encoding"], compressed.headers["Vary"]) == ("gzip", "Accept-Encoding")
+        assert gzip.decompress(compressed.data) == plain.data
+
+
+def test_missing_timestamps_are_exported():
+    rows = [
+        (1, datetime(2026, 10, 18, 9, 30, 0, 250), "tea", 150, "EUR", 1, "food", None),
+        (2, None, "cake", 400, "EUR", 1, "food", "b;a"),
+    ]
+    columns = read_columnar(io.BytesIO(b"".join(columnar_chunks([rows]))))
+    assert columns["created_at"] == [datetime(2026, 10, 18, 9, 30, 0, 250), None]
+    assert columns["price"] == [Decimal("1.50"), Decimal("4.00")]
+    assert columns["tags"] == ["", "a;b"]
+
+    lines = b"".join(csv_chunks([rows])).decode().splitlines()
+    assert lines[2] == "2,,cake,4.00,EUR,1,food,a;b"
@@ -0,0 +1,36 @@
+from passwords import LOGIN_THROTTLE
+
+from conftest import PASSWORD
+
+
+def throttle(app, **limits):
+    app.config.update(limits)
+    LOGIN_THROTTLE.init_app(app)
+
+
+def test_successful_logins_are_not_throttled(app, client, auth):
+    throttle(app, LOGIN_THROTTLE_PER_USER=(2, 60))
+    for _ in range(5):
+        auth()
+
+
+def test_failed_logins_are_throttled(app, client, auth):
+    throttle(app, LOGIN_THROTTLE_PER_USER=(2, 60))
+    auth()
+    wrong = {"username": "alice", "password": "wrong password"}
+    assert client.post("/login", json=wrong).status_code == 401
+    assert client.post("/login", json=wrong).status_code == 401
+    assert client.post("/login", json=wrong).status_code == 429
+    # Even the right password, until the failures age out.
+    assert client.post("/login", json={"username": "alice", "password": PASSWORD}).status_code == 429
+    # Another user from the same address is still let in.
+    auth("bob")
+
+
+def test_registrations_have_their_own_limit(app, client, auth):
+    throttle(app, LOGIN_THROTTLE_PER_ADDRESS=(2, 60), LOGIN_THROTTLE_REGISTER_PER_ADDRESS=(3, 60))
+    auth("alice")
+    auth("bob")
+    # Registering did not use up the address's logins, and logging in did not use up its registrations.
+    assert client.post("/register", json={"username": "carol", "password": PASSWORD}).status_code == 201
+    assert client.post("/register", json={"username": "dave", "password": PASSWORD}).status_code == 429
@@ -0,0 +1,99 @@
+from datetime import datetime
+
+import flask_migrate
+from sqlalchemy import insert, table, column
+
+from db import db
+from summaries import collect_deltas
+
+
+def rows(name, *columns):
+    return table(name, *(column(name) for name in columns))
+
+
+def test_tag_merge_recounts_summaries(app, check_summaries):
+    with app.app_context():
+        db.drop_all()
+        # The last revision before same-named tags were merged.
+        flask_migrate.upgrade(revision="97decc49da1a")
+
+        expenses = [
+            (1, 12.5, datetime(2026, 10, 5, 10), [1, 2]),  # Linked to both copies of "lunch".
+            (2, 3.0, datetime(2026, 10, 12, 9), [2]),
+            (3, 7.25, datetime(2026, 10, 12, 18), [3, 3]),  # Linked to "coffee" twice.
+        ]
+        # A later migration gives the existing rows to the first user.
+        db.session.execute(insert(rows("user", "id", "username", "password")), [
+            {"id": 1, "username": "alice", "password": "unused"},
+        ])
+        db.session.execute(insert(rows("category", "id", "name")), [{"id": 1, "name": "food"}])
+        db.session.execute(insert(rows("tag", "id", "name", "category_id")), [
+            {"id": 1, "name": "lunch", "category_id": 1},
+            {"id": 2, "name": "lunch", "category_id": 1},
+            {"id": 3, "name": "coffee", "category_id": 1},
+        ])
+        db.session.execute(insert(rows("expense", "id", "name", "price", "category_id", "created_at")), [
+            {"id": id, "name": "expense", "price": price, "category_id": 1, "created_at": created_at}
+            for id, price, created_at, _ in expenses
+        ])
+        db.session.execute(insert(rows("expense_tag", "expense_id", "tag_id")), [
+            {"expense_id": id, "tag_id": tag_id} for id, _, _, tag_ids in expenses for tag_id in tag_ids
+        ])
+        # The summaries as they were kept before the merge, every link counted.
+        deltas = collect_deltas((1, 1, created_at, price, "USD", tag_ids) for _, price, created_at, tag_ids in expenses)
+        summary = rows("expense_summary", "dimension", "period", "key_id", "bucket", "count", "total", "min_price", "max_price")
+        db.session.execute(insert(summary), [
+            {
+                "dimension": dimension, "period": period, "key_id": key_id, "bucket": bucket,
+                "count": delta.count, "total": delta.total,
+                "min_price": min(delta.added), "max_price": max(delta.added),
+            }
+            for (dimension, period, key_id, bucket, _), delta in deltas.items()
+        ])
+        db.session.commit()
+
+        flask_migrate.upgrade()
+
+    assert check_summaries()
+
+
+def test_summaries_are_split_by_currency(app, check_summaries):
+    with app.app_context():
+        db.drop_all()
+        # The last revision before expense_summary had a currency.
+        flask_migrate.upgrade(revision="d8b2a6f4e571")
+
+        expenses = [
+            (1, 1250, "USD", datetime(2026, 10, 5, 10)),
+            (2, 900, "EUR", datetime(2026, 10, 5, 12)),
+            (3, 300, "USD", datetime(2026, 10, 12, 9)),
+        ]
+        db.session.execute(insert(rows("category", "id", "name", "user_id")), [{"id": 1, "name": "food", "user_id": 1}])
+        db.session.execute(insert(rows("tag", "id", "name", "category_id", "user_id")), [
+            {"id": 1, "name": "lunch", "category_id": 1, "user_id": 1},
+        ])
+        db.session.execute(insert(rows("expense", "id", "name", "price_cents", "currency", "category_id", "user_id", "created_at")), [
+            {"id": id, "name": "expense", "price_cents": cents, "currency": currency, "category_id": 1, "user_id": 1, "created_at": created_at}
+            for id, cents, currency, created_at in expenses
+        ])
+        db.session.execute(insert(rows("expense_tag", "expense_id", "tag_id")), [{"expense_id": 2, "tag_id": 1}])
+        # The summaries as they were kept before, every currency added together.
+        deltas = collect_deltas(
+            (1, 1, created_at, cents, "USD", [1] if id == 2 else []) for id, cents, _, created_at in expenses
+        )
+        summary = rows(
+            "expense_summary", "dimension", "period", "key_id", "bucket", "count", "total_cents", "min_price_cents", "max_price_cents",
+        )
+        db.session.execute(insert(summary), [
+            {
+                "dimension": dimension, "period": period, "key_id": key_id, "bucket": bucket,
+                "count": delta.count, "total_cents": delta.total,
+                "min_price_cents": min(delta.added), "max_price_cents": max(delta.added),
+            }
+            for (dimension, period, key_id, bucket, _), delta in deltas.items()
+        ])
+        db.session.commit()
+
+        flask_migrate.upgrade()
+
+    assert {row[8] for row in check_summaries()} == {"USD", "EUR"}
@@ -0,0 +1,84 @@
+from decimal import Decimal
+
+from db import db
+from models import ExpenseModel
+
+
+def test_cents_add_up_exactly(app, client, auth, check_summaries):
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json
+    ids = []
+    for price, currency in (("0.10", "USD"), ("0.20", "EUR"), (0.1, None)):
+        expense = {"name": "sweet", "price": price, "category_id": int(category["id"])}
+        if currency:
+            expense["currency"] = currency
+        response = client.post("/expense", json=expense, headers=headers)
+        assert response.status_code == 201
+        ids.append(response.json["id"])
+    assert response.json["currency"] == "USD"
+
+    rows = check_summaries()
+    # One row per currency: 0.10 + 0.10 USD and 0.20 EUR, never 0.40 of anything.
+    assert {(row[1], row[8], row[4], row[5]) for row in rows if row[0] == "category"} == {
+        (period, currency, count, total)
+        for period in ("day", "week", "month")
+        for currency, count, total in (("USD", 2, Decimal("0.20")), ("EUR", 1, Decimal("0.20")))
+    }
+
+    # Amounts are rewritten in place, currency included.
+    path = "/expense/{}".format(ids[1])
+    response = client.put(path, json={"name": "sweet", "price": "19.99", "currency": "GBP"}, headers=headers)
+    assert (response.json["price"], response.json["currency"]) == (19.99, "GBP")
+    check_summaries()
+    with app.app_context():
+        assert db.session.get(ExpenseModel, int(ids[1])).price == Decimal("19.99")
+
+    # A third decimal place would not fit in cents.
+    response = client.post("/expense", json={"name": "sweet", "price": "0.125", "category_id": int(category["id"])}, headers=headers)
+    assert response.status_code == 422
+    assert client.put(path, json={"name": "sweet", "price": "0.125"}, headers=headers).status_code == 422
+    check_summaries()
+
+
+def test_oversized_amounts_are_rejected(client, auth):
+    headers = auth()
+    category = int(client.post("/category", json={"name": "food"}, headers=headers).json["id"])
+    expense = client.post("/expense", json={"name": "sweet", "price": "1.00", "category_id": category}, headers=headers).json
+
+    for price in ("1e30", "10000000000000", "-1e13"):
+        body = {"name": "sweet", "price": price, "category_id": category}
+        assert client.post("/expense", json=body, headers=headers).status_code == 422
+        assert client.put("/expense/{}".format(expense["id"]), json=body, headers=headers).status_code == 422
+        assert client.get("/expense?min_price={}".format(price), headers=headers).status_code == 422
+        response = client.post("/expense/bulk", json=[body], headers=headers)
+        assert (response.json["created"], list(response.json["errors"])) == (0, ["0"])
+    # The largest amount allowed still fits.
+    body = {"name": "sweet", "price": "9999999999999.99", "category_id": category}
+    assert client.post("/expense", json=body, headers=headers).json["price"] == 9999999999999.99
+
+
+def test_currencies_are_reported_apart(client, auth, check_summaries):
+    headers = auth()
+    category = int(client.post("/category", json={"name": "travel"}, headers=headers).json["id"])
+    budget = client.post(
+        "/budget", json={"dimension": "category", "key_id": category, "limit": "100.00", "currency": "EUR"}, headers=headers,
+    ).json
+    for price, currency in (("80.00", "USD"), ("30.00", "USD"), ("60.00", "EUR")):
+        client.post("/expense", json={"name": "hotel", "price": price, "currency": currency, "category_id": category}, headers=headers)
+    check_summaries()
+
+    stats = client.get("/stats/category", headers=headers).json
+    assert [(row["currency"], row["count"], row["total"]) for row in stats] == [("EUR", 1, 60.0), ("USD", 2, 110.0)]
+    stats = client.get("/stats/period?currency=EUR", headers=headers).json
+    assert [(row["currency"], row["total"]) for row in stats] == [("EUR", 60.0)]
+
+    # 110.00 USD is not 110% of a 100.00 EUR budget.
+    assert client.get("/budget/{}".format(budget["id"]), headers=headers).json["spent"] == 60.0
+    assert client.get("/budget/alerts", headers=headers).json == []
+    client.post("/expense", json={"name": "hotel", "price": "40.00", "currency": "EUR", "category_id": category}, headers=headers)
+    assert [alert["total"] for alert in client.get("/budget/alerts", headers=headers).json] == [100.0]
+
+    distribution = client.get("/stats/distribution", headers=headers).json
+    assert (distribution["currency"], distribution["count"], distribution["total"]) == ("USD", 2, 110.0)
+    distribution = client.get("/stats/distribution?currency=EUR", headers=headers).json
+    assert (distribution["currency"], distribution["count"], distribution["total"]) == ("EUR", 2, 100.0)
@@ -0,0 +1,59 @@
+from decimal import Decimal
+
+from flask_jwt_extended import decode_token
+
+
+def spend(client, headers, name, price):
+    """A category with a tag and one tagged expense; return the three ids."""
+    category = client.post("/category", json={"name": name}, headers=headers).json["id"]
+    tag = client.post("/category/{}/tag".format(category), json={"name": name}, headers=headers).json["id"]
+    expense = client.post("/expense", json={"name": name, "price": price, "category_id": int(category)}, headers=headers).json["id"]
+    client.post("/expense/{}/tag/{}".format(expense, tag), headers=headers)
+    return category, tag, expense
+
+
+def test_users_only_touch_their_own_data(app, client, auth, check_summaries):
+    alice, bob = auth("alice"), auth("bob")
+    category, tag, expense = spend(client, alice, "food", "12.50")
+    bob_category, bob_tag, bob_expense = spend(client, bob, "rent", "900.00")
+    before = check_summaries()
+
+    assert client.get("/expense/{}".format(expense), headers=bob).status_code == 404
+    assert client.delete("/expense/{}".format(expense), headers=bob).status_code == 404
+    assert client.put("/expense/{}".format(expense), json={"name": "x", "price": "1.00"}, headers=bob).status_code == 409
+    assert client.post("/expense", json={"name": "x", "price": "1.00", "category_id": int(category)}, headers=bob).status_code == 400
+    assert client.post("/expense/{}/tag/{}".format(bob_expense, tag), headers=bob).status_code == 404
+    assert client.put("/expense/{}/tags".format(expense), json={"tag_ids": [bob_tag]}, headers=bob).status_code == 404
+    assert client.delete("/category/{}".format(category), headers=bob).status_code == 404
+    assert check_summaries() == before
+
+    assert [row["category_id"] for row in client.get("/stats/category", headers=bob).json] == [int(bob_category)]
+
+
+def test_deleting_a_user_keeps_summaries(app, client, auth, check_summaries):
+    alice, bob = auth("alice"), auth("bob")
+    spend(client, alice, "food", "12.50")
+    spend(client, bob, "rent", "900.00")
+    spend(client, bob, "fun", "20.00")
+    with app.app_context():
+        bob_id = int(decode_token(bob["Authorization"].split()[1])["sub"])
+
+    assert client.delete("/user/{}".format(bob_id), headers=bob).status_code == 200
+    rows = check_summaries()
+    # Only alice's category and tag are left, in each period.
+    assert len(rows) == 6
+    assert {row[5] for row in rows} == {Decimal("12.50")}
+    assert len(client.get("/stats/category", headers=alice).json) == 1
+
+
+def test_the_admin_can_manage_other_users(app, client, auth):
+    admin, alice, bob = auth("admin"), auth("alice"), auth("bob")
+    with app.app_context():
+        alice_id, bob_id = (int(decode_token(headers["Authorization"].split()[1])["sub"]) for headers in (alice, bob))
+
+    assert client.get("/user/{}".format(bob_id), headers=alice).status_code == 403
+    assert client.delete("/user/{}".format(bob_id), headers=alice).status_code == 403
+    # The first user is the admin.
+    assert client.get("/user/{}".format(alice_id), headers=admin).json["username"] == "alice"
+    assert client.delete("/user/{}".format(bob_id), headers=admin).status_code == 200
+    assert client.get("/user/{}".format(bob_id), headers=admin).status_code == 404
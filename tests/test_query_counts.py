@@ -0,0 +1,58 @@
+from decimal import Decimal
+
+import pytest
+
+from blocklist import BLOCKLIST
+from cache import RESPONSE_CACHE
+from db import db
+from loaders import assert_query_count, count_queries
+from models import CategoryModel, ExpenseModel, TagModel
+
+PATHS = ["/expense", "/category", "/category/{category}/tag", "/tag/{tag}"]
+
+
+def add_rows(user_id, category, tag, count):
+    """Grow every list the paths return: categories, the category's tags, the tag's expenses."""
+    for i in range(count):
+        db.session.add(CategoryModel(
+            user_id=user_id,
+            name="extra-{}".format(i),
+            tag=[TagModel(user_id=user_id, name="tag")],
+            expense=[ExpenseModel(user_id=user_id, name="expense", price=Decimal("1.00"))],
+        ))
+    tags = [TagModel(user_id=user_id, name="tag-{}".format(i), category_id=category.id) for i in range(count)]
+    db.session.add_all(tags)
+    db.session.add_all(
+        ExpenseModel(user_id=user_id, name="expense-{}".format(i), price=Decimal("2.50"), category_id=category.id, tag=tags + [tag])
+        for i in range(count)
+    )
+    db.session.commit()
+
+
+@pytest.mark.parametrize("fast", [False, True])
+@pytest.mark.parametrize("path", PATHS)
+def test_query_count_does_not_grow_with_rows(app, client, auth, path, fast):
+    app.config["FAST_SERIALIZATION"] = fast
+    # Measure the endpoint, not the cache or the revocation sync.
+    RESPONSE_CACHE.enabled = False
+    headers = auth()
+    BLOCKLIST.sync_interval = float("inf")
+
+    with app.app_context():
+        engine = db.engine
+        tag = TagModel(user_id=1, name="tag")
+        category = CategoryModel(user_id=1, name="food", tag=[tag])
+        db.session.add(ExpenseModel(user_id=1, name="lunch", price=Decimal("12.50"), category=category, tag=[tag]))
+        db.session.commit()
+        path = path.format(category=category.id, tag=tag.id)
+
+    with count_queries(engine) as counter:
+        assert client.get(path, headers=headers).status_code == 200
+
+    with app.app_context():
+        category, tag = db.session.get(CategoryModel, category.id), db.session.get(TagModel, tag.id)
+        add_rows(1, category, tag, 20)
+
+    with assert_query_count(counter.count, engine):
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
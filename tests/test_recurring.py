@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from db import db
+from models import ExpenseModel
+from recurring import RECURRING
+
+
+def setup(client, headers):
+    """Create two categories with a tag each; return their ids."""
+    ids = []
+    for name in ("home", "food"):
+        category = client.post("/category", json={"name": name}, headers=headers).json
+        tag = client.post("/category/{}/tag".format(category["id"]), json={"name": name}, headers=headers).json
+        ids.append((int(category["id"]), tag["id"]))
+    return ids
+
+
+def test_tags_must_belong_to_the_category(client, auth):
+    headers = auth()
+    (home, home_tag), (_, food_tag) = setup(client, headers)
+    template = {"name": "rent", "price": "900.00", "category_id": home, "interval": "month"}
+
+    response = client.post("/recurring", json=dict(template, tag_ids=[home_tag, food_tag]), headers=headers)
+    assert response.status_code == 400
+    assert response.json["message"] == "Tags [{}] don't belong to the expense's category.".format(food_tag)
+    assert client.post("/recurring", json=dict(template, tag_ids=[home_tag]), headers=headers).status_code == 201
+
+
+def test_catch_up_keeps_summaries(app, client, auth, check_summaries):
+    headers = auth()
+    (home, home_tag), _ = setup(client, headers)
+    template = {
+        "name": "rent", "price": "900.00", "category_id": home, "tag_ids": [home_tag],
+        "interval": "month", "starts_at": "2026-01-31T09:00:00+00:00",
+    }
+    assert client.post("/recurring", json=template, headers=headers).status_code == 201
+
+    with app.app_context():
+        assert RECURRING.run("test", now=datetime(2026, 6, 1)) == 5
+        # Nothing more is due until the next occurrence.
+        assert RECURRING.run("test", now=datetime(2026, 6, 1)) == 0
+        created = sorted(row.created_at for row in db.session.query(ExpenseModel.created_at))
+    assert [moment.day for moment in created] == [31, 28, 31, 30, 31]
+    assert check_summaries()
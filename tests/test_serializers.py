@@ -0,0 +1,21 @@
+from flask_jwt_extended import create_access_token
+
+from benchmarks.seed import seed
+from benchmarks.serialization import fetch, queries, seed_edge_cases
+from db import db
+from models import CategoryModel
+
+
+def test_fast_path_matches_schema(app, client):
+    with app.app_context():
+        seed(categories=3, tags_per_category=4, expenses=300)
+        seed_edge_cases()
+        category_ids = [row.id for row in db.session.query(CategoryModel.id)]
+        headers = {"Authorization": "Bearer " + create_access_token(identity="1")}
+
+    for path in queries(category_ids, limit=100):
+        # Status, X-Next-Cursor and body, byte for byte.
+        schema = fetch(app, client, path, headers, fast=False)[1:]
+        fast = fetch(app, client, path, headers, fast=True)[1:]
+        assert schema[0] == 200, path
+        assert schema == fast, path
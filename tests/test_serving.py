@@ -0,0 +1,23 @@
+from db import engine_options
+from serving import pool_size, serving_settings
+
+
+def test_pools_leave_room_for_background_threads(monkeypatch):
+    monkeypatch.setenv("WEB_WORKERS", "4")
+    monkeypatch.delenv("WEB_WORKER_CLASS", raising=False)
+    assert pool_size(serving_settings(), 100) == 2
+    monkeypatch.setenv("RECURRING_SCHEDULER", "true")
+    assert pool_size(serving_settings(), 100) == 3
+    monkeypatch.setenv("WEB_WORKER_CLASS", "gthread")
+    assert pool_size(serving_settings(), 100) == 10
+    # Still within the database's budget.
+    assert pool_size(serving_settings(), 20) == 5
+
+
+def test_only_gunicorn_pools_have_no_overflow(monkeypatch):
+    for name in ("DB_POOL_SIZE", "DB_MAX_OVERFLOW"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("SERVING", "true")
+    assert engine_options("postgresql://db/app")["max_overflow"] == 0
+    monkeypatch.setenv("SERVING", "false")
+    assert engine_options("postgresql://db/app")["max_overflow"] > 0
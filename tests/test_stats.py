@@ -0,0 +1,30 @@
+def test_expense_writes_keep_summaries(client, auth, check_summaries):
+    headers = auth()
+    category = client.post("/category", json={"name": "food"}, headers=headers).json
+    other = client.post("/category", json={"name": "fun"}, headers=headers).json
+    tag = client.post("/category/{}/tag".format(category["id"]), json={"name": "lunch"}, headers=headers).json
+
+    expenses = [
+        client.post("/expense", json={"name": name, "price": price, "category_id": int(category["id"])}, headers=headers).json
+        for name, price in [("soup", "4.50"), ("steak", "30.00"), ("salad", "9.25")]
+    ]
+    for expense in expenses:
+        client.post("/expense/{}/tag/{}".format(expense["id"], tag["id"]), headers=headers)
+    assert check_summaries()
+
+    # The most expensive one gets cheaper, so the bucket's max_price is recomputed.
+    steak = "/expense/{}".format(expenses[1]["id"])
+    assert client.put(steak, json={"name": "steak", "price": "3.00"}, headers=headers).status_code == 200
+    check_summaries()
+    # Created by PUT, in another category.
+    response = client.put("/expense/1000", json={"name": "film", "price": "12.00", "category_id": int(other["id"])}, headers=headers)
+    assert response.status_code == 200
+    check_summaries()
+    assert client.delete("/expense/{}".format(expenses[2]["id"]), headers=headers).status_code == 200
+    check_summaries()
+
+    stats = client.get("/stats/category", headers=headers).json
+    assert [(row["category_id"], row["count"], row["total"], row["max_price"]) for row in stats] == [
+        (int(category["id"]), 2, 7.5, 4.5),
+        (int(other["id"]), 1, 12.0, 12.0),
+    ]